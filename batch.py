@@ -0,0 +1,109 @@
+"""
+NSE Equity Delivery Analytics - headless batch mode (no Google Sheets)
+
+Fetches and processes a list of symbols for one date range and writes
+the results to local Parquet/CSV files plus a metrics summary. Re-running
+the same command resumes an interrupted batch.
+
+    python batch.py symbols.txt --from 01-01-2024 --to 31-12-2024
+    python batch.py UNIVERSE --from 01-01-2024 --to 31-12-2024 --format csv
+    python batch.py WATCHLIST:NIFTY_BANK --from 01-01-2024 --to 31-03-2024 --out backfill/banks
+    python batch.py INFY,TCS --from 01-01-2024 --to 31-01-2024 --workers 8
+"""
+
+import argparse
+import json
+import logging
+import sys
+from datetime import datetime
+
+from modules.utils import ConfigError, load_config, setup_logging, validate_config, validate_date_format
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Headless batch fetch + process to local files")
+    parser.add_argument("symbols",
+                        help="symbol list file, UNIVERSE (equity list), WATCHLIST:<name> or INFY,TCS,...")
+    parser.add_argument("--from", dest="from_date", required=True, metavar="DD-MM-YYYY")
+    parser.add_argument("--to", dest="to_date", required=True, metavar="DD-MM-YYYY")
+    parser.add_argument("--config", default="config/settings.json",
+                        help="settings file (default config/settings.json)")
+    parser.add_argument("--out", help="output folder (default batch.output_folder/{from}_{to})")
+    parser.add_argument("--format", choices=("parquet", "csv"), help="output format (default batch.format)")
+    parser.add_argument("--workers", type=int, help="concurrent symbols (default batch.workers)")
+    parser.add_argument("--restart", action="store_true",
+                        help="ignore progress from an earlier run in the output folder")
+    parser.add_argument("--report-json", metavar="PATH", help="also write the final report as JSON")
+    return parser.parse_args(argv)
+
+
+def check_range(from_date: str, to_date: str) -> None:
+    for value in (from_date, to_date):
+        if not validate_date_format(value):
+            raise ValueError(f"Invalid date {value!r} (expected DD-MM-YYYY)")
+
+    if datetime.strptime(from_date, "%d-%m-%Y") > datetime.strptime(to_date, "%d-%m-%Y"):
+        raise ValueError(f"--from {from_date} is after --to {to_date}")
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+
+    # ---------------------------------------------------------------------
+    # Step 1: Load + Validate Config and Arguments (no Sheets credentials)
+    # ---------------------------------------------------------------------
+    try:
+        config = load_config(args.config)
+        validate_config(config, check_credentials=False)
+        check_range(args.from_date, args.to_date)
+        if args.workers is not None:
+            if args.workers < 1:
+                raise ValueError("--workers must be >= 1")
+            config.setdefault("batch", {})["workers"] = args.workers
+    except (ConfigError, FileNotFoundError, ValueError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 2
+
+    setup_logging(config)
+    logger = logging.getLogger("main")
+
+    from modules import batch, catalog, lifecycle, nse_client
+    from modules import state as state_mod
+
+    # ---------------------------------------------------------------------
+    # Step 2: Symbols + Run (resumes progress in the output folder)
+    # ---------------------------------------------------------------------
+    try:
+        symbols = batch.resolve_symbols(config, args.symbols)
+        run = batch.new_run(
+            config, symbols, args.from_date, args.to_date,
+            out=args.out, fmt=args.format, restart=args.restart,
+        )
+    except batch.BatchError as e:
+        logger.error(f"❌ {e}")
+        return 2
+
+    state = state_mod.init_state(config)
+    lifecycle.register_shutdown_handlers(state)
+
+    try:
+        report = batch.run_batch(state, run)
+    finally:
+        nse_client.close_session(state)
+        catalog.flush(state)
+
+    # ---------------------------------------------------------------------
+    # Step 3: Throughput Report
+    # ---------------------------------------------------------------------
+    batch.log_report(report)
+    if args.report_json:
+        with open(args.report_json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if report["interrupted"]:
+        return 130
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,48 +1,126 @@
 """
 NSE Equity Delivery Analytics System
 
+Arguments, config loading and validation use the standard library only;
+pandas, gspread, google-auth and requests are imported after the config
+is known to be good. Each import and init step is timed (startup report
+in the log).
+
+    python main.py                     # run the service
+    python main.py --check-config      # validate config and exit (no heavy imports)
 """
 
-from modules import init_state, setup_logging, lifecycle, monitor
+import argparse
 import logging
+import sys
+
+from modules import profiling, startup
+from modules.utils import ConfigError, load_config, setup_logging, validate_config
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="NSE Equity Delivery Analytics System")
+    parser.add_argument("--config", default="config/settings.json",
+                        help="settings file (default config/settings.json)")
+    parser.add_argument("--check-config", action="store_true",
+                        help="validate the config and credentials file, then exit")
+    parser.add_argument("--profile-every", type=int, metavar="N",
+                        help="profile every Nth pipeline run (saved to logs/profiles/)")
+    parser.add_argument("--profile-slow", type=float, metavar="SECONDS",
+                        help="save profiles of runs slower than SECONDS")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    report = startup.new_report()
+
+    # ---------------------------------------------------------------------
+    # Step 1: Load + Validate Config (standard library only)
+    # ---------------------------------------------------------------------
+    try:
+        with startup.step(report, "load + validate config"):
+            config = load_config(args.config)
+            profiling.apply_cli(config, args.profile_every, args.profile_slow)
+            validate_config(config)
+    except (ConfigError, profiling.ProfilingError, FileNotFoundError, ValueError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 2
+
+    if args.check_config:
+        print(f"✅ Config OK: {args.config}")
+        return 0
+
+    # ---------------------------------------------------------------------
+    # Step 2: Setup Logging System
+    # ---------------------------------------------------------------------
+    with startup.step(report, "setup logging"):
+        setup_logging(config)
+
+    logger = logging.getLogger("main")
+    logger.info("=" * 60)
+    logger.info("NSE Equity Delivery Analytics System - STARTING")
+    logger.info("=" * 60)
+
+    # ---------------------------------------------------------------------
+    # Step 3: Heavy Imports (system.io_mode: "sync" or "async")
+    # ---------------------------------------------------------------------
+    async_mode = config.get("system", {}).get("io_mode", "sync") == "async"
+
+    startup.load_all(report, startup.DEPENDENCIES)
+    if async_mode:
+        startup.load_all(report, startup.ASYNC_DEPENDENCIES, optional=True)
+
+    state_mod = startup.load(report, "modules.state")
+    lifecycle = startup.load(report, "modules.lifecycle")
+    catalog = startup.load(report, "modules.catalog")
+    metrics = startup.load(report, "modules.metrics")
+    nse_client = startup.load(report, "modules.nse_client")
+    monitor = startup.load(report, "modules.monitor")
+    async_io = startup.load(report, "modules.async_io") if async_mode else None
+
+    # ---------------------------------------------------------------------
+    # Step 4: Initialize Universal State + Shutdown Handlers
+    # ---------------------------------------------------------------------
+    with startup.step(report, "init state"):
+        state = state_mod.init_state(config)
+        lifecycle.register_shutdown_handlers(state)
+
+    # ---------------------------------------------------------------------
+    # Step 5: Connect to Google Sheets
+    # ---------------------------------------------------------------------
+    with startup.step(report, "connect sheets"):
+        monitor.connect_sheets(state)
+
+    # Optional local /metrics endpoint (metrics.port)
+    with startup.step(report, "metrics endpoint"):
+        metrics.start_server(state)
+
+    startup.log_report(report)
+
+    # ---------------------------------------------------------------------
+    # Step 6: Start Monitoring Loop
+    # ---------------------------------------------------------------------
+    if async_mode:
+        logger.info("Entering monitoring loop (async I/O)...")
+        async_io.run(state)
+    else:
+        logger.info("Entering monitoring loop...")
+        monitor.poll_loop(state)
+
+    # ---------------------------------------------------------------------
+    # Step 7: Graceful Shutdown
+    # ---------------------------------------------------------------------
+    nse_client.close_session(state)
+    catalog.flush(state)
+    metrics.stop_server(state)
+    metrics.write_file(state)
+
+    logger.info("=" * 60)
+    logger.info("NSE Equity Delivery Analytics System - SHUTDOWN COMPLETE")
+    logger.info("=" * 60)
+    return 0
+
 
-# ---------------------------------------------------------------------
-# Step 1: Initialize Universal State
-# ---------------------------------------------------------------------
-state = init_state()
-
-# ---------------------------------------------------------------------
-# Step 2: Setup Logging System
-# ---------------------------------------------------------------------
-setup_logging(state["config"])
-
-# ---------------------------------------------------------------------
-# Step 3: Log System Start
-# ---------------------------------------------------------------------
-logger = logging.getLogger("main")
-logger.info("=" * 60)
-logger.info("NSE Equity Delivery Analytics System - STARTING")
-logger.info("=" * 60)
-
-# ---------------------------------------------------------------------
-# Step 4: Register Shutdown Handlers
-# ---------------------------------------------------------------------
-lifecycle.register_shutdown_handlers(state)
-
-# ---------------------------------------------------------------------
-# Step 5: Connect to Google Sheets
-# ---------------------------------------------------------------------
-monitor.connect_sheets(state)
-
-# ---------------------------------------------------------------------
-# Step 6: Start Monitoring Loop
-# ---------------------------------------------------------------------
-logger.info("Entering monitoring loop...")
-monitor.poll_loop(state)
-
-# ---------------------------------------------------------------------
-# Step 7: Graceful Shutdown
-# ---------------------------------------------------------------------
-logger.info("=" * 60)
-logger.info("NSE Equity Delivery Analytics System - SHUTDOWN COMPLETE")
-logger.info("=" * 60)
\ No newline at end of file
+if __name__ == "__main__":
+    sys.exit(main())
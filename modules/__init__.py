@@ -1,26 +1,53 @@
 """
 NSE Analytics Modules Package
+
+Submodules load on first use (`from modules import monitor`,
+`modules.monitor`), so importing the package - or a light module such as
+modules.utils - does not pull in pandas, gspread, google-auth or requests.
 """
 
-# Core modules
-from modules.state import init_state, reset_transaction
-from modules.utils import load_config, setup_logging
+import importlib
+
 
-# Module imports for main.py
-from modules import lifecycle
-from modules import monitor
-from modules import pipeline
-from modules import processor
-from modules import sheets_io
+# Core helpers re-exported from their modules
+_EXPORTS = {
+    "init_state": "modules.state",
+    "reset_transaction": "modules.state",
+    "load_config": "modules.utils",
+    "setup_logging": "modules.utils",
+}
 
 __all__ = [
     'init_state',
     'reset_transaction',
     'load_config',
     'setup_logging',
+    'async_io',
+    'batch',
+    'catalog',
     'lifecycle',
+    'metrics',
     'monitor',
+    'nse_client',
     'pipeline',
     'processor',
-    'sheets_io'
-]
\ No newline at end of file
+    'profiling',
+    'request_table',
+    'screener',
+    'sheets_api',
+    'sheets_io',
+    'stages',
+    'startup'
+]
+
+
+def __getattr__(name: str):
+    if name in _EXPORTS:
+        value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    elif name in __all__:
+        value = importlib.import_module(f"{__name__}.{name}")
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    globals()[name] = value
+    return value
@@ -0,0 +1,191 @@
+"""
+Vectorized delivery analytics over NSE priceVolumeDeliverable frames.
+
+Works on whole numeric columns - no per-row Python. NSE "-" placeholders
+and thousands separators are cleaned in bulk before any math.
+"""
+
+import numpy as np
+import pandas as pd
+
+from modules import schema
+
+
+DELIVERY_PCT = "% Dly Qt to Traded Qty"
+DELIVERABLE_QTY = "Deliverable Qty"
+TRADED_QTY = "Total Traded Quantity"
+AVERAGE_PRICE = "Average Price"
+CLOSE_PRICE = "Close Price"
+
+PLACEHOLDERS = ["-", "", " "]
+
+
+def clean_numeric(series: pd.Series) -> pd.Series:
+    """
+    Convert an NSE column to float64, mapping "-"/blank to NaN and
+    dropping thousands separators.
+    """
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype("float64")
+
+    text = series.where(~series.isin(PLACEHOLDERS))
+
+    if text.str.contains(",", regex=False, na=False).any():
+        text = text.str.replace(",", "", regex=False)
+
+    # astype() parses in C and tolerates surrounding whitespace; only fall
+    # back to the slower coercing parser when unexpected tokens are present
+    try:
+        return text.astype("float64")
+    except (ValueError, TypeError):
+        return pd.to_numeric(text, errors="coerce").astype("float64")
+
+
+def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Strip the trailing whitespace / BOM NSE leaves on header names.
+    """
+    return df.rename(columns=lambda c: str(c).strip().lstrip("\ufeff"))
+
+
+def compute_metrics(df: pd.DataFrame, config: dict | None = None) -> dict:
+    """
+    Delivery metrics for one symbol's frame.
+
+    Summary stats (avg/max/min) cover every row, as before. Time-series
+    stats (rolling %, z-scores, spikes) use only rows in analytics.series
+    so parallel series (BL, BE...) don't interleave on the same date.
+    """
+    cfg = (config or {}).get("analytics", {})
+    window = cfg.get("rolling_days", 20)
+    threshold = cfg.get("spike_zscore", 2.0)
+    series_filter = cfg.get("series", ["EQ"])
+
+    df = normalize_columns(df)
+
+    metrics = {
+        "total_rows": len(df),
+        "avg_delivery_pct": 0,
+        "max_delivery_pct": 0,
+        "min_delivery_pct": 0,
+        "rolling_delivery_pct": 0,
+        "delivery_qty_zscore": 0,
+        "vwap_delivery_pct": 0,
+        "spike_days": 0,
+        "last_spike_date": "",
+    }
+
+    pct_col = _delivery_column(df)
+    if pct_col is None or df.empty:
+        return metrics
+
+    pct = clean_numeric(df[pct_col])
+    if pct.notna().any():
+        metrics["avg_delivery_pct"] = _round(pct.mean())
+        metrics["max_delivery_pct"] = _round(pct.max())
+        metrics["min_delivery_pct"] = _round(pct.min())
+
+    ts = time_series(df, window, series_filter)
+    if ts.empty:
+        return metrics
+
+    latest = ts.iloc[-1]
+    metrics["rolling_delivery_pct"] = _round(latest["rolling_pct"])
+    metrics["delivery_qty_zscore"] = _round(latest["qty_zscore"])
+    metrics["vwap_delivery_pct"] = _round(vwap_delivery_pct(ts))
+
+    spikes = ts[ts["pct_zscore"] > threshold]
+    metrics["spike_days"] = int(len(spikes))
+    if not spikes.empty:
+        metrics["last_spike_date"] = spikes["date"].iloc[-1].strftime("%d-%b-%Y")
+
+    return metrics
+
+
+def time_series(df: pd.DataFrame, window: int, series_filter: list[str] | None = None) -> pd.DataFrame:
+    """
+    Date-ordered numeric frame with rolling delivery stats.
+
+    Columns: date, pct, deliverable_qty, traded_qty, price, rolling_pct,
+    pct_zscore, qty_zscore.
+    """
+    df = normalize_columns(df)
+    pct_col = _delivery_column(df)
+    if pct_col is None or "Date" not in df.columns:
+        return pd.DataFrame()
+
+    if series_filter and "Series" in df.columns:
+        df = df[df["Series"].astype("string").str.strip().isin(series_filter)]
+
+    price_col = AVERAGE_PRICE if AVERAGE_PRICE in df.columns else CLOSE_PRICE
+
+    ts = pd.DataFrame({
+        "date": _parse_dates(df["Date"]),
+        "pct": clean_numeric(df[pct_col]),
+        "deliverable_qty": _optional(df, DELIVERABLE_QTY),
+        "traded_qty": _optional(df, TRADED_QTY),
+        "price": _optional(df, price_col),
+    }).dropna(subset=["date"]).sort_values("date", kind="stable").reset_index(drop=True)
+
+    if ts.empty:
+        return ts
+
+    min_periods = max(2, window // 2)
+
+    pct_roll = ts["pct"].rolling(window, min_periods=min_periods)
+    ts["rolling_pct"] = pct_roll.mean()
+    ts["pct_zscore"] = _zscore(ts["pct"], pct_roll.mean().shift(1), pct_roll.std().shift(1))
+
+    qty_roll = ts["deliverable_qty"].rolling(window, min_periods=min_periods)
+    ts["qty_zscore"] = _zscore(ts["deliverable_qty"], qty_roll.mean().shift(1), qty_roll.std().shift(1))
+
+    return ts
+
+
+def vwap_delivery_pct(ts: pd.DataFrame) -> float:
+    """
+    Delivered value as a share of traded value, weighting each day by price.
+    """
+    delivered = (ts["deliverable_qty"] * ts["price"]).sum(min_count=1)
+    traded = (ts["traded_qty"] * ts["price"]).sum(min_count=1)
+
+    if pd.isna(delivered) or pd.isna(traded) or traded == 0:
+        return float("nan")
+
+    return float(delivered / traded * 100)
+
+
+def _zscore(values: pd.Series, mean: pd.Series, std: pd.Series) -> pd.Series:
+    """
+    Score each value against the preceding window (shifted stats), so a
+    spike does not dilute its own baseline.
+    """
+    return (values - mean) / std.replace(0, np.nan)
+
+
+def _delivery_column(df: pd.DataFrame) -> str | None:
+    if DELIVERY_PCT in df.columns:
+        return DELIVERY_PCT
+    for col in df.columns:
+        lower = str(col).lower()
+        if "%" in lower and ("dly" in lower or "delivery" in lower):
+            return col
+    return None
+
+
+def _optional(df: pd.DataFrame, column: str) -> pd.Series:
+    if column in df.columns:
+        return clean_numeric(df[column])
+    return pd.Series(np.nan, index=df.index, dtype="float64")
+
+
+def _parse_dates(series: pd.Series) -> pd.Series:
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    return schema.parse_dates(series.astype("string").str.strip())
+
+
+def _round(value) -> float:
+    if value is None or pd.isna(value):
+        return 0
+    return round(float(value), 2)
@@ -0,0 +1,524 @@
+"""
+Async I/O core - one event loop instead of a thread per blocking call.
+
+Selected with system.io_mode = "async" (main.py); "sync" keeps
+monitor.poll_loop and the staged pipeline threads.
+
+- NSE: nse_client's fetch code (catalog, store, chunks, retries) runs over
+  an aiohttp transport - pooled connections, cookie jar, the same
+  homepage-cookie -> API sequence, streamed to disk. A request waiting on
+  NSE is a suspended coroutine, not a parked thread.
+- Sheets: gspread is synchronous, so its calls run on a small bounded
+  executor (async_io.blocking_workers) and keep sheets_api's quota and
+  priorities. Data writes are serialized with an asyncio.Lock.
+- CPU work (processing) goes to the same executor. Screens run on their
+  own small executor (async_io.screen_workers): a screen thread waits on
+  this loop for its symbol fetches, which need the blocking executor, so
+  screens must never be able to fill it.
+- Polling: one coroutine; each request becomes a task, bounded by
+  pipeline.max_in_flight. Screens fan their symbols out as coroutines
+  (async_io.screen_concurrency).
+
+aiohttp is optional - only this mode needs it.
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from modules import lifecycle, metrics, monitor, nse_client, pipeline, processor, profiling
+from modules import request_table, scheduler, screener, sheets_io, stages
+from modules import state as state_mod
+
+
+class AsyncIOError(Exception):
+    pass
+
+
+def is_enabled(config: dict) -> bool:
+    return config.get("system", {}).get("io_mode", "sync") == "async"
+
+
+def run(state: dict) -> None:
+    """
+    Run the async poll loop to completion (blocks until shutdown).
+    """
+    if aiohttp is None:
+        raise AsyncIOError("system.io_mode 'async' requires aiohttp (pip install aiohttp)")
+
+    asyncio.run(poll_loop(state))
+
+
+# ---------------------------------------------------------------------
+# Core
+# ---------------------------------------------------------------------
+def start(state: dict) -> dict:
+    """
+    Create the async core in state['resources'] (call inside the loop).
+    """
+    config = state["config"]
+    async_cfg = config.get("async_io", {})
+    loop = asyncio.get_running_loop()
+    shutdown = asyncio.Event()
+
+    core = {
+        "executor": ThreadPoolExecutor(
+            max_workers=async_cfg.get("blocking_workers", 8), thread_name_prefix="async-blocking"
+        ),
+        "screen_executor": ThreadPoolExecutor(
+            max_workers=async_cfg.get("screen_workers", 2), thread_name_prefix="async-screen"
+        ),
+        "loop": loop,
+        "shutdown": shutdown,
+        # Set from the signal handler (or initiate_shutdown's thread)
+        "wake": lambda: loop.call_soon_threadsafe(shutdown.set),
+        "write_lock": asyncio.Lock(),
+        "tasks": {},                 # request key -> asyncio.Task
+        "max_in_flight": config.get("pipeline", {}).get("max_in_flight", 8),
+        "screen_concurrency": async_cfg.get("screen_concurrency", 64),
+        "next_id": 1,
+        "stats": {"completed": 0, "failed": 0, "peak_in_flight": 0, "peak_fetches": 0, "fetches": 0},
+    }
+
+    state["resources"]["async_io"] = core
+    state["resources"].setdefault("active_csvs", set())
+    lifecycle.on_shutdown(state, core["wake"])
+    return core
+
+
+async def close(state: dict) -> None:
+    """
+    Close the HTTP session and the executors.
+    """
+    resources = state["resources"]
+
+    pool = resources.get("async_http_session")
+    if pool is not None:
+        await pool["session"].close()
+        resources["async_http_session"] = None
+
+    core = resources.get("async_io")
+    if core is not None:
+        lifecycle.remove_shutdown_callback(state, core["wake"])
+        core["executor"].shutdown(wait=False, cancel_futures=True)
+        core["screen_executor"].shutdown(wait=False, cancel_futures=True)
+
+
+async def blocking(state: dict, fn, *args, **kwargs):
+    """
+    Run a blocking call (gspread, pandas, file I/O) on the core's executor.
+    """
+    core = state["resources"]["async_io"]
+    return await asyncio.get_running_loop().run_in_executor(core["executor"], partial(fn, *args, **kwargs))
+
+
+async def profiled(state: dict, txn_state: dict, fn, *args, **kwargs):
+    """
+    blocking() with the transaction's profiler enabled on the executor thread.
+    """
+    return await blocking(state, profiling.call, txn_state, fn, *args, **kwargs)
+
+
+async def wait(state: dict, timeout: float) -> bool:
+    """
+    Sleep up to timeout seconds, waking early on shutdown.
+
+    Returns True if shutdown was requested.
+    """
+    shutdown = state["resources"]["async_io"]["shutdown"]
+
+    try:
+        await asyncio.wait_for(shutdown.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+
+    return shutdown.is_set()
+
+
+async def run_screen(state: dict, txn_state: dict) -> list[list]:
+    """
+    screener.screen (profiled) on the screen executor; its symbol fetches
+    come back to this loop. Returns the ranked table.
+    """
+    core = state["resources"]["async_io"]
+    fetch = partial(_fetch_all_threadsafe, core["loop"])
+    return await core["loop"].run_in_executor(
+        core["screen_executor"], partial(profiling.call, txn_state, screener.screen, txn_state, fetch)
+    )
+
+
+# ---------------------------------------------------------------------
+# Polling Loop
+# ---------------------------------------------------------------------
+async def poll_loop(state: dict) -> None:
+    """
+    monitor.poll_loop on the event loop: triggers become tasks and polling
+    continues while they run.
+    """
+    logger = logging.getLogger("async_io")
+
+    config = state["config"]
+    stats_every = config["google_sheets"].get("poll_stats_log_every", 100)
+    sched = scheduler.init_scheduler(config)
+
+    core = start(state)
+    logger.info(
+        f"Async monitoring started (poll interval: {sched['min_interval']}s - {sched['max_interval']}s, "
+        f"max in flight {core['max_in_flight']})"
+    )
+
+    if request_table.is_enabled(config):
+        await blocking(state, monitor.ensure_request_sheet, state)
+
+    try:
+        while lifecycle.is_running(state):
+            try:
+                requests = await blocking(state, monitor.check_trigger, state)
+                if requests is None:
+                    outcome = "error"
+                elif requests:
+                    runnable = await blocking(state, monitor.mark_requests, state, requests)
+                    submit(state, runnable)
+                    outcome = "triggered"
+                else:
+                    outcome = "idle"
+
+                if stats_every and state["resources"]["poll_stats"]["polls"] % stats_every == 0:
+                    log_stats(state)
+
+            except Exception as e:
+                logger.error(f"Monitor loop error: {e}")
+                outcome = "error"
+
+            delay = scheduler.next_delay(sched, outcome)
+            logger.debug(f"Next poll in {delay:.1f}s ({outcome})")
+            await wait(state, delay)
+
+        await drain(state, config["system"].get("shutdown_timeout_seconds", 10))
+
+    finally:
+        log_stats(state)
+        await close(state)
+        logger.info("Async monitoring loop stopped")
+
+
+def submit(state: dict, requests: list[dict]) -> dict:
+    """
+    Start a task per request. Requests already running are skipped and
+    requests over max_in_flight wait for a later poll (their trigger stays
+    set). Returns {"queued", "duplicate", "busy"} counts.
+    """
+    logger = logging.getLogger("async_io")
+    core = state["resources"]["async_io"]
+    tasks = core["tasks"]
+    counts = {"queued": 0, "duplicate": 0, "busy": 0}
+
+    for r in requests:
+        key = stages.request_key(r["symbol"], r["from_date"], r["to_date"], r["row"])
+
+        if key in tasks:
+            counts["duplicate"] += 1
+            continue
+
+        if len(tasks) >= core["max_in_flight"]:
+            counts["busy"] += 1
+            continue
+
+        transaction = state_mod.new_transaction(
+            r["symbol"], r["from_date"], r["to_date"], r["row"], r["output_sheet"]
+        )
+        transaction.update({"id": core["next_id"], "key": key, "submitted_at": time.perf_counter()})
+        core["next_id"] += 1
+
+        txn_state = state_mod.transaction_state(state, transaction)
+        task = asyncio.create_task(run_transaction(state, txn_state), name=f"txn-{transaction['id']}")
+        tasks[key] = task
+        task.add_done_callback(lambda _, key=key: tasks.pop(key, None))
+
+        core["stats"]["peak_in_flight"] = max(core["stats"]["peak_in_flight"], len(tasks))
+        counts["queued"] += 1
+        logger.info(f"🔔 Trigger queued: {r['symbol']}" + (f" (row {r['row']})" if r["row"] else ""))
+
+    if counts["busy"]:
+        logger.warning(f"{counts['busy']} trigger(s) over max_in_flight - will be retried")
+
+    return counts
+
+
+async def drain(state: dict, timeout: float) -> bool:
+    """
+    Give in-flight tasks up to timeout seconds, then cancel the rest.
+    Returns True if every task finished.
+    """
+    logger = logging.getLogger("async_io")
+    tasks = list(state["resources"]["async_io"]["tasks"].values())
+    if not tasks:
+        return True
+
+    logger.info(f"Draining {len(tasks)} in-flight transaction(s) (up to {timeout}s)...")
+    _, pending = await asyncio.wait(tasks, timeout=timeout)
+
+    for task in pending:
+        task.cancel()
+    if pending:
+        logger.warning(f"{len(pending)} transaction(s) unfinished at shutdown timeout")
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    return not pending
+
+
+# ---------------------------------------------------------------------
+# Transactions
+# ---------------------------------------------------------------------
+async def run_transaction(state: dict, txn_state: dict) -> None:
+    """
+    pipeline.run for one request: awaitable NSE fetch, blocking work on
+    the executor, one data write at a time.
+    """
+    logger = logging.getLogger("async_io")
+    core = state["resources"]["async_io"]
+    t = txn_state["transaction"]
+    profiling.begin(txn_state)
+
+    try:
+        # UNIVERSE / WATCHLIST:<name> - fetched and scored by screener.screen,
+        # written under the same lock as data writes
+        if screener.is_screen_request(t["symbol"]):
+            t["raw_data"] = await run_screen(state, txn_state)
+            async with core["write_lock"]:
+                await profiled(state, txn_state, screener.write, txn_state, t["raw_data"])
+            return
+
+        if not await profiled(state, txn_state, pipeline.serve_cached, txn_state):
+            # Claim the CSV before it exists so other runs' cleanup keeps it
+            t["csv_path"] = nse_client.output_path(state["config"]["data"], t["symbol"], t["from_date"], t["to_date"])
+            state["resources"]["active_csvs"].add(t["csv_path"])
+
+            state_mod.update_stage(txn_state, "FETCHING")
+            await fetch_csv(txn_state)
+
+            state_mod.update_stage(txn_state, "PROCESSING")
+            await profiled(state, txn_state, processor.process_csv, txn_state)
+            await profiled(state, txn_state, pipeline.cache_result, txn_state)
+
+        async with core["write_lock"]:
+            state_mod.update_stage(txn_state, "WRITING")
+            await profiled(state, txn_state, sheets_io.write_results, txn_state)
+
+    except Exception as e:
+        pipeline.record_error(txn_state, e)
+        async with core["write_lock"]:
+            await blocking(state, sheets_io.write_error, txn_state)
+
+    finally:
+        state["resources"]["active_csvs"].discard(t.get("csv_path"))
+        await blocking(state, pipeline.cleanup_files, txn_state)
+        await blocking(state, profiling.end, txn_state)
+        await blocking(state, metrics.record_run, txn_state)
+
+        core["stats"]["failed" if t["error"] else "completed"] += 1
+        total_ms = (time.perf_counter() - t["submitted_at"]) * 1000
+        outcome = "failed" if t["error"] else "done"
+        logger.info(f"#{t['id']} {t['symbol']} {outcome} in {total_ms:.0f}ms")
+
+
+async def fetch_all(state: dict, symbols: list[str], from_date: str, to_date: str) -> dict[str, Path]:
+    """
+    screener.fetch_all as coroutines - every symbol in flight at once (up to
+    async_io.screen_concurrency), paced only by the NSE rate limiter.
+    """
+    logger = logging.getLogger("async_io")
+    core = state["resources"]["async_io"]
+
+    await blocking(state, screener.prepare_source, state, from_date, to_date)
+
+    limit = asyncio.Semaphore(core["screen_concurrency"])
+
+    async def fetch_one(symbol: str) -> Path:
+        async with limit:
+            return await fetch_csv(screener.symbol_state(state, symbol, from_date, to_date))
+
+    results = await asyncio.gather(*(fetch_one(s) for s in symbols), return_exceptions=True)
+
+    paths = {}
+    for symbol, result in zip(symbols, results):
+        if isinstance(result, nse_client.NSEFetchError):
+            logger.warning(f"Skipping {symbol}: {result}")
+        elif isinstance(result, BaseException):
+            raise result
+        else:
+            paths[symbol] = result
+
+    return paths
+
+
+def _fetch_all_threadsafe(loop, state: dict, symbols: list[str], from_date: str, to_date: str) -> dict[str, Path]:
+    # Called from screener.screen on a screen executor thread
+    return asyncio.run_coroutine_threadsafe(fetch_all(state, symbols, from_date, to_date), loop).result()
+
+
+# ---------------------------------------------------------------------
+# NSE Fetch
+# ---------------------------------------------------------------------
+async def fetch_csv(state: dict) -> Path:
+    """
+    nse_client.fetch_csv on the event loop - the same catalog, store,
+    chunking and retry code over the aiohttp TRANSPORT below.
+    Updates state['transaction']['csv_path'].
+    """
+    return await nse_client.fetch_csv_with(state, TRANSPORT)
+
+
+async def _download(state: dict, symbol: str, from_date: str, to_date: str, dest: Path) -> Path:
+    """
+    One NSE API call streamed to dest - nse_client._download's sequence:
+    homepage cookies when stale, API call, one cookie refresh on 401/403.
+    """
+    logger = logging.getLogger("async_io")
+    nse_config = state["config"]["nse"]
+    timeout = nse_config.get("timeout_seconds", 20)
+    stats = state["resources"]["async_io"]["stats"]
+
+    stats["fetches"] += 1
+    stats["peak_fetches"] = max(stats["peak_fetches"], stats["fetches"])
+
+    try:
+        pool = get_session(state)
+        await _ensure_cookies(state, pool)
+
+        api_url, params = nse_client.api_request(nse_config, symbol, from_date, to_date)
+
+        await _acquire_rate(state)
+        response, ttfb_ms = await _open(pool, api_url, params, timeout)
+
+        # Rejected cookies - refresh once and retry
+        if response.status in (401, 403):
+            logger.info(f"NSE returned {response.status} - refreshing cookies")
+            response.release()
+            await _ensure_cookies(state, pool, force=True)
+            await _acquire_rate(state)
+            response, ttfb_ms = await _open(pool, api_url, params, timeout)
+
+        async with response:
+            nse_client.check_status(response.status)
+
+            chunk_bytes = nse_config.get("stream_chunk_bytes", 65536)
+            size, transfer_ms = await _stream_to_file(response, dest, chunk_bytes)
+
+        nse_client.record_download(state, response.status, size, ttfb_ms, transfer_ms)
+        return dest
+
+    except nse_client.NSEFetchError:
+        raise
+
+    except asyncio.TimeoutError:
+        raise nse_client.NSEFetchError(f"Request timed out after {timeout}s")
+
+    except aiohttp.ClientError as e:
+        raise nse_client.NSEFetchError(f"Network error: {e}")
+
+    except Exception as e:
+        raise nse_client.NSEFetchError(f"Unexpected error: {e}")
+
+    finally:
+        stats["fetches"] -= 1
+
+
+# ---------------------------------------------------------------------
+# HTTP Session
+# ---------------------------------------------------------------------
+def get_session(state: dict) -> dict:
+    """
+    Return the shared aiohttp session pool, creating it on first use.
+
+    Stored in state['resources']['async_http_session'] like
+    nse_client.get_session: session, cookies_at, lock, stats.
+    """
+    resources = state["resources"]
+    pool = resources.get("async_http_session")
+
+    if pool is None:
+        nse_config = state["config"]["nse"]
+        connector = aiohttp.TCPConnector(limit=state["config"].get("async_io", {}).get("nse_connections", 32))
+
+        # unsafe: keep cookies for IP-address hosts too (local stand-ins)
+        session = aiohttp.ClientSession(
+            headers=nse_config["headers"],
+            connector=connector,
+            cookie_jar=aiohttp.CookieJar(unsafe=True),
+        )
+        pool = nse_client.new_pool(session, asyncio.Lock())
+        resources["async_http_session"] = pool
+
+    return pool
+
+
+async def _ensure_cookies(state: dict, pool: dict, force: bool = False) -> None:
+    async with pool["lock"]:
+        if nse_client.cookies_fresh(state, pool) and not force:
+            return
+
+        # Don't check response - cookies are all we need
+        logging.getLogger("async_io").debug("Acquiring NSE cookies...")
+        homepage = state["config"]["nse"]["homepage_url"]
+        async with pool["session"].get(homepage, timeout=aiohttp.ClientTimeout(total=10)) as r:
+            await r.read()
+        nse_client.mark_cookies(pool)
+
+
+async def _acquire_rate(state: dict) -> None:
+    # Same limiter as the sync path, so both modes share nse.requests_per_minute
+    limiter = nse_client.get_rate_limiter(state)
+    while (delay := limiter.reserve()) > 0:
+        if await wait(state, delay):
+            raise nse_client.NSEFetchError("Shutdown requested while waiting for the rate limit")
+
+
+async def _open(pool: dict, url: str, params: dict, timeout: float):
+    """
+    Start a GET; returns (response, ttfb_ms) with the body unread.
+    """
+    started = time.perf_counter()
+    response = await pool["session"].get(url, params=params, timeout=aiohttp.ClientTimeout(total=timeout))
+    pool["stats"]["requests"] += 1
+    return response, (time.perf_counter() - started) * 1000
+
+
+async def _stream_to_file(response, dest: Path, chunk_bytes: int) -> tuple[int, float]:
+    """
+    nse_client._stream_to_file for an aiohttp response.
+    """
+    with nse_client.BodyFile(dest) as body:
+        async for chunk in response.content.iter_chunked(chunk_bytes):
+            body.write(chunk)
+
+    return body.size, body.transfer_ms
+
+
+# Shared fetch code (nse_client.fetch_csv_with) runs over this transport
+TRANSPORT = {"download": _download, "blocking": blocking, "wait": wait}
+
+
+# ---------------------------------------------------------------------
+# Stats
+# ---------------------------------------------------------------------
+def log_stats(state: dict) -> None:
+    monitor.log_poll_stats(state)
+
+    core = state["resources"].get("async_io")
+    if core is None:
+        return
+
+    s = core["stats"]
+    logging.getLogger("async_io").info(
+        f"Async core: {len(core['tasks'])} in flight (peak {s['peak_in_flight']}), "
+        f"{s['completed']} completed, {s['failed']} failed, peak {s['peak_fetches']} concurrent NSE fetches"
+    )
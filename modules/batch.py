@@ -0,0 +1,417 @@
+"""
+Headless batch runs - fetch + process many symbols straight to local files.
+
+    python batch.py symbols.txt --from 01-01-2024 --to 31-12-2024
+    python batch.py UNIVERSE --from 01-01-2024 --to 31-12-2024 --format csv
+
+No Google Sheets: each symbol's processed frame is written to
+{out}/{SYMBOL}.parquet (or .csv), and {out}/summary.csv holds one row of
+delivery metrics per symbol. nse_client (with the data catalog and
+history store) and processor do the work; fetch and process of
+different symbols overlap on batch.workers threads. With
+processing.chunk_rows set, each CSV is parsed and written a chunk at a
+time, so memory stays flat for long ranges (the summary then only has
+avg/max/min delivery %).
+
+Every finished symbol is appended to {out}/progress.jsonl, so a run
+stopped by Ctrl+C or a crash resumes where it left off when started
+again with the same range and output folder: symbols already written
+(or with no NSE data) are skipped, failed ones are retried.
+"""
+
+import json
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from modules import lifecycle, nse_client, processor, schema, screener
+from modules import state as state_mod
+
+
+FORMATS = ("parquet", "csv")
+
+# Statuses that are not retried on resume
+FINAL = ("ok", "no_data")
+
+SUMMARY_COLUMNS = [
+    "symbol", "status", "rows", "avg_delivery_pct", "max_delivery_pct", "min_delivery_pct",
+    "rolling_delivery_pct", "delivery_qty_zscore", "vwap_delivery_pct", "spike_days",
+    "last_spike_date", "seconds", "file", "error",
+]
+
+
+class BatchError(Exception):
+    pass
+
+
+# ---------------------------------------------------------------------
+# Symbols
+# ---------------------------------------------------------------------
+def resolve_symbols(config: dict, source: str) -> list[str]:
+    """
+    Symbols from a list file (one per line, or CSV with the symbol first),
+    UNIVERSE (the equity list), WATCHLIST:<name>, or "INFY,TCS,...".
+    """
+    path = Path(source)
+
+    if path.is_file():
+        symbols = []
+        for line in path.read_text(encoding="utf-8-sig").splitlines():
+            symbol = line.split(",")[0].strip().strip('"').upper()
+            if symbol and not symbol.startswith("#") and symbol != "SYMBOL":
+                symbols.append(symbol)
+    elif screener.is_screen_request(source.strip().upper()):
+        try:
+            symbols = screener.resolve_symbols(config, source.strip().upper())
+        except screener.ScreenerError as e:
+            raise BatchError(str(e))
+    else:
+        symbols = [s.strip().upper() for s in source.split(",") if s.strip()]
+
+    # Keep list order, drop repeats
+    symbols = list(dict.fromkeys(symbols))
+    if not symbols:
+        raise BatchError(f"No symbols in {source}")
+    return symbols
+
+
+# ---------------------------------------------------------------------
+# Run Setup / Resume
+# ---------------------------------------------------------------------
+def output_folder(config: dict, from_date: str, to_date: str) -> Path:
+    """
+    Default output folder for a range: batch.output_folder/{from}_{to}.
+    """
+    base = Path(config.get("batch", {}).get("output_folder", "output/batch"))
+    return base / f"{from_date.replace('-', '')}_{to_date.replace('-', '')}"
+
+
+def new_run(config: dict, symbols: list[str], from_date: str, to_date: str,
+            out: Path | None = None, fmt: str | None = None, restart: bool = False) -> dict:
+    """
+    Run record for a batch; picks up progress.jsonl from an earlier
+    interrupted run of the same range (unless restart).
+    """
+    batch_cfg = config.get("batch", {})
+    fmt = fmt or batch_cfg.get("format", "parquet")
+    if fmt not in FORMATS:
+        raise BatchError(f"Unknown format {fmt!r} (use {' or '.join(FORMATS)})")
+
+    out = Path(out) if out else output_folder(config, from_date, to_date)
+    out.mkdir(parents=True, exist_ok=True)
+
+    run = {
+        "symbols": symbols,
+        "from_date": from_date,
+        "to_date": to_date,
+        "format": fmt,
+        "out": out,
+        "progress_path": out / "progress.jsonl",
+        "workers": batch_cfg.get("workers", 4),
+        "progress_seconds": batch_cfg.get("progress_seconds", 5),
+        "records": {},               # symbol -> latest progress record
+        "resumed": 0,                # symbols already final when the run started
+        "counts": {"ok": 0, "no_data": 0, "failed": 0},
+        "rows": 0,
+        "bytes": 0,
+        "lock": threading.Lock(),
+        "started": None,
+        "last_progress": 0.0,
+        "interrupted": False,
+    }
+
+    _check_params(run, restart)
+    if restart:
+        run["progress_path"].unlink(missing_ok=True)
+    else:
+        _load_progress(run)
+    return run
+
+
+def _check_params(run: dict, restart: bool) -> None:
+    """
+    An output folder belongs to one range and format - resuming into a
+    different one would mix results.
+    """
+    params_path = run["out"] / "batch.json"
+    params = {"from_date": run["from_date"], "to_date": run["to_date"], "format": run["format"]}
+
+    if params_path.exists() and not restart:
+        try:
+            previous = json.loads(params_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            raise BatchError(f"Unreadable {params_path}: {e}")
+        if previous != params:
+            raise BatchError(
+                f"{run['out']} holds a {previous.get('format')} run for "
+                f"{previous.get('from_date')} → {previous.get('to_date')} - use another --out or --restart"
+            )
+
+    params_path.write_text(json.dumps(params, indent=2), encoding="utf-8")
+
+
+def _load_progress(run: dict) -> None:
+    logger = logging.getLogger("batch")
+
+    try:
+        lines = run["progress_path"].read_text(encoding="utf-8").splitlines()
+    except FileNotFoundError:
+        return
+
+    for line in lines:
+        try:
+            record = json.loads(line)
+            run["records"][record["symbol"]] = record
+        except (ValueError, KeyError):
+            # A line cut short by a crash - that symbol just runs again
+            continue
+
+    wanted = set(run["symbols"])
+    run["resumed"] = sum(1 for s, r in run["records"].items() if s in wanted and r["status"] in FINAL)
+    if run["resumed"]:
+        logger.info(f"Resuming: {run['resumed']} of {len(wanted)} symbols already done")
+
+
+def pending(run: dict) -> list[str]:
+    records = run["records"]
+    return [s for s in run["symbols"] if records.get(s, {}).get("status") not in FINAL]
+
+
+# ---------------------------------------------------------------------
+# Run
+# ---------------------------------------------------------------------
+def run_batch(state: dict, run: dict) -> dict:
+    """
+    Fetch + process every pending symbol, write the summary, and return
+    the throughput report. Stops submitting new symbols on shutdown
+    (Ctrl+C) and lets in-flight ones finish.
+    """
+    logger = logging.getLogger("batch")
+    todo = pending(run)
+
+    logger.info(
+        f"Batch started: {len(todo)} symbols ({run['from_date']} → {run['to_date']}) "
+        f"| {run['workers']} workers | {run['format']} → {run['out']}"
+    )
+    run["started"] = run["last_progress"] = time.perf_counter()
+
+    queue = iter(todo)
+    in_flight = set()
+
+    with ThreadPoolExecutor(max_workers=run["workers"], thread_name_prefix="batch") as executor:
+        while True:
+            # Keep one spare task per worker queued so threads never idle
+            while len(in_flight) < run["workers"] * 2 and lifecycle.is_running(state):
+                symbol = next(queue, None)
+                if symbol is None:
+                    break
+                in_flight.add(executor.submit(process_symbol, state, run, symbol))
+
+            if not in_flight:
+                break
+
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                _record(run, future.result())
+
+    run["interrupted"] = bool(pending(run)) and not lifecycle.is_running(state)
+    write_summary(run)
+    return report(run)
+
+
+def process_symbol(state: dict, run: dict, symbol: str) -> dict:
+    """
+    Fetch, process and write one symbol. Never raises - failures are
+    returned as a record so the batch carries on.
+    """
+    logger = logging.getLogger("batch")
+    txn_state = state_mod.transaction_state(
+        state, state_mod.new_transaction(symbol, run["from_date"], run["to_date"])
+    )
+    t = txn_state["transaction"]
+    record = {"symbol": symbol, "status": "failed", "rows": 0}
+    started = time.perf_counter()
+
+    try:
+        nse_client.fetch_csv(txn_state)
+        # Held until processed - the data catalog never evicts it meanwhile
+        state["resources"]["active_csvs"].add(t["csv_path"])
+
+        chunk_rows = state["config"].get("processing", {}).get("chunk_rows", 0)
+        if chunk_rows:
+            path, metrics = _write_chunks(run, symbol, t["csv_path"], chunk_rows)
+        else:
+            processor.process_csv(txn_state)
+            path = _write_frame(run, symbol, t["frame"])
+            metrics = t["metrics"]
+
+        record.update({
+            "status": "ok",
+            "rows": metrics["total_rows"],
+            "file": path.name,
+            "bytes": path.stat().st_size,
+            **{k: v for k, v in metrics.items() if k != "total_rows"},
+        })
+
+    except nse_client.NSENoDataError:
+        record["status"] = "no_data"
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+        logger.warning(f"{symbol} failed: {e}")
+    finally:
+        state["resources"]["active_csvs"].discard(t["csv_path"])
+
+    record["seconds"] = round(time.perf_counter() - started, 3)
+    return record
+
+
+def _write_frame(run: dict, symbol: str, frame) -> Path:
+    """
+    Atomic write (tmp + replace) - a crash never leaves a half file behind.
+    """
+    path = run["out"] / f"{symbol}.{run['format']}"
+    tmp = path.with_name(path.name + ".tmp")
+
+    if run["format"] == "parquet":
+        frame.to_parquet(tmp, index=False)
+    else:
+        frame.to_csv(tmp, index=False, date_format=schema.DATE_FORMAT)
+
+    tmp.replace(path)
+    return path
+
+
+def _write_chunks(run: dict, symbol: str, csv_path: Path, chunk_rows: int) -> tuple[Path, dict]:
+    """
+    _write_frame for processing.chunk_rows: each parsed chunk is appended to
+    the output as it is read. Returns (path, metrics) - see processor.stream_csv.
+    """
+    path = run["out"] / f"{symbol}.{run['format']}"
+    tmp = path.with_name(path.name + ".tmp")
+
+    try:
+        if run["format"] == "parquet":
+            writer = None
+
+            def write(chunk):
+                nonlocal writer
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(tmp, table.schema)
+                writer.write_table(table)
+
+            try:
+                metrics = processor.stream_csv(csv_path, chunk_rows, write)
+            finally:
+                if writer is not None:
+                    writer.close()
+        else:
+            with tmp.open("w", encoding="utf-8", newline="") as f:
+                metrics = processor.stream_csv(
+                    csv_path, chunk_rows,
+                    lambda chunk: chunk.to_csv(f, header=f.tell() == 0, index=False, date_format=schema.DATE_FORMAT),
+                )
+
+        tmp.replace(path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+    return path, metrics
+
+
+def _record(run: dict, record: dict) -> None:
+    """
+    Append to progress.jsonl (flushed per symbol - the resume point) and
+    log progress every batch.progress_seconds.
+    """
+    with run["lock"]:
+        with run["progress_path"].open("a", encoding="utf-8") as f:
+            f.write(json.dumps(record, default=str) + "\n")
+
+        run["records"][record["symbol"]] = record
+        run["counts"][record["status"]] += 1
+        run["rows"] += record["rows"]
+        run["bytes"] += record.get("bytes", 0)
+
+        now = time.perf_counter()
+        if now - run["last_progress"] >= run["progress_seconds"]:
+            run["last_progress"] = now
+            log_progress(run, now)
+
+
+def log_progress(run: dict, now: float) -> None:
+    done = sum(run["counts"].values())
+    total = len(run["symbols"]) - run["resumed"]
+    rate = done / max(now - run["started"], 1e-9)
+    eta = (total - done) / rate if rate else 0
+
+    logging.getLogger("batch").info(
+        f"📦 [{done}/{total}] {done / max(total, 1):.0%} | ok {run['counts']['ok']}, "
+        f"no data {run['counts']['no_data']}, failed {run['counts']['failed']} "
+        f"| {rate:.2f} symbols/s | ETA {eta:.0f}s"
+    )
+
+
+# ---------------------------------------------------------------------
+# Summary / Report
+# ---------------------------------------------------------------------
+def write_summary(run: dict) -> Path:
+    """
+    summary.csv: one row per requested symbol that has a record,
+    including those finished by earlier (resumed) runs.
+    """
+    import pandas as pd
+
+    rows = [run["records"][s] for s in run["symbols"] if s in run["records"]]
+    summary = pd.DataFrame(rows).reindex(columns=SUMMARY_COLUMNS)
+
+    path = run["out"] / "summary.csv"
+    tmp = path.with_name(path.name + ".tmp")
+    summary.to_csv(tmp, index=False)
+    tmp.replace(path)
+    return path
+
+
+def report(run: dict) -> dict:
+    elapsed = time.perf_counter() - run["started"]
+    processed = sum(run["counts"].values())
+
+    return {
+        "symbols": len(run["symbols"]),
+        "resumed": run["resumed"],
+        "processed": processed,
+        **run["counts"],
+        "remaining": len(pending(run)),
+        "rows": run["rows"],
+        "bytes": run["bytes"],
+        "elapsed_seconds": round(elapsed, 2),
+        "symbols_per_second": round(processed / elapsed, 2) if elapsed else 0.0,
+        "rows_per_second": round(run["rows"] / elapsed, 1) if elapsed else 0.0,
+        "interrupted": run["interrupted"],
+        "out": str(run["out"]),
+    }
+
+
+def log_report(report: dict) -> None:
+    logger = logging.getLogger("batch")
+
+    logger.info("=" * 60)
+    logger.info(
+        f"Batch {'interrupted' if report['interrupted'] else 'finished'} in {report['elapsed_seconds']:.1f}s: "
+        f"{report['processed']} processed ({report['ok']} ok, {report['no_data']} no data, "
+        f"{report['failed']} failed), {report['resumed']} done earlier, {report['remaining']} remaining"
+    )
+    logger.info(
+        f"⏱️ Throughput: {report['symbols_per_second']:.2f} symbols/s | "
+        f"{report['rows_per_second']:,.0f} rows/s | {report['rows']:,} rows | "
+        f"{report['bytes'] / 1024 / 1024:.1f} MB written"
+    )
+    logger.info(f"Results: {report['out']} (summary.csv)")
+    if report["remaining"]:
+        logger.info("Run the same command again to resume")
+    logger.info("=" * 60)
@@ -0,0 +1,236 @@
+"""
+Full-market daily bhavcopy ingestion (sec_bhavdata_full).
+
+One file per trading day carries price, volume and deliverable quantity
+for every security, so a cross-sectional screen costs one request per day
+instead of one per symbol. Rows are mapped to the priceVolumeDeliverable
+layout and merged into the same history store that fetch_csv uses.
+"""
+
+import io
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import pandas as pd
+
+from modules import history_store, nse_client, schema
+
+
+# sec_bhavdata_full column -> priceVolumeDeliverable column
+COLUMN_MAP = {
+    "SYMBOL": "Symbol",
+    "SERIES": "Series",
+    "DATE1": "Date",
+    "PREV_CLOSE": "Prev Close",
+    "OPEN_PRICE": "Open Price",
+    "HIGH_PRICE": "High Price",
+    "LOW_PRICE": "Low Price",
+    "LAST_PRICE": "Last Price",
+    "CLOSE_PRICE": "Close Price",
+    "AVG_PRICE": "Average Price",
+    "TTL_TRD_QNTY": "Total Traded Quantity",
+    "TURNOVER_LACS": "Turnover ₹",
+    "NO_OF_TRADES": "No. of Trades",
+    "DELIV_QTY": "Deliverable Qty",
+    "DELIV_PER": "% Dly Qt to Traded Qty",
+}
+
+HOLIDAY = "HOLIDAY"
+
+
+class BhavcopyError(Exception):
+    pass
+
+
+def ingest_range(state: dict, from_date: date, to_date: date) -> dict:
+    """
+    Download and store every trading day in [from_date, to_date].
+
+    Days already ingested (or known holidays) are skipped. Returns a summary:
+    {"days": fetched, "holidays": n, "skipped": n, "symbols": n, "rows": n}.
+    Raises BhavcopyError if any day could not be fetched; days that did
+    succeed are stored first.
+    """
+    logger = logging.getLogger("bhavcopy")
+    config = state["config"]
+
+    manifest = _load_manifest(config)
+    days = [
+        from_date + timedelta(days=i)
+        for i in range((to_date - from_date).days + 1)
+    ]
+    wanted = [d for d in days if d.weekday() < 5 and d.isoformat() not in manifest]
+
+    summary = {"days": 0, "holidays": 0, "skipped": len(days) - len(wanted), "symbols": 0, "rows": 0}
+
+    if not wanted:
+        logger.info(f"Bhavcopy already ingested: {from_date} → {to_date}")
+        return summary
+
+    logger.info(f"Fetching {len(wanted)} bhavcopy day(s): {from_date} → {to_date}")
+    workers = config["nse"].get("max_workers", 4)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bhavcopy") as executor:
+        results = dict(zip(wanted, executor.map(lambda d: _fetch_day_safe(state, d), wanted)))
+
+    frames = {d: r for d, r in results.items() if isinstance(r, pd.DataFrame)}
+    holidays = [d for d, r in results.items() if r is HOLIDAY]
+    failed = [d for d, r in results.items() if isinstance(r, Exception)]
+
+    # Store each contiguous run of resolved days; failures split the runs.
+    # A published file is the full day, so today is covered once its file
+    # is in - a missing one may just not be out yet.
+    today = date.today()
+    for run_start, run_end in _resolved_runs(days, set(failed)):
+        run_frames = [f for d, f in frames.items() if run_start <= d <= run_end]
+        if not run_frames:
+            continue
+        run_end = min(run_end, today if today in frames else today - timedelta(days=1))
+        stored = _store_frames(config, pd.concat(run_frames, ignore_index=True), run_start, run_end)
+        summary["symbols"] = max(summary["symbols"], stored["symbols"])
+        summary["rows"] += stored["rows"]
+
+    for d in frames:
+        manifest[d.isoformat()] = "OK"
+    for d in holidays:
+        if d < today:
+            manifest[d.isoformat()] = HOLIDAY
+    _save_manifest(config, manifest)
+
+    summary["days"] = len(frames)
+    summary["holidays"] = len(holidays)
+    logger.info(
+        f"Bhavcopy ingested: {summary['days']} day(s), {summary['holidays']} holiday(s), "
+        f"{summary['rows']} rows"
+    )
+
+    if failed:
+        raise BhavcopyError(f"{len(failed)} day(s) failed: {', '.join(d.isoformat() for d in failed)}")
+
+    return summary
+
+
+def fetch_day(state: dict, day: date) -> pd.DataFrame | str:
+    """
+    Download one day's file; returns rows in priceVolumeDeliverable layout
+    or HOLIDAY when the archive has no file for that date.
+    """
+    nse_config = state["config"]["nse"]
+    url = nse_config["bhavcopy_url"].format(date=day.strftime("%d%m%Y"))
+
+    pool = nse_client.get_session(state)
+    nse_client.get_rate_limiter(state).acquire()
+
+    started = time.perf_counter()
+    response = pool["session"].get(url, timeout=nse_config.get("timeout_seconds", 20))
+
+    if response.status_code == 404:
+        return HOLIDAY
+
+    response.raise_for_status()
+
+    if response.content[:100].lower().lstrip().startswith((b"<html", b"<!doctype")):
+        raise BhavcopyError(f"Received HTML instead of CSV for {day}")
+
+    df = parse(response.content)
+    logging.getLogger("bhavcopy").debug(
+        f"Bhavcopy {day}: {len(df)} rows in {(time.perf_counter() - started) * 1000:.0f}ms"
+    )
+    return df
+
+
+def parse(content: bytes) -> pd.DataFrame:
+    """
+    Parse a sec_bhavdata_full CSV into typed priceVolumeDeliverable columns.
+    """
+    df = pd.read_csv(io.BytesIO(content), dtype=str, keep_default_na=False)
+    df.columns = [c.strip() for c in df.columns]
+
+    missing = set(COLUMN_MAP) - set(df.columns)
+    if missing:
+        raise BhavcopyError(f"Bhavcopy missing columns: {sorted(missing)}")
+
+    try:
+        df = schema.coerce(df[list(COLUMN_MAP)].rename(columns=COLUMN_MAP))
+    except schema.SchemaError as e:
+        raise BhavcopyError(f"Bhavcopy does not match schema: {e}")
+
+    # Archive reports turnover in lakhs; the per-symbol CSV uses rupees
+    df["Turnover ₹"] = (df["Turnover ₹"] * 100000).round(2)
+
+    return df
+
+
+def _fetch_day_safe(state: dict, day: date):
+    try:
+        return fetch_day(state, day)
+    except Exception as e:
+        logging.getLogger("bhavcopy").warning(f"Bhavcopy {day} failed: {e}")
+        return e
+
+
+def _store_frames(config: dict, df: pd.DataFrame, run_start: date, run_end: date) -> dict:
+    """
+    Split market-wide rows by symbol and merge each into the history store,
+    covering run_start..run_end (today included).
+    """
+    symbols = 0
+    for symbol, rows in df.groupby("Symbol", sort=False):
+        history_store.ingest_frame(
+            config, symbol, rows.reset_index(drop=True), run_start, run_end, include_today=True
+        )
+        symbols += 1
+
+    return {"symbols": symbols, "rows": len(df)}
+
+
+def _resolved_runs(days: list[date], failed: set[date]) -> list[tuple[date, date]]:
+    """
+    Contiguous (start, end) runs of days, broken at failed days.
+    """
+    runs = []
+    start = None
+
+    for d in days:
+        if d in failed:
+            if start is not None:
+                runs.append((start, prev))
+            start = None
+            continue
+        if start is None:
+            start = d
+        prev = d
+
+    if start is not None:
+        runs.append((start, prev))
+
+    return runs
+
+
+# ---------------------------------------------------------------------
+# Manifest
+# ---------------------------------------------------------------------
+def _manifest_path(config: dict):
+    return history_store.symbol_folder(config, "_bhavcopy") / "days.json"
+
+
+def _load_manifest(config: dict) -> dict:
+    path = _manifest_path(config)
+    if not path.exists():
+        return {}
+
+    with path.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_manifest(config: dict, manifest: dict) -> None:
+    path = _manifest_path(config)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    tmp = path.with_suffix(".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    tmp.replace(path)
@@ -0,0 +1,365 @@
+"""
+Data-folder catalog - indexed downloads and cache files with LRU eviction.
+
+Every artifact the pipeline writes (downloaded CSVs, result cache files)
+is recorded in an in-memory index persisted as a JSON manifest
+(data.catalog.manifest, default {data.folder}/catalog.json):
+
+    {"version": 1, "entries": {"csv/INFY_01012025_31012025.csv":
+        {"path": ..., "kind": "csv", "size": 48211, "created": ..., "accessed": ..., "expires_at": null}}}
+
+Each kind has its own disk budget (csv: data.catalog.disk_max_mb, result:
+data.result_cache.disk_max_mb). Adding a file evicts the least recently
+used files of that kind until the kind is back under budget. Files held
+by in-flight transactions (resources['active_csvs']) are never evicted.
+
+Nothing on the hot path lists a directory: lookups, adds and evictions
+work on the index, and the manifest is rewritten at most every
+data.catalog.flush_seconds. The folders are scanned once per process, on
+first use, to reconcile the manifest with what is on disk.
+
+Downloads stay reusable: a CSV for a purely historical range is served
+again until evicted; ranges that include today expire after
+data.catalog.ttl_live_seconds.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from pathlib import Path
+
+
+MANIFEST_VERSION = 1
+CSV = "csv"
+RESULT = "result"
+
+# Guards first-use creation (init_state pre-seeds the slot with None)
+_CREATE_LOCK = threading.Lock()
+
+
+class CatalogError(Exception):
+    pass
+
+
+def is_enabled(config: dict) -> bool:
+    return config["data"].get("catalog", {}).get("enabled", False)
+
+
+def get_catalog(state: dict) -> dict:
+    """
+    Return the shared catalog from state['resources'], loading the manifest on first use.
+    """
+    resources = state["resources"]
+    catalog = resources.get("catalog")
+    if catalog is None:
+        with _CREATE_LOCK:
+            catalog = resources.get("catalog")
+            if catalog is None:
+                catalog = resources["catalog"] = _load(state["config"])
+    return catalog
+
+
+def _new_catalog(config: dict) -> dict:
+    data_cfg = config["data"]
+    catalog_cfg = data_cfg.get("catalog", {})
+    cache_cfg = data_cfg.get("result_cache", {})
+
+    return {
+        "path": Path(catalog_cfg.get("manifest", Path(data_cfg["folder"]) / "catalog.json")),
+        "budgets": {
+            CSV: int(catalog_cfg.get("disk_max_mb", 256) * 1024 * 1024),
+            RESULT: int(cache_cfg.get("disk_max_mb", 512) * 1024 * 1024),
+        },
+        "ttl_live": catalog_cfg.get("ttl_live_seconds", 300),
+        "flush_seconds": catalog_cfg.get("flush_seconds", 30),
+        "entries": OrderedDict(),    # key -> entry, least recently used first
+        "totals": {},                # kind -> bytes
+        "lock": threading.Lock(),
+        "dirty": False,
+        "saved_at": 0.0,
+        "stats": {"hits": 0, "misses": 0, "expired": 0, "added": 0, "evicted": 0, "evicted_bytes": 0},
+    }
+
+
+# ---------------------------------------------------------------------
+# Lookup / Add
+# ---------------------------------------------------------------------
+def entry_key(kind: str, path: Path) -> str:
+    return f"{kind}/{Path(path).name}"
+
+
+def includes_today(to_date: str) -> bool:
+    try:
+        return datetime.strptime(to_date.strip(), "%d-%m-%Y").date() >= date.today()
+    except (AttributeError, ValueError):
+        return True
+
+
+def reuse_csv(state: dict, csv_path: Path) -> bool:
+    """
+    True if csv_path is a cataloged, unexpired download (marks it used).
+    Expired or vanished entries are dropped.
+    """
+    logger = logging.getLogger("catalog")
+    catalog = get_catalog(state)
+    key = entry_key(CSV, csv_path)
+
+    with catalog["lock"]:
+        entry = catalog["entries"].get(key)
+        if entry is None:
+            catalog["stats"]["misses"] += 1
+            return False
+
+        expired = entry["expires_at"] is not None and entry["expires_at"] <= time.time()
+        if expired or not Path(entry["path"]).exists():
+            _drop(catalog, key, delete=expired)
+            catalog["stats"]["expired" if expired else "misses"] += 1
+            return False
+
+        _touch(catalog, key)
+        catalog["stats"]["hits"] += 1
+
+    logger.info(f"♻️ Reusing downloaded CSV: {Path(csv_path).name}")
+    _maybe_flush(catalog)
+    return True
+
+
+def add(state: dict, kind: str, path: Path, live: bool = False) -> None:
+    """
+    Record a file just written (replacing any previous entry for it), then
+    evict least recently used files of that kind over the budget.
+    live: the content covers today - expires after ttl_live_seconds.
+    """
+    catalog = get_catalog(state)
+    path = Path(path)
+
+    try:
+        size = path.stat().st_size
+    except FileNotFoundError:
+        return
+
+    now = time.time()
+    key = entry_key(kind, path)
+
+    with catalog["lock"]:
+        if key in catalog["entries"]:
+            _drop(catalog, key, delete=False)
+        catalog["entries"][key] = {
+            "path": str(path),
+            "kind": kind,
+            "size": size,
+            "created": now,
+            "accessed": now,
+            "expires_at": now + catalog["ttl_live"] if live else None,
+        }
+        catalog["totals"][kind] = catalog["totals"].get(kind, 0) + size
+        catalog["stats"]["added"] += 1
+        catalog["dirty"] = True
+
+        _evict_kind(state, catalog, kind)
+
+    _maybe_flush(catalog)
+
+
+def touch(state: dict, kind: str, path: Path) -> None:
+    """
+    Mark a cataloged file as just used.
+    """
+    catalog = get_catalog(state)
+    key = entry_key(kind, path)
+
+    with catalog["lock"]:
+        if key in catalog["entries"]:
+            _touch(catalog, key)
+
+    _maybe_flush(catalog)
+
+
+def discard(state: dict, kind: str, path: Path) -> None:
+    """
+    Forget a file that was deleted elsewhere (e.g. an expired cache entry).
+    """
+    catalog = get_catalog(state)
+
+    with catalog["lock"]:
+        if entry_key(kind, path) in catalog["entries"]:
+            _drop(catalog, entry_key(kind, path), delete=False)
+
+
+# ---------------------------------------------------------------------
+# Eviction
+# ---------------------------------------------------------------------
+def evict(state: dict) -> int:
+    """
+    Bring every kind under its budget. Returns files deleted.
+    """
+    catalog = get_catalog(state)
+
+    with catalog["lock"]:
+        before = catalog["stats"]["evicted"]
+        for kind in list(catalog["totals"]):
+            _evict_kind(state, catalog, kind)
+        evicted = catalog["stats"]["evicted"] - before
+
+    _maybe_flush(catalog)
+    return evicted
+
+
+def _evict_kind(state: dict, catalog: dict, kind: str) -> None:
+    """
+    Caller holds the lock.
+    """
+    budget = catalog["budgets"].get(kind)
+    if budget is None or catalog["totals"].get(kind, 0) <= budget:
+        return
+
+    logger = logging.getLogger("catalog")
+    active = {str(p) for p in list(state["resources"].get("active_csvs", ()))}
+
+    for key in [k for k, e in catalog["entries"].items() if e["kind"] == kind]:
+        if catalog["totals"][kind] <= budget:
+            break
+
+        entry = catalog["entries"][key]
+        if entry["path"] in active:
+            continue
+
+        _drop(catalog, key, delete=True)
+        catalog["stats"]["evicted"] += 1
+        catalog["stats"]["evicted_bytes"] += entry["size"]
+        logger.debug(f"Evicted {key} ({entry['size']} bytes)")
+
+
+def _touch(catalog: dict, key: str) -> None:
+    catalog["entries"][key]["accessed"] = time.time()
+    catalog["entries"].move_to_end(key)
+    catalog["dirty"] = True
+
+
+def _drop(catalog: dict, key: str, delete: bool) -> None:
+    entry = catalog["entries"].pop(key)
+    catalog["totals"][entry["kind"]] -= entry["size"]
+    catalog["dirty"] = True
+
+    if delete:
+        try:
+            Path(entry["path"]).unlink(missing_ok=True)
+        except OSError as e:
+            logging.getLogger("catalog").warning(f"Failed to delete {entry['path']}: {e}")
+
+
+# ---------------------------------------------------------------------
+# Manifest
+# ---------------------------------------------------------------------
+def _load(config: dict) -> dict:
+    """
+    Read the manifest and reconcile it with what is on disk - the one
+    directory scan, once per process.
+    """
+    logger = logging.getLogger("catalog")
+    catalog = _new_catalog(config)
+
+    try:
+        with catalog["path"].open("r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != MANIFEST_VERSION:
+            raise CatalogError(f"Manifest version {data.get('version')}")
+        entries = data["entries"]
+    except FileNotFoundError:
+        entries = {}
+    except (OSError, ValueError, KeyError, CatalogError) as e:
+        logger.warning(f"Catalog manifest unreadable ({e}) - rebuilding")
+        entries = {}
+
+    on_disk = _scan(config)
+    adopted = {key: entry for key, entry in on_disk.items() if key not in entries}
+    kept = {key: dict(entry, size=on_disk[key]["size"]) for key, entry in entries.items() if key in on_disk}
+    catalog["dirty"] = bool(adopted) or len(kept) != len(entries)
+
+    for key, entry in sorted({**kept, **adopted}.items(), key=lambda item: item[1]["accessed"]):
+        catalog["entries"][key] = entry
+        catalog["totals"][entry["kind"]] = catalog["totals"].get(entry["kind"], 0) + entry["size"]
+
+    logger.info(
+        f"Catalog: {len(catalog['entries'])} files ({len(adopted)} adopted, "
+        f"{len(entries) - len(kept)} missing) | "
+        + ", ".join(f"{kind} {size / 1024 / 1024:.1f} MB" for kind, size in catalog["totals"].items())
+    )
+    return catalog
+
+
+def _scan(config: dict) -> dict:
+    """
+    Entries for the CSVs and result cache files currently on disk.
+    Files the manifest does not know are adopted as already expired
+    (their range is unknown), so they are evictable but never reused.
+    """
+    data_cfg = config["data"]
+    cache_cfg = data_cfg.get("result_cache", {})
+    equity_list = Path(config.get("screener", {}).get("equity_list", "data/nse_equity_list.CSV")).name.lower()
+
+    found = [(CSV, p) for p in Path(data_cfg["folder"]).glob("*.[cC][sS][vV]") if p.name.lower() != equity_list]
+    if cache_cfg.get("enabled", False):
+        result_folder = Path(cache_cfg.get("folder", Path(data_cfg["folder"]) / "cache"))
+        found += [(RESULT, p) for p in result_folder.glob("*.pkl")]
+
+    entries = {}
+    for kind, path in found:
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            continue
+        entries[entry_key(kind, path)] = {
+            "path": str(path), "kind": kind, "size": st.st_size,
+            "created": st.st_mtime, "accessed": st.st_mtime,
+            "expires_at": st.st_mtime if kind == CSV else None,
+        }
+    return entries
+
+
+def flush(state: dict) -> None:
+    """
+    Write the manifest if anything changed (call at shutdown).
+    """
+    catalog = state["resources"].get("catalog")
+    if catalog is not None:
+        _save(catalog)
+
+
+def _maybe_flush(catalog: dict) -> None:
+    """
+    Save at most every flush_seconds. After a crash the next start's
+    reconcile adopts files added since and drops ones already deleted.
+    """
+    if catalog["dirty"] and time.monotonic() - catalog["saved_at"] >= catalog["flush_seconds"]:
+        _save(catalog)
+
+
+def _save(catalog: dict) -> None:
+    with catalog["lock"]:
+        if not catalog["dirty"]:
+            return
+        payload = {"version": MANIFEST_VERSION, "entries": dict(catalog["entries"])}
+        catalog["dirty"] = False
+        catalog["saved_at"] = time.monotonic()
+
+        try:
+            catalog["path"].parent.mkdir(parents=True, exist_ok=True)
+            tmp = catalog["path"].with_name(catalog["path"].name + ".tmp")
+            tmp.write_text(json.dumps(payload, separators=(",", ":")), encoding="utf-8")
+            tmp.replace(catalog["path"])
+        except OSError as e:
+            catalog["dirty"] = True
+            logging.getLogger("catalog").warning(f"Catalog manifest write failed: {e}")
+
+
+def stats(state: dict) -> dict:
+    catalog = get_catalog(state)
+    with catalog["lock"]:
+        s = dict(catalog["stats"])
+        s["files"] = len(catalog["entries"])
+        s["bytes"] = dict(catalog["totals"])
+    return s
@@ -0,0 +1,244 @@
+"""
+Local history store for NSE priceVolumeDeliverable rows.
+
+Layout under data.store.folder:
+    {SYMBOL}/{YEAR}.parquet   - daily rows, one file per calendar year
+    {SYMBOL}/coverage.json    - calendar date ranges already fetched
+
+Coverage is tracked in calendar days (holidays and weekends included), so a
+request only goes to NSE for the sub-ranges that have never been fetched.
+
+Rows are stored with the typed schema from modules.schema. Year files written
+by older versions (all-text columns plus a _date helper, or float32 prices)
+are converted on read.
+"""
+
+import json
+import logging
+import threading
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+from modules import schema
+
+
+DATE_COLUMN = "Date"
+LEGACY_DATE_COLUMN = "_date"
+NSE_DATE_FORMAT = schema.DATE_FORMAT
+KEY_COLUMNS = ["Series", DATE_COLUMN]
+
+# One writer at a time - year files are rewritten on merge
+_LOCK = threading.Lock()
+
+
+class StoreError(Exception):
+    pass
+
+
+def is_enabled(config: dict) -> bool:
+    return config["data"].get("store", {}).get("enabled", False)
+
+
+def symbol_folder(config: dict, symbol: str) -> Path:
+    store_cfg = config["data"].get("store", {})
+    root = Path(store_cfg.get("folder", Path(config["data"]["folder"]) / "store"))
+    return root / symbol.upper()
+
+
+# ---------------------------------------------------------------------
+# Coverage
+# ---------------------------------------------------------------------
+def load_coverage(config: dict, symbol: str) -> list[tuple[date, date]]:
+    """
+    Return sorted, merged (start, end) date ranges held for symbol.
+    """
+    path = symbol_folder(config, symbol) / "coverage.json"
+    if not path.exists():
+        return []
+
+    with path.open("r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    return [(date.fromisoformat(a), date.fromisoformat(b)) for a, b in data["ranges"]]
+
+
+def missing_ranges(config: dict, symbol: str, from_date: date, to_date: date) -> list[tuple[date, date]]:
+    """
+    Sub-ranges of [from_date, to_date] not yet covered by the store.
+
+    Gaps made only of weekend days are dropped - NSE has nothing to serve.
+    """
+    gaps = []
+    cursor = from_date
+
+    for start, end in load_coverage(config, symbol):
+        if end < cursor:
+            continue
+        if start > to_date:
+            break
+        if start > cursor:
+            gaps.append((cursor, min(start - timedelta(days=1), to_date)))
+        cursor = max(cursor, end + timedelta(days=1))
+        if cursor > to_date:
+            break
+
+    if cursor <= to_date:
+        gaps.append((cursor, to_date))
+
+    return [(a, b) for a, b in gaps if _has_weekday(a, b)]
+
+
+def _has_weekday(start: date, end: date) -> bool:
+    days = (end - start).days + 1
+    return days >= 7 or any((start + timedelta(days=i)).weekday() < 5 for i in range(days))
+
+
+def _save_coverage(config: dict, symbol: str, ranges: list[tuple[date, date]]) -> None:
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + timedelta(days=1):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+
+    path = symbol_folder(config, symbol) / "coverage.json"
+    tmp = path.with_suffix(".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump({"ranges": [[a.isoformat(), b.isoformat()] for a, b in merged]}, f)
+    tmp.replace(path)
+
+
+# ---------------------------------------------------------------------
+# Ingest / Export
+# ---------------------------------------------------------------------
+def ingest_csv(config: dict, symbol: str, csv_path: Path, from_date: date, to_date: date) -> int:
+    """
+    Merge a downloaded NSE CSV into the store and mark its range covered.
+
+    Returns number of rows ingested.
+    """
+    try:
+        df = schema.read_nse_csv(csv_path)
+    except schema.SchemaError as e:
+        raise StoreError(f"Cannot ingest {Path(csv_path).name}: {e}")
+    return ingest_frame(config, symbol, df, from_date, to_date)
+
+
+def ingest_frame(
+    config: dict, symbol: str, df: pd.DataFrame, from_date: date, to_date: date, include_today: bool = False
+) -> int:
+    """
+    Merge NSE-format rows into the year files and extend coverage.
+
+    Coverage stops before today - the current session may still change -
+    unless include_today is set (rows from a published end-of-day file).
+    """
+    try:
+        df = schema.coerce(df)
+    except schema.SchemaError as e:
+        raise StoreError(f"Unexpected rows for {symbol}: {e}")
+
+    df = df.dropna(subset=[DATE_COLUMN])
+
+    folder = symbol_folder(config, symbol)
+
+    with _LOCK:
+        folder.mkdir(parents=True, exist_ok=True)
+
+        for year, rows in df.groupby(df[DATE_COLUMN].dt.year):
+            path = folder / f"{year}.parquet"
+            if path.exists():
+                rows = schema.concat([_read_year(path), rows])
+            rows = (
+                rows.drop_duplicates(subset=KEY_COLUMNS, keep="last")
+                .sort_values(DATE_COLUMN, kind="stable")
+            )
+            rows.to_parquet(path, index=False)
+
+        _extend_coverage(config, symbol, from_date, to_date, include_today)
+
+    logging.getLogger("history_store").debug(
+        f"Stored {len(df)} rows for {symbol} ({from_date} → {to_date})"
+    )
+    return len(df)
+
+
+def mark_covered(config: dict, symbol: str, from_date: date, to_date: date) -> None:
+    """
+    Record [from_date, to_date] as fetched without adding rows - for ranges
+    NSE has nothing to serve (holidays). Today is never covered.
+    """
+    with _LOCK:
+        symbol_folder(config, symbol).mkdir(parents=True, exist_ok=True)
+        _extend_coverage(config, symbol, from_date, to_date)
+
+
+def _extend_coverage(
+    config: dict, symbol: str, from_date: date, to_date: date, include_today: bool = False
+) -> None:
+    # Caller holds _LOCK
+    covered_to = to_date if include_today else min(to_date, date.today() - timedelta(days=1))
+    if covered_to >= from_date:
+        ranges = load_coverage(config, symbol)
+        ranges.append((from_date, covered_to))
+        _save_coverage(config, symbol, ranges)
+
+
+def load_range(config: dict, symbol: str, from_date: date, to_date: date) -> pd.DataFrame:
+    """
+    Read stored rows for [from_date, to_date] in date order.
+    """
+    folder = symbol_folder(config, symbol)
+    frames = []
+
+    with _LOCK:
+        for year in range(from_date.year, to_date.year + 1):
+            path = folder / f"{year}.parquet"
+            if path.exists():
+                frames.append(_read_year(path))
+
+    if not frames:
+        return pd.DataFrame()
+
+    df = schema.concat(frames)
+    in_range = df[DATE_COLUMN].between(pd.Timestamp(from_date), pd.Timestamp(to_date))
+    return df[in_range].sort_values(DATE_COLUMN, kind="stable").reset_index(drop=True)
+
+
+def export_csv(config: dict, symbol: str, from_date: date, to_date: date, dest: Path) -> int:
+    """
+    Write stored rows for the range as an NSE-format CSV.
+
+    Returns number of rows written.
+    """
+    df = load_range(config, symbol, from_date, to_date)
+    if df.empty:
+        raise StoreError(f"No stored rows for {symbol} ({from_date} → {to_date})")
+
+    df.to_csv(dest, index=False, date_format=NSE_DATE_FORMAT, float_format="%.2f")
+    return len(df)
+
+
+def _read_year(path: Path) -> pd.DataFrame:
+    df = pd.read_parquet(path)
+    if LEGACY_DATE_COLUMN in df.columns:
+        df = schema.coerce(df.drop(columns=[LEGACY_DATE_COLUMN]))
+
+    # float32 prices from older files: back to the 2-decimal float64 values
+    narrow = [col for col in df.columns if df[col].dtype == "float32"]
+    if narrow:
+        df[narrow] = df[narrow].astype("float64").round(2)
+    return df
+
+
+def parse_request_date(value: str) -> date:
+    """
+    Parse a DD-MM-YYYY request date.
+    """
+    return datetime.strptime(value, "%d-%m-%Y").date()
+
+
+def format_request_date(value: date) -> str:
+    return value.strftime("%d-%m-%Y")
@@ -4,20 +4,22 @@ System lifecycle management - Signal handlers and graceful shutdown.
 
 import signal
 import logging
+import threading
 
 
 def register_shutdown_handlers(state: dict) -> None:
     """
     Register SIGINT and SIGTERM handlers to enable graceful shutdown.
     
-    Sets state['resources']['shutdown_flag'] = True when triggered.
+    Sets state['resources']['shutdown_flag'] = True when triggered and
+    fires the shutdown event so any wait() in progress returns immediately.
     """
     logger = logging.getLogger("lifecycle")
     
     def shutdown_handler(signum, frame):
         sig_name = signal.Signals(signum).name
         logger.warning(f"Received {sig_name} - initiating graceful shutdown")
-        state["resources"]["shutdown_flag"] = True
+        _request_shutdown(state)
     
     # Register handlers
     signal.signal(signal.SIGINT, shutdown_handler)   # Ctrl+C
@@ -41,4 +43,43 @@ def initiate_shutdown(state: dict, reason: str = "Manual trigger") -> None:
     """
     logger = logging.getLogger("lifecycle")
     logger.warning(f"Shutdown initiated: {reason}")
-    state["resources"]["shutdown_flag"] = True
\ No newline at end of file
+    _request_shutdown(state)
+
+
+def wait(state: dict, timeout: float) -> bool:
+    """
+    Sleep up to timeout seconds, waking early on shutdown.
+
+    Returns True if shutdown was requested.
+    """
+    return shutdown_event(state).wait(timeout)
+
+
+def on_shutdown(state: dict, callback) -> None:
+    """
+    Call callback() when shutdown is requested - right away if it already
+    was. It runs on the requesting thread (signal handler or caller).
+    """
+    state["resources"].setdefault("shutdown_callbacks", []).append(callback)
+    if shutdown_event(state).is_set():
+        callback()
+
+
+def remove_shutdown_callback(state: dict, callback) -> None:
+    callbacks = state["resources"].get("shutdown_callbacks", [])
+    if callback in callbacks:
+        callbacks.remove(callback)
+
+
+def shutdown_event(state: dict) -> threading.Event:
+    """
+    The event set on shutdown (for waits outside this module).
+    """
+    return state["resources"].setdefault("shutdown_event", threading.Event())
+
+
+def _request_shutdown(state: dict) -> None:
+    state["resources"]["shutdown_flag"] = True
+    shutdown_event(state).set()
+    for callback in list(state["resources"].get("shutdown_callbacks", [])):
+        callback()
\ No newline at end of file
@@ -0,0 +1,302 @@
+"""
+Run metrics - stage timings, bytes, rows, Sheets calls, cache hits, errors.
+
+state.update_stage timestamps every stage change on the transaction;
+record_run() folds a finished run into process-wide counters and
+histograms. Everything is exposed in the Prometheus text format (0.0.4):
+- metrics.file: rewritten after every run (node_exporter textfile style)
+- metrics.port: optional local HTTP endpoint serving GET /metrics
+"""
+
+import http.server
+import logging
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+from modules import result_cache
+
+
+PREFIX = "nse_analytics_"
+
+# Seconds - NSE fetches run from ~100ms to a minute for long ranges
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SHEETS_CALL_BUCKETS = (1, 2, 3, 5, 10, 20, 50)
+
+HELP = {
+    "stage_duration_seconds": ("histogram", "Time spent per pipeline stage"),
+    "run_duration_seconds": ("histogram", "Total stage time per run"),
+    "run_sheets_calls": ("histogram", "Sheets API calls made by one run"),
+    "runs_total": ("counter", "Finished runs by outcome"),
+    "errors_total": ("counter", "Failed runs by exception class"),
+    "rows_processed_total": ("counter", "Data rows processed"),
+    "nse_bytes_downloaded_total": ("counter", "Bytes downloaded from NSE"),
+    "sheets_calls_total": ("counter", "Sheets API calls by priority"),
+    "sheets_rate_limited_total": ("counter", "Sheets 429 responses"),
+    "result_cache_lookups_total": ("counter", "Result cache lookups by result"),
+    "result_cache_hit_ratio": ("gauge", "Result cache hits / lookups"),
+}
+
+
+class MetricsError(Exception):
+    pass
+
+
+def is_enabled(config: dict) -> bool:
+    return config.get("metrics", {}).get("enabled", False)
+
+
+def get_registry(state: dict) -> dict:
+    """
+    Return the shared registry from state['resources'], creating it on first use.
+    """
+    resources = state.setdefault("resources", {})
+    registry = resources.get("metrics")
+    if registry is None:
+        registry = resources.setdefault("metrics", {
+            "lock": threading.Lock(),
+            "counters": {},          # (name, labels) -> value
+            "histograms": {},        # (name, labels) -> {"buckets", "counts", "sum", "count"}
+            "server": None,
+        })
+    return registry
+
+
+# ---------------------------------------------------------------------
+# Recording
+# ---------------------------------------------------------------------
+def inc(state: dict, name: str, value: float = 1, **labels) -> None:
+    registry = get_registry(state)
+    key = (name, tuple(sorted(labels.items())))
+    with registry["lock"]:
+        registry["counters"][key] = registry["counters"].get(key, 0) + value
+
+
+def observe(state: dict, name: str, value: float, buckets: tuple = DURATION_BUCKETS, **labels) -> None:
+    registry = get_registry(state)
+    key = (name, tuple(sorted(labels.items())))
+    with registry["lock"]:
+        hist = registry["histograms"].get(key)
+        if hist is None:
+            hist = registry["histograms"][key] = {
+                "buckets": buckets, "counts": [0] * len(buckets), "sum": 0.0, "count": 0,
+            }
+        for i, bound in enumerate(hist["buckets"]):
+            if value <= bound:
+                hist["counts"][i] += 1
+        hist["sum"] += value
+        hist["count"] += 1
+
+
+def record_run(state: dict) -> None:
+    """
+    Fold the finished transaction into the registry and refresh the file.
+    Never raises - metrics must not fail a run.
+    """
+    if not is_enabled(state["config"]):
+        return
+
+    try:
+        t = state["transaction"]
+        timings = stage_timings(t)
+        outcome = "error" if t.get("error") else "success"
+
+        for stage, seconds in timings.items():
+            observe(state, "stage_duration_seconds", seconds, stage=stage.lower())
+        observe(state, "run_duration_seconds", sum(timings.values()), outcome=outcome)
+        observe(state, "run_sheets_calls", t.get("sheets_calls", 0), buckets=SHEETS_CALL_BUCKETS)
+
+        inc(state, "runs_total", outcome=outcome)
+        inc(state, "rows_processed_total", (t.get("metrics") or {}).get("total_rows", 0) or 0)
+        if t.get("error"):
+            inc(state, "errors_total", **{"class": t.get("error_class") or "Unknown"})
+
+        write_file(state)
+
+    except Exception as e:
+        logging.getLogger("metrics").warning(f"Metrics update failed: {e}")
+
+
+def stage_timings(transaction: dict) -> dict:
+    """
+    Seconds per stage so far, including the stage still running.
+    """
+    timings = dict(transaction.get("stage_timings") or {})
+    stage, started = transaction.get("stage"), transaction.get("stage_started")
+
+    if started is not None and stage not in (None, "IDLE", "ERROR"):
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - started
+
+    return timings
+
+
+def stage_peaks(transaction: dict) -> dict:
+    """
+    Peak traced bytes per stage, including the stage still running.
+    Empty unless tracemalloc is tracing (profiling, benchmarks).
+    """
+    peaks = dict(transaction.get("stage_peak_bytes") or {})
+    stage = transaction.get("stage")
+
+    if tracemalloc.is_tracing() and transaction.get("stage_started") is not None and stage not in (None, "IDLE", "ERROR"):
+        peaks[stage] = max(peaks.get(stage, 0), tracemalloc.get_traced_memory()[1])
+
+    return peaks
+
+
+def timing_summary(transaction: dict) -> str:
+    """
+    One-line stage breakdown for SYSTEM_STATUS, e.g. "FETCHING 1.20s | PROCESSING 0.08s".
+    """
+    timings = stage_timings(transaction)
+    if not timings:
+        return "None"
+    return " | ".join(f"{stage} {seconds:.2f}s" for stage, seconds in timings.items())
+
+
+# ---------------------------------------------------------------------
+# Exposition
+# ---------------------------------------------------------------------
+def render(state: dict) -> str:
+    """
+    Prometheus text exposition of the registry plus live Sheets quota and
+    result cache counters.
+    """
+    _sync_external(state)
+    registry = get_registry(state)
+
+    with registry["lock"]:
+        counters = dict(registry["counters"])
+        histograms = {k: dict(v, counts=list(v["counts"])) for k, v in registry["histograms"].items()}
+
+    lines = []
+    for name, (kind, help_text) in HELP.items():
+        series = [(labels, v) for (n, labels), v in counters.items() if n == name]
+        hists = [(labels, h) for (n, labels), h in histograms.items() if n == name]
+        if not series and not hists:
+            continue
+
+        full = PREFIX + name
+        lines.append(f"# HELP {full} {help_text}")
+        lines.append(f"# TYPE {full} {kind}")
+
+        for labels, value in sorted(series):
+            lines.append(f"{full}{_labels(labels)} {_number(value)}")
+
+        for labels, h in sorted(hists, key=lambda item: item[0]):
+            for bound, count in zip(h["buckets"], h["counts"]):
+                lines.append(f"{full}_bucket{_labels(labels + (('le', _number(bound)),))} {count}")
+            lines.append(f"{full}_bucket{_labels(labels + (('le', '+Inf'),))} {h['count']}")
+            lines.append(f"{full}_sum{_labels(labels)} {_number(round(h['sum'], 6))}")
+            lines.append(f"{full}_count{_labels(labels)} {h['count']}")
+
+    return "\n".join(lines) + "\n"
+
+
+def _sync_external(state: dict) -> None:
+    """
+    Copy counters owned by other modules into the registry (as absolute values).
+    """
+    # gspread is heavy - metrics is imported before main.py's Sheets modules
+    from modules import sheets_api
+
+    registry = get_registry(state)
+    values = {}
+
+    if state["resources"].get("sheets_api") is not None:
+        quota = sheets_api.quota_stats(state)
+        values[("sheets_calls_total", (("priority", sheets_api.WRITE),))] = quota["write_calls"]
+        values[("sheets_calls_total", (("priority", sheets_api.POLL),))] = quota["poll_calls"]
+        values[("sheets_rate_limited_total", ())] = quota["rate_limited"]
+
+    if result_cache.is_enabled(state["config"]) and state["resources"].get("result_cache") is not None:
+        s = result_cache.stats(state)
+        values[("result_cache_lookups_total", (("result", "memory_hit"),))] = s["memory_hits"]
+        values[("result_cache_lookups_total", (("result", "disk_hit"),))] = s["disk_hits"]
+        values[("result_cache_lookups_total", (("result", "miss"),))] = s["misses"]
+        values[("result_cache_hit_ratio", ())] = s["hit_rate"]
+
+    with registry["lock"]:
+        registry["counters"].update(values)
+
+
+def _labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def write_file(state: dict) -> Path | None:
+    """
+    Atomically rewrite metrics.file (skipped when not configured).
+    """
+    path = state["config"].get("metrics", {}).get("file")
+    if not is_enabled(state["config"]) or not path:
+        return None
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(render(state), encoding="utf-8")
+    tmp.replace(path)
+    return path
+
+
+# ---------------------------------------------------------------------
+# HTTP endpoint
+# ---------------------------------------------------------------------
+def start_server(state: dict) -> int | None:
+    """
+    Serve GET /metrics on metrics.host:metrics.port in a daemon thread.
+    Returns the bound port, or None when disabled (port 0 / unset).
+    """
+    logger = logging.getLogger("metrics")
+    config = state["config"]
+    metrics_cfg = config.get("metrics", {})
+
+    if not is_enabled(config) or not metrics_cfg.get("port"):
+        return None
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render(state).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    try:
+        server = http.server.ThreadingHTTPServer((metrics_cfg.get("host", "127.0.0.1"), metrics_cfg["port"]), Handler)
+    except OSError as e:
+        raise MetricsError(f"Metrics endpoint unavailable on port {metrics_cfg['port']}: {e}")
+
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    get_registry(state)["server"] = server
+
+    host, port = server.server_address[:2]
+    logger.info(f"Metrics endpoint: http://{host}:{port}/metrics")
+    return port
+
+
+def stop_server(state: dict) -> None:
+    registry = state["resources"].get("metrics")
+    if registry and registry["server"] is not None:
+        registry["server"].shutdown()
+        registry["server"].server_close()
+        registry["server"] = None
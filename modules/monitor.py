@@ -4,13 +4,16 @@ Modern auth, strict validation, zero ambiguity.
 """
 
 import logging
+import threading
 import time
 from pathlib import Path
 
 import gspread
 from google.oauth2.service_account import Credentials
+from gspread.utils import absolute_range_name
 
-from modules import lifecycle, pipeline
+from modules import lifecycle, pipeline, request_table, result_cache, scheduler, sheets_api, sheets_io, stages
+from modules import state as state_mod
 
 
 # ---------------------------------------------------------------------
@@ -74,7 +77,7 @@ def connect_sheets(state: dict) -> None:
         client = gspread.authorize(creds)
 
         spreadsheet_id = sheets_cfg["spreadsheet_id"]
-        spreadsheet = client.open_by_key(spreadsheet_id)
+        spreadsheet = sheets_api.call(state, sheets_api.WRITE, client.open_by_key, spreadsheet_id)
 
         state["resources"]["sheets_client"] = client
         state["resources"]["spreadsheet"] = spreadsheet
@@ -96,72 +99,289 @@ def connect_sheets(state: dict) -> None:
 def poll_loop(state: dict) -> None:
     """
     Main monitoring loop - polls Google Sheets for trigger.
+
+    Waits between polls come from the adaptive scheduler and block on the
+    shutdown event, so SIGINT/SIGTERM wake the loop immediately.
     """
     logger = logging.getLogger("monitor")
 
-    poll_interval = state["config"]["google_sheets"]["poll_interval_seconds"]
-    logger.info(f"Monitoring started (poll interval: {poll_interval}s)")
+    sheets_cfg = state["config"]["google_sheets"]
+    stats_every = sheets_cfg.get("poll_stats_log_every", 100)
+    sched = scheduler.init_scheduler(state["config"])
+    logger.info(
+        f"Monitoring started (poll interval: {sched['min_interval']}s"
+        f" - {sched['max_interval']}s)"
+    )
+
+    # Staged mode: triggers are queued and polling continues while they run
+    staged = stages.is_enabled(state["config"])
+    if staged:
+        stages.start(state)
+
+    if request_table.is_enabled(state["config"]):
+        ensure_request_sheet(state)
 
     while lifecycle.is_running(state):
         try:
-            if check_trigger(state):
-                logger.info("🔔 Trigger detected - executing pipeline")
-                pipeline.run(state)
-
-            time.sleep(poll_interval)
+            read_at = time.monotonic()
+            requests = check_trigger(state)
+            if requests is None:
+                outcome = "error"
+            elif requests:
+                runnable = mark_requests(state, requests, read_at)
+                if staged:
+                    _submit_staged(state, runnable, read_at)
+                else:
+                    _run_requests(state, runnable)
+                outcome = "triggered"
+            else:
+                outcome = "idle"
+
+            if stats_every and state["resources"]["poll_stats"]["polls"] % stats_every == 0:
+                log_poll_stats(state)
 
         except KeyboardInterrupt:
             break
 
         except Exception as e:
             logger.error(f"Monitor loop error: {e}")
-            time.sleep(poll_interval)
+            outcome = "error"
+
+        delay = scheduler.next_delay(sched, outcome)
+        logger.debug(f"Next poll in {delay:.1f}s ({outcome})")
+        lifecycle.wait(state, delay)
 
+    if staged:
+        stages.stop(state, state["config"]["system"].get("shutdown_timeout_seconds", 10))
+
+    log_poll_stats(state)
     logger.info("Monitoring loop stopped")
 
 
+def mark_requests(state: dict, requests: list[dict], read_at: float | None = None) -> list[dict]:
+    """
+    Mark new REQUESTS rows QUEUED (and reject incomplete ones) in one
+    write, before anything runs - so a run's final status can't be
+    overwritten by the QUEUED mark. Returns the requests to run.
+
+    read_at (time.monotonic() before check_trigger) drops requests whose
+    staged run finished after the read: their TRUE was read before the
+    run reset it.
+    """
+    runnable = [r for r in requests if not r["error"]]
+    rejected = [r for r in requests if r["error"]]
+
+    if read_at is not None:
+        runnable = [r for r in runnable if not stages.is_in_flight(state, _request_key(r), read_at)]
+
+    queued = [
+        r for r in runnable
+        if r["row"] and r["status"] != request_table.QUEUED
+        and not stages.is_in_flight(state, _request_key(r))
+    ]
+
+    if queued or rejected:
+        try:
+            sheets_io.write_request_status(state, queued, rejected)
+        except Exception as e:
+            logging.getLogger("monitor").error(f"REQUESTS status update failed: {e}")
+
+    for r in rejected:
+        logging.getLogger("monitor").warning(f"REQUESTS row {r['row']} rejected: {r['error']}")
+
+    return runnable
+
+
+def _request_key(request: dict) -> tuple:
+    return stages.request_key(request["symbol"], request["from_date"], request["to_date"], request["row"])
+
+
+def _submit_staged(state: dict, requests: list[dict], read_at: float | None = None) -> None:
+    """
+    Hand the requests read by check_trigger to the staged pipeline.
+
+    Trigger cells stay TRUE until each run's write resets them, so later
+    polls see the same requests again - those are ignored as duplicates,
+    as is a TRUE read (at read_at) just before its run finished, and
+    requests refused for backpressure are retried the same way.
+    """
+    logger = logging.getLogger("monitor")
+    busy = 0
+
+    for r in requests:
+        outcome = stages.submit(
+            state, r["symbol"], r["from_date"], r["to_date"],
+            request_row=r["row"], output_sheet=r["output_sheet"], read_at=read_at,
+        )
+        if outcome == "queued":
+            logger.info(f"🔔 Trigger queued: {r['symbol']}" + (f" (row {r['row']})" if r["row"] else ""))
+        elif outcome == "busy":
+            busy += 1
+
+    if busy:
+        logger.warning(f"Pipeline queues full - {busy} trigger(s) will be retried")
+
+    state_mod.reset_transaction(state)
+
+
+def _run_requests(state: dict, requests: list[dict]) -> None:
+    """
+    Non-staged mode: run each request through the pipeline in turn.
+    """
+    logger = logging.getLogger("monitor")
+
+    for r in requests:
+        if not lifecycle.is_running(state):
+            break
+
+        state["transaction"].update({
+            "symbol": r["symbol"],
+            "from_date": r["from_date"],
+            "to_date": r["to_date"],
+            "request_row": r["row"],
+            "output_sheet": r["output_sheet"],
+        })
+        logger.info(f"🔔 Trigger detected - executing pipeline for {r['symbol']}")
+        _run_pipeline(state)
+
+
+def _run_pipeline(state: dict) -> None:
+    """
+    Run the pipeline in a worker thread so shutdown can bound its drain time.
+
+    On shutdown the in-flight run gets system.shutdown_timeout_seconds to
+    finish; after that the loop exits and the daemon thread is abandoned.
+    """
+    logger = logging.getLogger("monitor")
+
+    worker = threading.Thread(
+        target=pipeline.run, args=(state,), name="pipeline", daemon=True
+    )
+    worker.start()
+
+    while worker.is_alive():
+        worker.join(0.5)
+        if worker.is_alive() and not lifecycle.is_running(state):
+            timeout = state["config"]["system"].get("shutdown_timeout_seconds", 10)
+            logger.info(f"Draining in-flight pipeline run (up to {timeout}s)...")
+            worker.join(timeout)
+            if worker.is_alive():
+                logger.warning("Pipeline run did not finish before shutdown timeout")
+            return
+
+
 # ---------------------------------------------------------------------
 # Trigger Detection
 # ---------------------------------------------------------------------
-def check_trigger(state: dict) -> bool:
+def check_trigger(state: dict) -> list[dict] | None:
     """
-    Check if user trigger is active in CUSTOM_VIEW sheet.
+    Return the active requests: the CUSTOM_VIEW trigger and, when enabled,
+    every triggered REQUESTS row (see request_table.parse).
+
+    The control cells and the whole request table are read in a single
+    values.batchGet, so an idle poll costs one API call. Returns None when
+    the poll failed (quota or API error) so the scheduler can back off;
+    an empty list means nothing to do.
     """
     logger = logging.getLogger("monitor")
 
-    cfg = state["config"]["google_sheets"]
-    sheet_names = cfg["sheet_names"]
+    config = state["config"]
+    cfg = config["google_sheets"]
+    custom_view = cfg["sheet_names"]["custom_view"]
     cells = cfg["control_cells"]
 
+    resources = state["resources"]
+    calls_before = resources.get("sheets_api_calls", 0)
+
     try:
-        spreadsheet = state["resources"]["spreadsheet"]
-        sheet = spreadsheet.worksheet(sheet_names["custom_view"])
+        ranges = [
+            absolute_range_name(custom_view, cells[name])
+            for name in ("symbol", "from_date", "to_date", "trigger")
+        ]
+        table = request_table.is_enabled(config)
+        if table:
+            ranges.append(request_table.table_range(config))
+
+        response = sheets_api.call(state, sheets_api.POLL, resources["spreadsheet"].values_batch_get, ranges)
+        values = [vr.get("values", []) for vr in response.get("valueRanges", [])]
 
-        symbol = sheet.acell(cells["symbol"]).value
-        from_date = sheet.acell(cells["from_date"]).value
-        to_date = sheet.acell(cells["to_date"]).value
-        trigger = sheet.acell(cells["trigger"]).value
+        requests = []
+        symbol, from_date, to_date, trigger = (_first_value(v) for v in values[:4])
 
-        if trigger and trigger.strip().upper() in {"TRUE", "YES", "1", "X"}:
+        if trigger and trigger.strip().upper() in request_table.TRIGGER_VALUES:
             if not symbol or not from_date or not to_date:
                 logger.warning("Trigger active but inputs incomplete")
-                return False
+            else:
+                requests.append({
+                    "row": None,
+                    "symbol": symbol.strip().upper(),
+                    "from_date": from_date.strip(),
+                    "to_date": to_date.strip(),
+                    "status": None,
+                    "output_sheet": None,
+                    "error": None,
+                })
+                logger.debug(f"Trigger read: {symbol} ({from_date} → {to_date})")
+
+        if table and len(values) > 4:
+            requests.extend(request_table.parse(config, values[4]))
+
+        return requests
+
+    except sheets_api.SheetsQuotaError as e:
+        logger.warning(f"Trigger check skipped: {e}")
+        return None
 
-            state["transaction"]["symbol"] = symbol.strip().upper()
-            state["transaction"]["from_date"] = from_date.strip()
-            state["transaction"]["to_date"] = to_date.strip()
+    except Exception as e:
+        logger.error(f"Trigger check failed: {e}")
+        return None
 
-            logger.info(
-                f"Trigger accepted: {symbol} ({from_date} → {to_date})"
-            )
-            return True
+    finally:
+        stats = resources.setdefault("poll_stats", {"polls": 0, "api_calls": 0})
+        stats["polls"] += 1
+        stats["api_calls"] += resources.get("sheets_api_calls", 0) - calls_before
 
-        return False
 
-    except gspread.exceptions.WorksheetNotFound:
-        logger.error(f"Worksheet not found: {sheet_names['custom_view']}")
-        return False
+def ensure_request_sheet(state: dict) -> None:
+    """
+    Create the REQUESTS sheet (with its header row) on first use.
+    """
+    config = state["config"]
+    table_cfg = config["google_sheets"].get("request_table", {})
+    rows = table_cfg.get("first_row", 2) + table_cfg.get("max_rows", 50) - 1
 
+    try:
+        sheets_io.ensure_worksheet(
+            state, request_table.sheet_title(config), rows, len(request_table.HEADER),
+            header=request_table.HEADER,
+        )
     except Exception as e:
-        logger.error(f"Trigger check failed: {e}")
-        return False
+        logging.getLogger("monitor").error(f"REQUESTS sheet unavailable: {e}")
+
+
+def _first_value(value_range) -> str | None:
+    """
+    Extract the single cell value from a batch_get result (None if empty).
+    """
+    if value_range and value_range[0]:
+        return value_range[0][0]
+    return None
+
+
+def log_poll_stats(state: dict) -> None:
+    """
+    Report cumulative polling cost so read-quota usage can be verified.
+    """
+    stats = state["resources"].get("poll_stats", {})
+    polls = stats.get("polls", 0)
+    calls = stats.get("api_calls", 0)
+
+    if polls:
+        logging.getLogger("monitor").info(
+            f"Poll stats: {polls} polls, {calls} Sheets API calls "
+            f"({calls / polls:.2f} per poll)"
+        )
+        sheets_api.log_quota_stats(state)
+        if result_cache.is_enabled(state["config"]):
+            result_cache.log_stats(state)
+        stages.log_metrics(state)
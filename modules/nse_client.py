@@ -1,18 +1,36 @@
 """
 NSE Historical Data Fetcher - SACRED CODE
 DO NOT MODIFY THE FETCH SEQUENCE - This is the only version that works.
+
+The fetch around the API call (catalog, history store, chunked ranges,
+retries) is written once as coroutines over a transport: a dict with the
+single-call download, a runner for blocking work and a shutdown-aware
+wait. fetch_csv drives it with the requests transport below (downloads on
+worker threads); async_io awaits it with its aiohttp transport.
 """
 
+import asyncio
 import requests
 import logging
 import sys
+import threading
+import time
+from datetime import date, timedelta
 from pathlib import Path
 
+import pandas as pd
+from requests.adapters import HTTPAdapter
+
 # Allow standalone execution
 if __name__ == "__main__":
     sys.path.append(str(Path(__file__).parent.parent))
 
-from modules.utils import load_config, setup_logging
+from modules import catalog, history_store, lifecycle, metrics
+from modules.utils import RateLimiter, load_config, setup_logging
+
+
+# Chunk downloads of one transaction record their timing from several threads
+_TIMING_LOCK = threading.Lock()
 
 
 class NSEFetchError(Exception):
@@ -20,14 +38,32 @@ class NSEFetchError(Exception):
     pass
 
 
+class NSENoDataError(NSEFetchError):
+    """Raised when NSE has no rows for the requested range (404)"""
+    pass
+
+
 def fetch_csv(state: dict) -> Path:
     """
     Download historical CSV from NSE using the HOLY GRAIL sequence.
     
+    With the local history store enabled, only date sub-ranges the store
+    has never seen go to NSE; the requested range is then exported from
+    the store. Fully covered requests make no network call.
+    
+    With the data catalog enabled, an earlier download of the same range
+    is reused while it is cataloged and unexpired.
+    
     Updates state['transaction']['csv_path'] on success.
     Raises NSEFetchError on failure.
-    
-    CRITICAL: Do not modify headers or request sequence.
+    """
+    return asyncio.run(fetch_csv_with(state, TRANSPORT))
+
+
+async def fetch_csv_with(state: dict, transport: dict) -> Path:
+    """
+    fetch_csv over a transport (TRANSPORT here, async_io.TRANSPORT for the
+    async core).
     """
     logger = logging.getLogger("nse_client")
     
@@ -37,80 +73,426 @@ def fetch_csv(state: dict) -> Path:
     to_date = state["transaction"]["to_date"]
     
     config = state["config"]
-    nse_config = config["nse"]
     data_config = config["data"]
+    blocking = transport["blocking"]
     
     logger.info(f"Fetching NSE data: {symbol} ({from_date} → {to_date})")
     
-    # Prepare output path
+    csv_path = output_path(data_config, symbol, from_date, to_date)
+    use_catalog = catalog.is_enabled(config)
+    
+    if use_catalog and await blocking(state, catalog.reuse_csv, state, csv_path):
+        state["transaction"]["csv_path"] = csv_path
+        return csv_path
+    
+    if history_store.is_enabled(config):
+        await _fetch_via_store(state, transport, symbol, from_date, to_date, csv_path)
+    else:
+        await _download_range(state, transport, symbol, from_date, to_date, csv_path)
+    
+    logger.info(f"CSV saved: {csv_path.name} ({csv_path.stat().st_size} bytes)")
+    
+    if use_catalog:
+        await blocking(state, catalog.add, state, catalog.CSV, csv_path, live=catalog.includes_today(to_date))
+    
+    # Update state
+    state["transaction"]["csv_path"] = csv_path
+    
+    return csv_path
+
+
+def output_path(data_config: dict, symbol: str, from_date: str, to_date: str) -> Path:
+    """
+    CSV path for a request (data.folder + data.filename_pattern); creates the folder.
+    """
     data_folder = Path(data_config["folder"])
     data_folder.mkdir(parents=True, exist_ok=True)
     
-    # Build filename
     filename = data_config["filename_pattern"].format(
         symbol=symbol,
         from_date=from_date.replace("-", ""),
         to_date=to_date.replace("-", "")
     )
-    csv_path = data_folder / filename
+    return data_folder / filename
+
+
+async def _fetch_via_store(
+    state: dict, transport: dict, symbol: str, from_date: str, to_date: str, csv_path: Path
+) -> None:
+    """
+    Fill store gaps from NSE, then export the requested range to csv_path.
+    """
+    logger = logging.getLogger("nse_client")
+    config = state["config"]
+    blocking = transport["blocking"]
     
-    # HOLY GRAIL FETCH SEQUENCE - DO NOT MODIFY
     try:
-        session = requests.Session()
-        
-        # Sacred headers that work
-        session.headers.update(nse_config["headers"])
+        start = history_store.parse_request_date(from_date)
+        end = history_store.parse_request_date(to_date)
+    except ValueError as e:
+        raise NSEFetchError(f"Invalid date: {e}")
+    
+    gaps = await blocking(state, history_store.missing_ranges, config, symbol, start, end)
+    
+    if not gaps:
+        logger.info(f"Served from local store (no network call): {symbol}")
+    
+    # Gaps NSE has no rows for (today before publication, holidays) - the
+    # rest of the range can still be served from the store
+    empty = []
+    
+    for gap_start, gap_end in gaps:
+        gap_from = history_store.format_request_date(gap_start)
+        gap_to = history_store.format_request_date(gap_end)
+        logger.info(f"Store gap: {symbol} ({gap_from} → {gap_to})")
         
-        # Step 1: Homepage hit for cookies (MANDATORY - don't check response)
-        logger.debug("Acquiring NSE cookies...")
-        session.get("https://www.nseindia.com", timeout=10)
+        part_path = csv_path.with_suffix(f".{gap_start:%Y%m%d}.part")
+        try:
+            await _download_range(state, transport, symbol, gap_from, gap_to, part_path)
+            await blocking(state, history_store.ingest_csv, config, symbol, part_path, gap_start, gap_end)
+        except NSENoDataError:
+            logger.info(f"No NSE rows for gap: {symbol} ({gap_from} → {gap_to})")
+            empty.append((gap_start, gap_end))
+        except history_store.StoreError as e:
+            raise NSEFetchError(f"Store update failed: {e}")
+        finally:
+            part_path.unlink(missing_ok=True)
+    
+    try:
+        rows = await blocking(state, history_store.export_csv, config, symbol, start, end, csv_path)
+    except history_store.StoreError as e:
+        if empty:
+            raise NSENoDataError(str(e))
+        raise NSEFetchError(str(e))
+    
+    # Known symbol - don't ask NSE for its empty days again
+    for gap_start, gap_end in empty:
+        await blocking(state, history_store.mark_covered, config, symbol, gap_start, gap_end)
+    
+    logger.debug(f"Exported {rows} stored rows for {symbol}")
+
+
+# ---------------------------------------------------------------------
+# Chunked Range Download
+# ---------------------------------------------------------------------
+async def _download_range(
+    state: dict, transport: dict, symbol: str, from_date: str, to_date: str, dest: Path
+) -> Path:
+    """
+    Download a date range, split into nse.chunk_days windows.
+    
+    Windows are fetched concurrently (nse.max_workers at a time) through the
+    shared rate limiter. Only failed windows are retried. Results are merged
+    in date order with overlapping rows removed. Windows NSE has no data for
+    (404, e.g. before listing) are skipped as long as one window has rows.
+    A range that fits one window is written straight to dest.
+    """
+    logger = logging.getLogger("nse_client")
+    nse_config = state["config"]["nse"]
+    
+    try:
+        start = history_store.parse_request_date(from_date)
+        end = history_store.parse_request_date(to_date)
+    except ValueError as e:
+        raise NSEFetchError(f"Invalid date: {e}")
+    
+    windows = split_range(start, end, nse_config.get("chunk_days", 365))
+    single = len(windows) == 1
+    
+    max_workers = min(nse_config.get("max_workers", 4), len(windows))
+    max_retries = nse_config.get("max_retries", 3)
+    backoff = nse_config.get("retry_backoff_seconds", 2)
+    limit = asyncio.Semaphore(max_workers)
+    
+    if not single:
+        logger.info(f"Fetching {symbol} in {len(windows)} chunks ({max_workers} workers)")
+    
+    chunk_paths = {
+        window: dest if single else dest.with_name(f"{dest.name}.{i}.chunk")
+        for i, window in enumerate(windows)
+    }
+    
+    async def download(window) -> Path:
+        async with limit:
+            return await transport["download"](
+                state,
+                symbol,
+                history_store.format_request_date(window[0]),
+                history_store.format_request_date(window[1]),
+                chunk_paths[window],
+            )
+    
+    done, empty = [], []
+    errors = {}
+    pending = list(windows)
+    
+    try:
+        for attempt in range(1, max_retries + 1):
+            results = await asyncio.gather(*(download(w) for w in pending), return_exceptions=True)
+            
+            failed = []
+            for window, result in zip(pending, results):
+                if isinstance(result, NSENoDataError):
+                    empty.append(window)
+                    errors[window] = result
+                elif isinstance(result, NSEFetchError):
+                    label = "Fetch" if single else f"Chunk {window[0]} → {window[1]}"
+                    logger.warning(f"{label} failed (attempt {attempt}): {result}")
+                    failed.append(window)
+                    errors[window] = result
+                elif isinstance(result, BaseException):
+                    raise result
+                else:
+                    done.append(window)
+            
+            pending = failed
+            if not pending:
+                break
+            
+            if attempt < max_retries and await transport["wait"](state, backoff * (2 ** (attempt - 1))):
+                raise NSEFetchError("Shutdown requested during fetch retry")
         
-        # Step 2: API call with params
-        api_url = "https://www.nseindia.com/api/historicalOR/generateSecurityWiseHistoricalData"
+        # One window: surface NSE's own error (404 stays NSENoDataError)
+        if single and not done:
+            raise errors[windows[0]]
         
-        params = {
-            "from": from_date,
-            "to": to_date,
-            "symbol": symbol.upper(),
-            "type": "priceVolumeDeliverable",
-            "series": "ALL",
-            "csv": "true"
-        }
+        if pending:
+            raise NSEFetchError(f"{len(pending)} of {len(windows)} chunks failed after {max_retries} attempts")
         
-        logger.debug(f"Calling NSE API with params: {params}")
+        if not done:
+            raise NSENoDataError(f"404 Not Found - No data for {symbol} in any chunk")
         
-        api_response = session.get(
-            api_url,
-            params=params,
-            timeout=20
-        )
+        if not single:
+            paths = [chunk_paths[w] for w in sorted(done)]
+            rows = await transport["blocking"](state, merge_chunks, paths, dest)
+            logger.info(f"Merged {len(done)} chunks: {rows} rows ({len(empty)} empty)")
+        return dest
         
-        # Check for common failures
-        if api_response.status_code == 403:
-            raise NSEFetchError("403 Forbidden - NSE blocked the request")
+    finally:
+        if not single:
+            for path in chunk_paths.values():
+                path.unlink(missing_ok=True)
+
+
+def split_range(start: date, end: date, chunk_days: int) -> list[tuple[date, date]]:
+    """
+    Split [start, end] into consecutive windows of at most chunk_days days.
+    """
+    windows = []
+    cursor = start
+    step = timedelta(days=max(chunk_days, 1))
+    
+    while cursor <= end:
+        window_end = min(cursor + step - timedelta(days=1), end)
+        windows.append((cursor, window_end))
+        cursor = window_end + timedelta(days=1)
+    
+    return windows
+
+
+def merge_chunks(paths: list[Path], dest: Path) -> int:
+    """
+    Concatenate chunk CSVs in date order, dropping duplicate (Series, Date) rows.
+    """
+    frames = [pd.read_csv(p, dtype=str, keep_default_na=False) for p in paths]
+    frames = [f.rename(columns=lambda c: c.strip().lstrip("\ufeff")) for f in frames]
+    
+    df = pd.concat(frames, ignore_index=True)
+    parsed = pd.to_datetime(df["Date"].str.strip(), format=history_store.NSE_DATE_FORMAT, errors="coerce")
+    
+    df = (
+        df.assign(_sort=parsed)
+        .sort_values("_sort", kind="stable")
+        .drop_duplicates(subset=["Series", "Date"], keep="last")
+        .drop(columns=["_sort"])
+    )
+    df.to_csv(dest, index=False)
+    return len(df)
+
+
+# ---------------------------------------------------------------------
+# API Call (shared by both transports)
+# ---------------------------------------------------------------------
+def api_request(nse_config: dict, symbol: str, from_date: str, to_date: str) -> tuple[str, dict]:
+    """
+    URL and query params for one priceVolumeDeliverable call.
+    
+    CRITICAL: Do not modify params.
+    """
+    api_url = nse_config["base_url"] + nse_config["api_endpoint"]
+    
+    params = {
+        "from": from_date,
+        "to": to_date,
+        "symbol": symbol.upper(),
+        "type": "priceVolumeDeliverable",
+        "series": "ALL",
+        "csv": "true"
+    }
+    return api_url, params
+
+
+def check_status(status: int) -> None:
+    """
+    Raise for an API response that carries no CSV (after the one cookie refresh).
+    """
+    # Check for common failures
+    if status == 403:
+        raise NSEFetchError("403 Forbidden - NSE blocked the request")
+    
+    if status == 404:
+        raise NSENoDataError(f"404 Not Found - Invalid symbol or date range")
+    
+    if status >= 400:
+        raise NSEFetchError(f"HTTP {status} from NSE")
+
+
+def record_download(state: dict, status: int, size: int, ttfb_ms: float, transfer_ms: float) -> None:
+    """
+    Add one response to the transaction's fetch_timing, count bytes and
+    log it.
+
+    fetch_timing totals every API call of the fetch - chunked ranges make
+    several, some at once: requests, ttfb_ms (request sent until headers
+    arrive, connection setup included), transfer_ms (body) and bytes.
+    """
+    with _TIMING_LOCK:
+        timing = state["transaction"].setdefault("fetch_timing", {})
+        for key, value in (("requests", 1), ("ttfb_ms", ttfb_ms), ("transfer_ms", transfer_ms), ("bytes", size)):
+            timing[key] = timing.get(key, 0) + value
+
+    metrics.inc(state, "nse_bytes_downloaded_total", size)
+    logging.getLogger("nse_client").info(
+        f"NSE response {status}: {size} bytes | "
+        f"ttfb {ttfb_ms:.0f}ms | transfer {transfer_ms:.0f}ms"
+    )
+
+
+def new_pool(session, lock) -> dict:
+    """
+    Session pool dict shared by both transports (see get_session).
+    """
+    return {
+        "session": session,
+        "cookies_at": None,
+        "lock": lock,
+        "stats": {"requests": 0, "cookie_refreshes": 0},
+    }
+
+
+def cookies_fresh(state: dict, pool: dict) -> bool:
+    """
+    True while the last homepage hit is younger than nse.cookie_ttl_seconds.
+    """
+    ttl = state["config"]["nse"].get("cookie_ttl_seconds", 300)
+    cookies_at = pool["cookies_at"]
+    return cookies_at is not None and time.monotonic() - cookies_at < ttl
+
+
+def mark_cookies(pool: dict) -> None:
+    pool["cookies_at"] = time.monotonic()
+    pool["stats"]["cookie_refreshes"] += 1
+
+
+class BodyFile:
+    """
+    Temporary file a streamed API body is written to, chunk by chunk.
+    
+    The first chunk is checked for an HTML error page. The file only
+    replaces dest once the body is complete; size and transfer_ms are
+    set on exit.
+    """
+    
+    def __init__(self, dest: Path):
+        self.dest = dest
+        self.tmp = dest.with_name(dest.name + ".tmp")
+        self.size = 0
+        self.transfer_ms = 0.0
+    
+    def __enter__(self) -> "BodyFile":
+        self._started = time.perf_counter()
+        self._file = self.tmp.open("wb")
+        return self
+    
+    def write(self, chunk: bytes) -> None:
+        if not chunk:
+            return
+        if self.size == 0:
+            preview = chunk[:100].lower()
+            if b"<html" in preview or b"<!doctype" in preview:
+                raise NSEFetchError("Received HTML instead of CSV (possible error page)")
+        self._file.write(chunk)
+        self.size += len(chunk)
+    
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self._file.close()
+        try:
+            if exc_type is None:
+                self.tmp.replace(self.dest)
+        finally:
+            self.tmp.unlink(missing_ok=True)
+        self.transfer_ms = (time.perf_counter() - self._started) * 1000
+        return False
+
+
+# ---------------------------------------------------------------------
+# Requests Transport (sync mode)
+# ---------------------------------------------------------------------
+def _download(state: dict, symbol: str, from_date: str, to_date: str, dest: Path) -> Path:
+    """
+    Fetch one date range from the NSE API and write it to dest.
+    
+    CRITICAL: Do not modify headers or request sequence.
+    """
+    logger = logging.getLogger("nse_client")
+    
+    nse_config = state["config"]["nse"]
+    timeout = nse_config.get("timeout_seconds", 20)
+    
+    # HOLY GRAIL FETCH SEQUENCE - DO NOT MODIFY
+    # Homepage cookies first, then the API call. The pooled session keeps
+    # cookies and connections alive, so the homepage step only re-runs when
+    # cookies are older than cookie_ttl_seconds or NSE answers 401/403.
+    try:
+        pool = get_session(state)
         
-        if api_response.status_code == 404:
-            raise NSEFetchError(f"404 Not Found - Invalid symbol or date range")
+        # Step 1: Homepage hit for cookies (MANDATORY when stale)
+        _ensure_cookies(state, pool)
         
-        api_response.raise_for_status()
+        # Step 2: API call with params
+        api_url, params = api_request(nse_config, symbol, from_date, to_date)
         
-        # Verify we got CSV, not HTML error page
-        content_preview = api_response.content[:100].lower()
-        if b"<html" in content_preview or b"<!doctype" in content_preview:
-            raise NSEFetchError("Received HTML instead of CSV (possible error page)")
+        logger.debug(f"Calling NSE API with params: {params}")
         
-        # Save to disk
-        csv_path.write_bytes(api_response.content)
+        get_rate_limiter(state).acquire()
+        api_response, ttfb_ms = _open(pool, api_url, params, timeout)
         
-        logger.info(f"CSV saved: {csv_path.name} ({csv_path.stat().st_size} bytes)")
+        # Rejected cookies - refresh once and retry
+        if api_response.status_code in (401, 403):
+            logger.info(f"NSE returned {api_response.status_code} - refreshing cookies")
+            api_response.close()
+            _ensure_cookies(state, pool, force=True)
+            get_rate_limiter(state).acquire()
+            api_response, ttfb_ms = _open(pool, api_url, params, timeout)
         
-        # Update state
-        state["transaction"]["csv_path"] = csv_path
+        with api_response:
+            check_status(api_response.status_code)
+            
+            # Stream to disk (HTML error sniff happens on the first chunk)
+            chunk_bytes = nse_config.get("stream_chunk_bytes", 65536)
+            size, transfer_ms = _stream_to_file(api_response, dest, chunk_bytes)
         
-        return csv_path
+        record_download(state, api_response.status_code, size, ttfb_ms, transfer_ms)
+        return dest
         
+    except NSEFetchError:
+        raise
+    
+    except InterruptedError:
+        raise NSEFetchError("Shutdown requested while waiting for the rate limit")
+    
     except requests.exceptions.Timeout:
-        raise NSEFetchError("Request timed out after 20s")
+        raise NSEFetchError(f"Request timed out after {timeout}s")
     
     except requests.exceptions.RequestException as e:
         raise NSEFetchError(f"Network error: {e}")
@@ -119,6 +501,121 @@ def fetch_csv(state: dict) -> Path:
         raise NSEFetchError(f"Unexpected error: {e}")
 
 
+async def _download_on_thread(state: dict, symbol: str, from_date: str, to_date: str, dest: Path) -> Path:
+    return await asyncio.to_thread(_download, state, symbol, from_date, to_date, dest)
+
+
+async def _run_inline(state: dict, fn, *args, **kwargs):
+    # fetch_csv's event loop is private to one fetch - blocking it is fine
+    return fn(*args, **kwargs)
+
+
+async def _wait_on_thread(state: dict, timeout: float) -> bool:
+    return await asyncio.to_thread(lifecycle.wait, state, timeout)
+
+
+TRANSPORT = {"download": _download_on_thread, "blocking": _run_inline, "wait": _wait_on_thread}
+
+
+def get_rate_limiter(state: dict) -> RateLimiter:
+    """
+    Shared NSE API rate limiter (nse.requests_per_minute), created on first use.
+    
+    Waits end early on shutdown, so queued chunks don't hold it up.
+    """
+    resources = state.setdefault("resources", {})
+    limiter = resources.get("nse_rate_limiter")
+    
+    if limiter is None:
+        per_minute = state["config"]["nse"].get("requests_per_minute", 30)
+        limiter = RateLimiter(per_minute, 60.0, stop=lifecycle.shutdown_event(state))
+        resources["nse_rate_limiter"] = limiter
+    
+    return limiter
+
+
+# ---------------------------------------------------------------------
+# Session Pool
+# ---------------------------------------------------------------------
+def get_session(state: dict) -> dict:
+    """
+    Return the shared NSE session pool, creating it on first use.
+
+    Stored in state['resources']['http_session'] as:
+    - session: requests.Session with a keep-alive connection pool
+    - cookies_at: monotonic time of the last homepage cookie hit
+    - lock: serialises cookie refreshes across threads
+    - stats: request and cookie refresh counters
+    """
+    resources = state.setdefault("resources", {})
+    pool = resources.get("http_session")
+
+    if pool is None:
+        nse_config = state["config"]["nse"]
+        pool_size = nse_config.get("pool_size", 4)
+
+        session = requests.Session()
+        session.headers.update(nse_config["headers"])
+
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+        pool = new_pool(session, threading.Lock())
+        resources["http_session"] = pool
+
+    return pool
+
+
+def close_session(state: dict) -> None:
+    """
+    Close pooled connections (called on shutdown).
+    """
+    pool = state.get("resources", {}).get("http_session")
+    if pool is not None:
+        pool["session"].close()
+        state["resources"]["http_session"] = None
+
+
+def _ensure_cookies(state: dict, pool: dict, force: bool = False) -> None:
+    """
+    Hit the NSE homepage when cookies are missing, expired or rejected.
+    """
+    with pool["lock"]:
+        if cookies_fresh(state, pool) and not force:
+            return
+
+        # Don't check response - cookies are all we need
+        logging.getLogger("nse_client").debug("Acquiring NSE cookies...")
+        pool["session"].get(state["config"]["nse"]["homepage_url"], timeout=10)
+        mark_cookies(pool)
+
+
+def _open(pool: dict, url: str, params: dict, timeout: float):
+    """
+    Start a streamed GET; returns (response, ttfb_ms).
+
+    ttfb_ms (time to first byte) covers sending the request until the
+    response headers arrive, including TCP/TLS setup when no pooled
+    connection is idle. The body is left unread for _stream_to_file.
+    """
+    started = time.perf_counter()
+    response = pool["session"].get(url, params=params, timeout=timeout, stream=True)
+    pool["stats"]["requests"] += 1
+    return response, (time.perf_counter() - started) * 1000
+
+
+def _stream_to_file(response, dest: Path, chunk_bytes: int) -> tuple[int, float]:
+    """
+    Write the response body to dest chunk by chunk; returns (bytes, transfer_ms).
+    """
+    with BodyFile(dest) as body:
+        for chunk in response.iter_content(chunk_size=chunk_bytes):
+            body.write(chunk)
+
+    return body.size, body.transfer_ms
+
+
 # ---------------------------------------------------------------------
 # Manual Testing
 # ---------------------------------------------------------------------
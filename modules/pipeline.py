@@ -4,7 +4,7 @@ Pipeline orchestrator - Executes single fetch-process-write cycle.
 
 import logging
 
-from modules import nse_client, processor, sheets_io, state
+from modules import catalog, metrics, nse_client, processor, profiling, result_cache, screener, sheets_io, state
 from modules.utils import cleanup_old_files
 
 
@@ -24,7 +24,22 @@ def run(state_dict: dict) -> None:
     symbol = state_dict["transaction"]["symbol"]
     logger.info(f"Pipeline started for {symbol}")
     
+    if profiling.begin(state_dict):
+        profiling.resume(state_dict)
+    
     try:
+        # UNIVERSE / WATCHLIST:<name> requests run the multi-symbol screen
+        if screener.is_screen_request(symbol):
+            screener.run(state_dict)
+            return
+        
+        # Repeat requests skip fetch + process and go straight to the write
+        if serve_cached(state_dict):
+            state.update_stage(state_dict, "WRITING")
+            sheets_io.write_results(state_dict)
+            logger.info(f"Pipeline completed from cache for {symbol}")
+            return
+        
         # -------------------------------------------------------------
         # Stage 1: Fetch Data
         # -------------------------------------------------------------
@@ -38,6 +53,7 @@ def run(state_dict: dict) -> None:
         state.update_stage(state_dict, "PROCESSING")
         processor.process_csv(state_dict)
         logger.info("✓ Processing complete")
+        cache_result(state_dict)
         
         # -------------------------------------------------------------
         # Stage 3: Write to Sheets
@@ -48,28 +64,82 @@ def run(state_dict: dict) -> None:
         
         logger.info(f"Pipeline completed successfully for {symbol}")
         
-    except nse_client.NSEFetchError as e:
-        error_msg = f"NSE fetch failed: {e}"
-        logger.error(error_msg)
-        state.set_error(state_dict, error_msg)
-        sheets_io.write_error(state_dict)
-        
     except Exception as e:
-        error_msg = f"Pipeline error: {e}"
-        logger.error(error_msg)
-        state.set_error(state_dict, error_msg)
+        record_error(state_dict, e)
         sheets_io.write_error(state_dict)
         
     finally:
+        profiling.end(state_dict)
+        metrics.record_run(state_dict)
+        
         # Always reset transaction state
         state.reset_transaction(state_dict)
         
         # Cleanup old CSV files if enabled
-        config = state_dict["config"]
-        data_config = config["data"]
-        
-        if data_config.get("cleanup_enabled", True):
-            max_age = data_config.get("max_age_hours", 24)
-            deleted = cleanup_old_files(data_config["folder"], max_age)
-            if deleted > 0:
-                logger.info(f"Cleaned up {deleted} old CSV file(s)")
\ No newline at end of file
+        cleanup_files(state_dict)
+
+
+def cleanup_files(state_dict: dict) -> None:
+    """
+    Keep the data folder under its disk budget: LRU eviction from the
+    data catalog when enabled, else delete CSVs older than
+    data.max_age_hours (if cleanup is enabled).
+    """
+    data_config = state_dict["config"]["data"]
+    
+    if catalog.is_enabled(state_dict["config"]):
+        deleted = catalog.evict(state_dict)
+    elif data_config.get("cleanup_enabled", True):
+        max_age = data_config.get("max_age_hours", 24)
+        deleted = cleanup_old_files(data_config["folder"], max_age)
+    else:
+        return
+    
+    if deleted > 0:
+        logging.getLogger("pipeline").info(f"Cleaned up {deleted} old file(s)")
+
+
+def record_error(state_dict: dict, error: Exception) -> None:
+    """
+    Log and record a failed run on the transaction.
+    """
+    if isinstance(error, nse_client.NSEFetchError):
+        error_msg = f"NSE fetch failed: {error}"
+    else:
+        error_msg = f"Pipeline error: {error}"
+    
+    logging.getLogger("pipeline").error(error_msg)
+    state_dict["transaction"]["error_class"] = type(error).__name__
+    state.set_error(state_dict, error_msg)
+
+
+def serve_cached(state_dict: dict) -> bool:
+    """
+    Load frame/metrics from the result cache into the transaction.
+    Cache problems never fail the run - they just count as a miss.
+    """
+    if not result_cache.is_enabled(state_dict["config"]):
+        return False
+    
+    try:
+        cached = result_cache.lookup(state_dict)
+    except Exception as e:
+        logging.getLogger("pipeline").warning(f"Result cache lookup failed: {e}")
+        return False
+    
+    if cached is None:
+        return False
+    
+    state_dict["transaction"]["frame"] = cached["frame"]
+    state_dict["transaction"]["metrics"] = cached["metrics"]
+    return True
+
+
+def cache_result(state_dict: dict) -> None:
+    if not result_cache.is_enabled(state_dict["config"]):
+        return
+    
+    try:
+        result_cache.store(state_dict)
+    except Exception as e:
+        logging.getLogger("pipeline").warning(f"Result cache store failed: {e}")
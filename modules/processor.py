@@ -1,12 +1,15 @@
 """
 CSV passthrough processor.
-Reads CSV, prepares raw data for Google Sheets, and calculates delivery metrics.
+Reads CSV with the declared schema, prepares raw data for Google Sheets, and
+calculates delivery metrics.
 """
 
 import logging
 from pathlib import Path
 import pandas as pd
 
+from modules import analytics, schema
+
 
 class ProcessorError(Exception):
     pass
@@ -14,7 +17,10 @@ class ProcessorError(Exception):
 
 def process_csv(state: dict) -> None:
     """
-    Load CSV, dump it to state['transaction']['raw_data'], and calculate metrics.
+    Load CSV into state['transaction']['frame'] and calculate metrics.
+
+    The frame stays columnar; the Sheets payload (raw_data) is built from
+    it only when the results are written.
     """
     logger = logging.getLogger("processor")
 
@@ -26,104 +32,71 @@ def process_csv(state: dict) -> None:
     logger.info(f"Processing CSV: {Path(csv_path).name}")
 
     try:
-        df = pd.read_csv(csv_path)
+        df = schema.read_nse_csv(csv_path)
+
+        # Vectorized delivery metrics (avg/max/min, rolling, z-scores, spikes)
+        metrics = analytics.compute_metrics(df, state["config"])
+
+        logger.debug(f"Parsed {len(df)} rows ({schema.memory_bytes(df) / 1024:.0f} KB in memory)")
 
         if df.empty:
             logger.warning("CSV has headers but no rows")
 
-        # Convert dataframe to list-of-lists for Sheets
-        header = df.columns.tolist()
-        rows = df.values.tolist()
-
-        raw_data = [header] + rows
-
-        state["transaction"]["raw_data"] = raw_data
-
-        # --------------------------------------------------
-        # Calculate actual delivery metrics
-        # --------------------------------------------------
-        metrics = {
-            "total_rows": len(rows),
-            "avg_delivery_pct": 0,
-            "max_delivery_pct": 0,
-            "min_delivery_pct": 0,
-        }
-
-        # Find delivery % column (usually last column or "% Dly Qt to Traded Qty")
-        delivery_col = None
-        for idx, col in enumerate(header):
-            if "%" in col.lower() and ("dly" in col.lower() or "delivery" in col.lower()):
-                delivery_col = idx
-                break
-
-        if delivery_col is not None and len(rows) > 0:
-            # Extract delivery % values
-            delivery_values = []
-            for row in rows:
-                try:
-                    val = float(row[delivery_col])
-                    delivery_values.append(val)
-                except (ValueError, TypeError, IndexError):
-                    continue
-
-            if delivery_values:
-                metrics["avg_delivery_pct"] = round(sum(delivery_values) / len(delivery_values), 2)
-                metrics["max_delivery_pct"] = round(max(delivery_values), 2)
-                metrics["min_delivery_pct"] = round(min(delivery_values), 2)
+        state["transaction"]["frame"] = df
 
         state["transaction"]["metrics"] = metrics
 
-        logger.info(f"CSV processed: {len(rows)} rows | Avg Delivery: {metrics['avg_delivery_pct']}%")
-
-        # --------------------------------------------------
-        # Cleanup old CSV files
-        # --------------------------------------------------
-        _cleanup_old_csvs(state, csv_path)
+        logger.info(f"CSV processed: {len(df)} rows | Avg Delivery: {metrics['avg_delivery_pct']}%")
 
     except Exception as e:
         raise ProcessorError(f"Failed to process CSV: {e}")
 
 
-def _cleanup_old_csvs(state: dict, current_csv: Path) -> None:
+def stream_csv(csv_path: Path, chunk_rows: int, on_chunk) -> dict:
     """
-    Delete all CSV files in data folder except:
-    - The current CSV just downloaded
-    - nse_equity_list.CSV
+    Parse the CSV chunk_rows rows at a time, pass each chunk to on_chunk and
+    return running avg/max/min delivery % metrics.
+
+    Only one chunk is held in memory, however long the range. Rolling and
+    z-score metrics need the whole series and are not computed.
     """
-    logger = logging.getLogger("processor")
+    stats = _new_delivery_stats()
+    total = 0
+
+    try:
+        for df in schema.read_nse_csv(csv_path, chunksize=chunk_rows):
+            _update_delivery_stats(stats, df[analytics.DELIVERY_PCT])
+            total += len(df)
+            on_chunk(df)
+    except Exception as e:
+        raise ProcessorError(f"Failed to process CSV: {e}")
+
+    metrics = {
+        "total_rows": total,
+        "avg_delivery_pct": 0,
+        "max_delivery_pct": 0,
+        "min_delivery_pct": 0,
+    }
+
+    if stats["count"]:
+        metrics["avg_delivery_pct"] = round(stats["sum"] / stats["count"], 2)
+        metrics["max_delivery_pct"] = round(stats["max"], 2)
+        metrics["min_delivery_pct"] = round(stats["min"], 2)
 
-    data_folder = Path(state["config"]["data"]["folder"])
+    return metrics
 
-    if not data_folder.exists():
+
+def _new_delivery_stats() -> dict:
+    return {"count": 0, "sum": 0.0, "max": float("-inf"), "min": float("inf")}
+
+
+def _update_delivery_stats(stats: dict, column: pd.Series) -> None:
+    values = analytics.clean_numeric(column).dropna()
+    if values.empty:
         return
 
-    # Files to preserve
-    preserve_files = {
-        current_csv.name,
-        "nse_equity_list.CSV",
-        "nse_equity_list.csv"  # Case-insensitive match
-    }
+    stats["count"] += len(values)
+    stats["sum"] += float(values.sum())
+    stats["max"] = max(stats["max"], float(values.max()))
+    stats["min"] = min(stats["min"], float(values.min()))
 
-    deleted_count = 0
-
-    for file in data_folder.glob("*.csv"):
-        if file.name not in preserve_files and file.name.lower() not in {f.lower() for f in preserve_files}:
-            try:
-                file.unlink()
-                deleted_count += 1
-                logger.debug(f"Deleted old CSV: {file.name}")
-            except Exception as e:
-                logger.warning(f"Failed to delete {file.name}: {e}")
-
-    # Also delete .CSV files
-    for file in data_folder.glob("*.CSV"):
-        if file.name not in preserve_files:
-            try:
-                file.unlink()
-                deleted_count += 1
-                logger.debug(f"Deleted old CSV: {file.name}")
-            except Exception as e:
-                logger.warning(f"Failed to delete {file.name}: {e}")
-
-    if deleted_count > 0:
-        logger.info(f"🗑️  Cleaned up {deleted_count} old CSV file(s)")
\ No newline at end of file
@@ -0,0 +1,270 @@
+"""
+Opt-in run profiling - cProfile + tracemalloc for selected pipeline runs.
+
+Which runs (config profiling, or main.py --profile-every / --profile-slow):
+- every_n_runs: every Nth run is profiled and saved
+- slow_seconds: every run is profiled, but only runs that took at least
+  this long are saved (costs profiler overhead on all runs)
+
+Each saved run writes two files to profiling.folder (logs/profiles/):
+    {time}_{symbol}_{from}_{to}_{reason}.prof  - pstats data (snakeviz, pstats)
+    {time}_{symbol}_{from}_{to}_{reason}.txt   - top functions + allocations
+Only the newest profiling.keep runs are kept.
+
+The profiler follows the transaction across threads: it is enabled only
+while a stage works on that transaction (pipeline.run's thread, a stage
+worker, or an async_io executor call). Helper threads a stage starts
+(chunk downloads, uploads, screen pools) are not profiled. tracemalloc is
+process-wide: overlapping runs share allocations and all of them run
+slower while it is on (set profiling.tracemalloc false for timing work).
+"""
+
+import cProfile
+import io
+import logging
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+from modules import metrics
+
+
+class ProfilingError(Exception):
+    pass
+
+
+def is_enabled(config: dict) -> bool:
+    return config.get("profiling", {}).get("enabled", False)
+
+
+def apply_cli(config: dict, every_n_runs: int | None = None, slow_seconds: float | None = None) -> None:
+    """
+    main.py --profile-every / --profile-slow: turn profiling on with these
+    thresholds, overriding config/settings.json.
+    """
+    if every_n_runs is None and slow_seconds is None:
+        return
+    if (every_n_runs is not None and every_n_runs < 1) or (slow_seconds is not None and slow_seconds <= 0):
+        raise ProfilingError("--profile-every must be >= 1 and --profile-slow > 0")
+
+    cfg = config.setdefault("profiling", {})
+    cfg["enabled"] = True
+    cfg["every_n_runs"] = every_n_runs or 0
+    cfg["slow_seconds"] = slow_seconds or 0
+
+
+def get_profiler_state(state: dict) -> dict:
+    """
+    Return the shared run counter / tracemalloc bookkeeping, creating it on first use.
+    """
+    resources = state["resources"]
+    shared = resources.get("profiling")
+    if shared is None:
+        shared = resources.setdefault("profiling", {
+            "lock": threading.Lock(),
+            "runs": 0,
+            "saved": 0,
+            "tracing": 0,            # profiled runs currently holding tracemalloc
+            "started_tracemalloc": False,
+        })
+    return shared
+
+
+# ---------------------------------------------------------------------
+# Run hooks
+# ---------------------------------------------------------------------
+def begin(state: dict) -> bool:
+    """
+    Decide whether this run is profiled; if so attach a profiler to the
+    transaction and start tracemalloc. Returns True when profiling.
+    """
+    config = state["config"]
+    if not is_enabled(config):
+        return False
+
+    cfg = config["profiling"]
+    shared = get_profiler_state(state)
+
+    with shared["lock"]:
+        shared["runs"] += 1
+        every_n = cfg.get("every_n_runs", 0)
+        sampled = bool(every_n) and shared["runs"] % every_n == 0
+
+        if not sampled and not cfg.get("slow_seconds", 0):
+            return False
+
+        trace = cfg.get("tracemalloc", True)
+        if trace:
+            if shared["tracing"] == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start(cfg.get("tracemalloc_frames", 1))
+                shared["started_tracemalloc"] = True
+            shared["tracing"] += 1
+            tracemalloc.reset_peak()
+
+    state["transaction"]["profile"] = {
+        "profiler": cProfile.Profile(),
+        "sampled": sampled,
+        "tracemalloc": trace,
+        "started": time.perf_counter(),
+        "memory_start": tracemalloc.get_traced_memory()[0] if trace else 0,
+    }
+    return True
+
+
+def resume(state: dict) -> None:
+    """
+    Enable the transaction's profiler on the current thread.
+    """
+    profile = state["transaction"].get("profile")
+    if profile is not None:
+        profile["profiler"].enable()
+
+
+def pause(state: dict) -> None:
+    profile = state["transaction"].get("profile")
+    if profile is not None:
+        profile["profiler"].disable()
+
+
+def call(state: dict, fn, *args, **kwargs):
+    """
+    fn(*args, **kwargs) with the transaction's profiler enabled around it.
+    """
+    resume(state)
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        pause(state)
+
+
+def end(state: dict, save: bool = True) -> Path | None:
+    """
+    Finish profiling the run; save it if it was sampled or slow enough
+    (save=False just releases it). Returns the .prof path when saved.
+    Never raises.
+    """
+    t = state["transaction"]
+    profile = t.pop("profile", None)
+    if profile is None:
+        return None
+
+    logger = logging.getLogger("profiling")
+    cfg = state["config"]["profiling"]
+    shared = get_profiler_state(state)
+
+    profile["profiler"].disable()
+    elapsed = time.perf_counter() - profile["started"]
+
+    slow_seconds = cfg.get("slow_seconds", 0)
+    slow = bool(slow_seconds) and elapsed >= slow_seconds
+    wanted = save and (profile["sampled"] or slow)
+
+    memory = None
+    if profile["tracemalloc"]:
+        if wanted:
+            memory = _memory_report(profile, metrics.stage_peaks(t), cfg.get("top_n", 30))
+        with shared["lock"]:
+            shared["tracing"] -= 1
+            if shared["tracing"] == 0 and shared["started_tracemalloc"]:
+                tracemalloc.stop()
+                shared["started_tracemalloc"] = False
+
+    if not wanted:
+        return None
+
+    reason = "slow" if slow else "sample"
+
+    try:
+        path = _save(state, profile["profiler"], memory, elapsed, reason)
+        _rotate(Path(cfg.get("folder", "logs/profiles")), cfg.get("keep", 40))
+    except Exception as e:
+        logger.warning(f"Profile save failed: {e}")
+        return None
+
+    with shared["lock"]:
+        shared["saved"] += 1
+
+    logger.info(f"🔬 Profiled {t.get('symbol')} ({reason}, {elapsed:.2f}s): {path.name}")
+    return path
+
+
+# ---------------------------------------------------------------------
+# Output
+# ---------------------------------------------------------------------
+def _memory_report(profile: dict, stage_peaks: dict, top_n: int) -> dict:
+    # update_stage resets the peak at every stage change
+    current, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    ))
+    return {
+        "start": profile["memory_start"],
+        "current": current,
+        "peak": max([peak, *stage_peaks.values()]),
+        "stage_peaks": stage_peaks,
+        "top": snapshot.statistics("lineno")[:top_n],
+    }
+
+
+def _save(state: dict, profiler: cProfile.Profile, memory: dict | None, elapsed: float, reason: str) -> Path:
+    cfg = state["config"]["profiling"]
+    t = state["transaction"]
+
+    folder = Path(cfg.get("folder", "logs/profiles"))
+    folder.mkdir(parents=True, exist_ok=True)
+
+    stem = "_".join([
+        datetime.now().strftime("%Y%m%d-%H%M%S-%f"),
+        _safe(t.get("symbol") or "run"),
+        _safe(t.get("from_date") or ""),
+        _safe(t.get("to_date") or ""),
+        reason,
+    ])
+    prof_path = folder / f"{stem}.prof"
+    profiler.dump_stats(prof_path)
+
+    out = io.StringIO()
+    out.write(f"Symbol:  {t.get('symbol')}\n")
+    out.write(f"Range:   {t.get('from_date')} → {t.get('to_date')}\n")
+    out.write(f"Reason:  {reason}\n")
+    out.write(f"Elapsed: {elapsed:.3f}s\n")
+    out.write(f"Error:   {t.get('error') or 'None'}\n")
+    out.write(f"Stages:  {', '.join(f'{k} {v:.3f}s' for k, v in metrics.stage_timings(t).items()) or 'None'}\n\n")
+
+    stats = pstats.Stats(profiler, stream=out)
+    stats.sort_stats("cumulative").print_stats(cfg.get("top_n", 30))
+
+    if memory is not None:
+        out.write("\nMemory (tracemalloc)\n")
+        out.write(f"  start {_mb(memory['start'])} | end {_mb(memory['current'])} | peak {_mb(memory['peak'])}\n")
+        out.write(f"  stage peaks: {', '.join(f'{k} {_mb(v)}' for k, v in memory['stage_peaks'].items()) or 'None'}\n\n")
+        for stat in memory["top"]:
+            out.write(f"  {stat}\n")
+
+    prof_path.with_suffix(".txt").write_text(out.getvalue(), encoding="utf-8")
+    return prof_path
+
+
+def _rotate(folder: Path, keep: int) -> int:
+    """
+    Delete all but the newest keep profiles (.prof + .txt pairs).
+    """
+    profiles = sorted(folder.glob("*.prof"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for old in profiles[keep:]:
+        old.unlink(missing_ok=True)
+        old.with_suffix(".txt").unlink(missing_ok=True)
+    return max(len(profiles) - keep, 0)
+
+
+def _safe(text: str) -> str:
+    return re.sub(r"[^A-Za-z0-9.-]+", "-", text).strip("-") or "x"
+
+
+def _mb(size: int) -> str:
+    return f"{size / 1024 / 1024:.1f} MB"
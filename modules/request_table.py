@@ -0,0 +1,124 @@
+"""
+REQUESTS sheet - many analysis requests at once, one per row.
+
+    A Symbol | B From Date | C To Date | D Trigger | E Status | F Output | G Updated
+
+The monitor reads this table together with the CUSTOM_VIEW control cells in
+one values.batchGet. Triggered rows are marked QUEUED and handed to the
+staged pipeline, which runs them side by side (bounded by
+pipeline.max_in_flight). Each row writes its data to its own tab
+(request_table.output_pattern); its final write resets Trigger and fills
+Status, Output and Updated.
+
+Layout and parsing only - the writes themselves go through sheets_io.
+"""
+
+from datetime import datetime
+
+from gspread.utils import absolute_range_name, rowcol_to_a1
+
+
+HEADER = ["Symbol", "From Date", "To Date", "Trigger", "Status", "Output", "Updated"]
+TRIGGER_COL = HEADER.index("Trigger") + 1
+STATUS_COL = HEADER.index("Status") + 1
+
+TRIGGER_VALUES = {"TRUE", "YES", "1", "X"}
+QUEUED = "QUEUED"
+
+# Sheets rejects these in tab names
+_TITLE_FORBIDDEN = str.maketrans({c: "_" for c in "[]*?:/\\'"})
+
+
+class RequestTableError(Exception):
+    pass
+
+
+def is_enabled(config: dict) -> bool:
+    return config["google_sheets"].get("request_table", {}).get("enabled", False)
+
+
+def sheet_title(config: dict) -> str:
+    return config["google_sheets"]["sheet_names"].get("requests", "REQUESTS")
+
+
+def table_range(config: dict) -> str:
+    """
+    Absolute A1 range covering every request row (header excluded).
+    """
+    table_cfg = config["google_sheets"].get("request_table", {})
+    first = table_cfg.get("first_row", 2)
+    last = first + table_cfg.get("max_rows", 50) - 1
+    return absolute_range_name(sheet_title(config), f"A{first}:{rowcol_to_a1(last, len(HEADER))}")
+
+
+def output_title(config: dict, symbol: str, from_date: str, to_date: str) -> str:
+    """
+    Tab name for a row's results (100 chars max, no forbidden characters).
+    """
+    pattern = config["google_sheets"].get("request_table", {}).get(
+        "output_pattern", "{symbol}_{from_date}_{to_date}"
+    )
+    title = pattern.format(symbol=symbol, from_date=from_date, to_date=to_date)
+    return title.translate(_TITLE_FORBIDDEN)[:100]
+
+
+# ---------------------------------------------------------------------
+# Parsing
+# ---------------------------------------------------------------------
+def parse(config: dict, values: list[list]) -> list[dict]:
+    """
+    Triggered rows from a values.batchGet of table_range().
+
+    Each request: {"row", "symbol", "from_date", "to_date", "status",
+    "output_sheet", "error"}. Rows with missing inputs carry an error
+    instead of being run.
+    """
+    first = config["google_sheets"].get("request_table", {}).get("first_row", 2)
+    requests = []
+
+    for offset, cells in enumerate(values):
+        cells = [str(c).strip() for c in cells] + [""] * (len(HEADER) - len(cells))
+        symbol, from_date, to_date, trigger, status = cells[:STATUS_COL]
+
+        if trigger.upper() not in TRIGGER_VALUES:
+            continue
+
+        symbol = symbol.upper()
+        request = {
+            "row": first + offset,
+            "symbol": symbol,
+            "from_date": from_date,
+            "to_date": to_date,
+            "status": status,
+            "output_sheet": None,
+            "error": None,
+        }
+
+        if not symbol or not from_date or not to_date:
+            request["error"] = "Symbol, From Date and To Date are required"
+        else:
+            request["output_sheet"] = output_title(config, symbol, from_date, to_date)
+
+        requests.append(request)
+
+    return requests
+
+
+# ---------------------------------------------------------------------
+# Row cells
+# ---------------------------------------------------------------------
+def status_cells(row: int, status: str) -> tuple[str, list[list]]:
+    """
+    (A1 range, values) setting just the Status cell of a row.
+    """
+    return rowcol_to_a1(row, STATUS_COL), [[status]]
+
+
+def result_cells(row: int, status: str, output: str | None) -> tuple[str, list[list]]:
+    """
+    (A1 range, values) for a finished row: Trigger reset, Status, Output
+    and Updated time.
+    """
+    a1 = f"{rowcol_to_a1(row, TRIGGER_COL)}:{rowcol_to_a1(row, len(HEADER))}"
+    updated = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return a1, [["FALSE", status, output or "", updated]]
@@ -0,0 +1,304 @@
+"""
+Result cache for processed (symbol, from, to, series) requests.
+
+Two tiers, both keyed by a hash of the normalized request:
+- memory: LRU bounded by data.result_cache.memory_max_mb
+- disk:   {folder}/{key}.pkl bounded by disk_max_mb (least recently used
+          files evicted first - by the data catalog when enabled, else
+          by scanning the folder)
+
+Entries hold the processed frame (columnar, as pickled by pandas) and
+metrics; the Sheets payload is rebuilt from the frame at write time. Ranges that include
+today expire after ttl_live_seconds (the session may still change);
+purely historical ranges keep for ttl_historical_seconds.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from pathlib import Path
+
+from modules import catalog
+
+
+# Bump when frame/metrics layout changes so old entries are ignored
+CACHE_VERSION = 2
+
+# Guards first-use creation (init_state pre-seeds the slot with None)
+_CREATE_LOCK = threading.Lock()
+
+
+class CacheError(Exception):
+    pass
+
+
+def is_enabled(config: dict) -> bool:
+    return config["data"].get("result_cache", {}).get("enabled", False)
+
+
+def get_cache(state: dict) -> dict:
+    """
+    Return the shared cache dict from state['resources'], creating it on first use.
+    """
+    resources = state["resources"]
+    cache = resources.get("result_cache")
+    if cache is None:
+        with _CREATE_LOCK:
+            cache = resources.get("result_cache")
+            if cache is None:
+                cache = resources["result_cache"] = _new_cache(state["config"])
+    return cache
+
+
+def _new_cache(config: dict) -> dict:
+    cache_cfg = config["data"].get("result_cache", {})
+    folder = Path(cache_cfg.get("folder", Path(config["data"]["folder"]) / "cache"))
+
+    return {
+        "folder": folder,
+        "memory_max_bytes": int(cache_cfg.get("memory_max_mb", 64) * 1024 * 1024),
+        "disk_max_bytes": int(cache_cfg.get("disk_max_mb", 512) * 1024 * 1024),
+        "ttl_live": cache_cfg.get("ttl_live_seconds", 300),
+        "ttl_historical": cache_cfg.get("ttl_historical_seconds", 7 * 24 * 3600),
+        "memory": OrderedDict(),     # key -> (expires_at, size, entry)
+        "memory_bytes": 0,
+        "lock": threading.Lock(),
+        "stats": {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "stores": 0,
+            "evictions": 0,
+        },
+    }
+
+
+# ---------------------------------------------------------------------
+# Keys
+# ---------------------------------------------------------------------
+def request_key(config: dict, symbol: str, from_date: str, to_date: str) -> str:
+    """
+    Content-addressed key for a request.
+
+    Symbol case/whitespace and date zero-padding are normalized, and the
+    analytics settings that shape metrics are part of the key.
+    """
+    analytics_cfg = config.get("analytics", {})
+    payload = {
+        "v": CACHE_VERSION,
+        "symbol": symbol.strip().upper(),
+        "from": _normalize_date(from_date).isoformat(),
+        "to": _normalize_date(to_date).isoformat(),
+        "series": sorted(analytics_cfg.get("series", [])),
+        "analytics": {k: v for k, v in sorted(analytics_cfg.items()) if k != "series"},
+    }
+    blob = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _normalize_date(value: str) -> date:
+    try:
+        return datetime.strptime(value.strip(), "%d-%m-%Y").date()
+    except (AttributeError, ValueError) as e:
+        raise CacheError(f"Invalid request date: {value!r}") from e
+
+
+# ---------------------------------------------------------------------
+# Lookup / Store
+# ---------------------------------------------------------------------
+def lookup(state: dict) -> dict | None:
+    """
+    Return {"frame", "metrics"} for the current transaction, or None.
+    """
+    logger = logging.getLogger("result_cache")
+    config = state["config"]
+    t = state["transaction"]
+
+    cache = get_cache(state)
+    key = request_key(config, t["symbol"], t["from_date"], t["to_date"])
+    now = time.time()
+
+    with cache["lock"]:
+        item = cache["memory"].get(key)
+        if item is not None:
+            expires_at, _, entry = item
+            if expires_at > now:
+                cache["memory"].move_to_end(key)
+                cache["stats"]["memory_hits"] += 1
+                logger.info(f"Result cache hit (memory): {t['symbol']}")
+                return entry
+            _drop_memory(cache, key)
+            cache["stats"]["expired"] += 1
+
+    path = cache["folder"] / f"{key}.pkl"
+    entry = _read_disk(path, now)
+
+    if catalog.is_enabled(config):
+        if entry is None:
+            catalog.discard(state, catalog.RESULT, path)
+        else:
+            catalog.touch(state, catalog.RESULT, path)
+
+    with cache["lock"]:
+        if entry is None:
+            cache["stats"]["misses"] += 1
+            return None
+
+        cache["stats"]["disk_hits"] += 1
+        _put_memory(cache, key, entry["expires_at"], entry["size"], entry["result"])
+
+    logger.info(f"Result cache hit (disk): {t['symbol']}")
+    return entry["result"]
+
+
+def store(state: dict) -> None:
+    """
+    Cache the current transaction's frame and metrics in both tiers.
+    """
+    config = state["config"]
+    t = state["transaction"]
+
+    cache = get_cache(state)
+    key = request_key(config, t["symbol"], t["from_date"], t["to_date"])
+
+    includes_today = _normalize_date(t["to_date"]) >= date.today()
+    ttl = cache["ttl_live"] if includes_today else cache["ttl_historical"]
+    expires_at = time.time() + ttl
+
+    result = {"frame": t["frame"], "metrics": t["metrics"]}
+    blob = pickle.dumps(
+        {"version": CACHE_VERSION, "expires_at": expires_at, "result": result},
+        protocol=pickle.HIGHEST_PROTOCOL,
+    )
+
+    with cache["lock"]:
+        _put_memory(cache, key, expires_at, len(blob), result)
+        cache["stats"]["stores"] += 1
+
+    path = cache["folder"] / f"{key}.pkl"
+    if not _write_disk(path, blob):
+        return
+
+    if catalog.is_enabled(config):
+        catalog.add(state, catalog.RESULT, path)
+    else:
+        _evict_disk(cache)
+
+
+def stats(state: dict) -> dict:
+    cache = get_cache(state)
+    with cache["lock"]:
+        s = dict(cache["stats"])
+        s["memory_entries"] = len(cache["memory"])
+        s["memory_bytes"] = cache["memory_bytes"]
+
+    lookups = s["memory_hits"] + s["disk_hits"] + s["misses"]
+    s["hit_rate"] = round((s["memory_hits"] + s["disk_hits"]) / lookups, 3) if lookups else 0.0
+    return s
+
+
+def log_stats(state: dict) -> None:
+    s = stats(state)
+    logging.getLogger("result_cache").info(
+        f"Result cache: {s['memory_hits']} memory / {s['disk_hits']} disk hits, "
+        f"{s['misses']} misses (hit rate {s['hit_rate']:.0%}), "
+        f"{s['memory_entries']} in memory, {s['evictions']} evicted"
+    )
+
+
+# ---------------------------------------------------------------------
+# Memory tier (caller holds the lock)
+# ---------------------------------------------------------------------
+def _put_memory(cache: dict, key: str, expires_at: float, size: int, result: dict) -> None:
+    if key in cache["memory"]:
+        _drop_memory(cache, key)
+
+    # Larger than the whole tier - disk only
+    if size > cache["memory_max_bytes"]:
+        return
+
+    cache["memory"][key] = (expires_at, size, result)
+    cache["memory_bytes"] += size
+
+    while cache["memory_bytes"] > cache["memory_max_bytes"]:
+        oldest = next(iter(cache["memory"]))
+        _drop_memory(cache, oldest)
+        cache["stats"]["evictions"] += 1
+
+
+def _drop_memory(cache: dict, key: str) -> None:
+    _, size, _ = cache["memory"].pop(key)
+    cache["memory_bytes"] -= size
+
+
+# ---------------------------------------------------------------------
+# Disk tier
+# ---------------------------------------------------------------------
+def _read_disk(path: Path, now: float) -> dict | None:
+    try:
+        blob = path.read_bytes()
+        entry = pickle.loads(blob)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logging.getLogger("result_cache").warning(f"Unreadable cache file {path.name}: {e}")
+        path.unlink(missing_ok=True)
+        return None
+
+    if entry.get("version") != CACHE_VERSION or entry["expires_at"] <= now:
+        path.unlink(missing_ok=True)
+        return None
+
+    # mtime doubles as last-access time for disk eviction
+    os.utime(path)
+    entry["size"] = len(blob)
+    return entry
+
+
+def _write_disk(path: Path, blob: bytes) -> bool:
+    logger = logging.getLogger("result_cache")
+
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(blob)
+        tmp.replace(path)
+    except OSError as e:
+        logger.warning(f"Result cache write failed: {e}")
+        return False
+
+    return True
+
+
+def _evict_disk(cache: dict) -> None:
+    """
+    Delete least recently used cache files until under disk_max_bytes
+    (catalog disabled - scans the folder on every store).
+    """
+    files = []
+    total = 0
+    for path in cache["folder"].glob("*.pkl"):
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            continue
+        files.append((st.st_mtime, st.st_size, path))
+        total += st.st_size
+
+    if total <= cache["disk_max_bytes"]:
+        return
+
+    for _, size, path in sorted(files):
+        path.unlink(missing_ok=True)
+        total -= size
+        with cache["lock"]:
+            cache["stats"]["evictions"] += 1
+        if total <= cache["disk_max_bytes"]:
+            break
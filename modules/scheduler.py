@@ -0,0 +1,136 @@
+"""
+Adaptive poll scheduler - decides how long the monitor waits between polls.
+
+Polls fast right after activity, backs off exponentially while idle or
+failing, and stretches to a long interval inside configured quiet windows.
+"""
+
+import logging
+import time
+from datetime import datetime, timedelta
+
+
+def init_scheduler(config: dict) -> dict:
+    """
+    Build scheduler state from google_sheets config.
+    """
+    sheets_cfg = config["google_sheets"]
+    polling = sheets_cfg.get("polling", {})
+
+    base = sheets_cfg["poll_interval_seconds"]
+
+    return {
+        "base_interval": base,
+        "min_interval": polling.get("min_interval_seconds", base),
+        "max_interval": polling.get("max_interval_seconds", base),
+        "backoff_factor": polling.get("backoff_factor", 2),
+        "active_window": polling.get("active_window_seconds", 0),
+        "idle_polls_before_backoff": polling.get("idle_polls_before_backoff", 0),
+        "quiet_windows": polling.get("quiet_windows", []),
+        "last_activity": None,   # monotonic time of last accepted trigger
+        "idle_streak": 0,
+        "failure_streak": 0,
+    }
+
+
+def next_delay(sched: dict, outcome: str, now: datetime | None = None) -> float:
+    """
+    Record a poll outcome and return the seconds to wait before the next poll.
+
+    outcome: "triggered", "idle" or "error".
+    """
+    now = now or datetime.now()
+    mono = time.monotonic()
+
+    if outcome == "triggered":
+        sched["last_activity"] = mono
+        sched["idle_streak"] = 0
+        sched["failure_streak"] = 0
+    elif outcome == "error":
+        sched["failure_streak"] += 1
+    else:
+        sched["failure_streak"] = 0
+        sched["idle_streak"] += 1
+
+    # Quiet window overrides everything except wake-up at window end
+    quiet = _quiet_delay(sched, now)
+    if quiet is not None:
+        return quiet
+
+    if sched["failure_streak"]:
+        return _backoff(sched, sched["failure_streak"])
+
+    last = sched["last_activity"]
+    if last is not None and mono - last < sched["active_window"]:
+        return sched["min_interval"]
+
+    excess = sched["idle_streak"] - sched["idle_polls_before_backoff"]
+    if excess > 0:
+        return _backoff(sched, excess)
+
+    return sched["base_interval"]
+
+
+def _backoff(sched: dict, steps: int) -> float:
+    """
+    Exponential growth from the base interval, capped at max_interval.
+    """
+    # Cap the exponent so long idle streaks cannot overflow
+    steps = min(steps, 32)
+    delay = sched["base_interval"] * (sched["backoff_factor"] ** steps)
+    return float(min(delay, sched["max_interval"]))
+
+
+def _quiet_delay(sched: dict, now: datetime) -> float | None:
+    """
+    Seconds to sleep if now falls in a quiet window, else None.
+
+    Windows look like {"start": "18:00", "end": "09:00", "interval_seconds": 300,
+    "weekdays": [0, 1, 2, 3, 4]}. A window whose end is before its start wraps
+    past midnight; equal start and end cover the whole day (e.g. weekends).
+    The returned delay never overshoots the window end.
+    """
+    for window in sched["quiet_windows"]:
+        end_at = _window_end(window, now)
+        if end_at is None:
+            continue
+
+        interval = window.get("interval_seconds", sched["max_interval"])
+        remaining = (end_at - now).total_seconds()
+        return float(max(sched["min_interval"], min(interval, remaining)))
+
+    return None
+
+
+def _window_end(window: dict, now: datetime) -> datetime | None:
+    """
+    Return when the window ends if now is inside it, else None.
+    """
+    try:
+        start = datetime.strptime(window["start"], "%H:%M").time()
+        end = datetime.strptime(window["end"], "%H:%M").time()
+    except (KeyError, ValueError):
+        logging.getLogger("scheduler").warning(f"Invalid quiet window: {window}")
+        return None
+
+    current = now.time()
+    weekdays = window.get("weekdays")
+
+    if start < end:
+        if not start <= current < end:
+            return None
+        window_day = now.date()
+        end_at = datetime.combine(now.date(), end)
+    elif current >= start:
+        window_day = now.date()
+        end_at = datetime.combine(now.date() + timedelta(days=1), end)
+    elif current < end:
+        window_day = now.date() - timedelta(days=1)
+        end_at = datetime.combine(now.date(), end)
+    else:
+        return None
+
+    if weekdays is not None and window_day.weekday() not in weekdays:
+        return None
+
+    return end_at
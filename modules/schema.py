@@ -0,0 +1,293 @@
+"""
+Declared schema for the NSE priceVolumeDeliverable CSV.
+
+Applying the declared dtypes avoids pandas keeping text columns for
+every field: repeated strings become categoricals, dates are parsed once,
+quantities use nullable integers, and "-" placeholders / thousands separators
+are handled by the C parser. Missing columns or unparseable values raise
+SchemaError instead of flowing on as strings.
+"""
+
+import csv
+import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+DATE_FORMAT = "%d-%b-%Y"
+NA_VALUES = ["-", ""]
+
+# Clean column name -> dtype ("date" is parsed with DATE_FORMAT).
+# Prices stay float64: float32 keeps ~7 significant digits, so 2-decimal
+# prices above ~131072 (MRF) would not round-trip.
+PRICE_VOLUME_DELIVERABLE = {
+    "Symbol": "category",
+    "Series": "category",
+    "Date": "date",
+    "Prev Close": "float64",
+    "Open Price": "float64",
+    "High Price": "float64",
+    "Low Price": "float64",
+    "Last Price": "float64",
+    "Close Price": "float64",
+    "Average Price": "float64",
+    "Total Traded Quantity": "Int64",
+    "Turnover ₹": "float64",
+    "No. of Trades": "Int32",
+    "Deliverable Qty": "Int64",
+    "% Dly Qt to Traded Qty": "float64",
+}
+
+REQUIRED_COLUMNS = ["Symbol", "Series", "Date", "Deliverable Qty", "% Dly Qt to Traded Qty"]
+
+# Header spellings NSE has used for the same field
+ALIASES = {
+    "Turnover": "Turnover ₹",
+    "Turnover (₹)": "Turnover ₹",
+    "Turnover ₹": "Turnover ₹",
+}
+
+
+# "Jan".."Dec" as big-endian 3-byte integers (sorted) -> month number
+_MONTHS = {
+    int.from_bytes(m.encode(), "big"): i
+    for i, m in enumerate(["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"], 1)
+}
+_MONTH_KEYS = np.array(sorted(_MONTHS), dtype=np.int64)
+_MONTH_NUMBERS = np.array([_MONTHS[k] for k in _MONTH_KEYS], dtype=np.int64)
+
+
+class SchemaError(Exception):
+    pass
+
+
+def clean_name(name: str) -> str:
+    """
+    Strip the BOM and padding NSE leaves on header names.
+    """
+    name = str(name).lstrip("\ufeff").strip()
+    return ALIASES.get(name, name)
+
+
+def read_nse_csv(csv_path: Path, usecols: list[str] | None = None, chunksize: int | None = None):
+    """
+    Read an NSE CSV with the declared schema.
+
+    usecols takes clean column names. Returns a DataFrame, or an iterator
+    of DataFrames when chunksize is set.
+
+    One read_csv pass: the header names come from the first line (csv
+    module, no second parse), categoricals and floats are typed by the C
+    parser along with thousands separators and "-" placeholders, and the
+    rest are narrowed afterwards - integer dtypes cannot take thousands=
+    at parse time.
+    """
+    try:
+        with open(csv_path, "r", encoding="utf-8-sig", newline="") as f:
+            raw_header = next(csv.reader(f, skipinitialspace=True), [])
+    except (OSError, UnicodeDecodeError) as e:
+        raise SchemaError(f"Cannot read NSE CSV header: {e}")
+
+    unknown = {clean_name(raw) for raw in raw_header} - set(PRICE_VOLUME_DELIVERABLE)
+    if unknown:
+        logging.getLogger("schema").warning(f"Unknown NSE columns (kept as text): {sorted(unknown)}")
+
+    wanted = set(usecols) if usecols else None
+    dtype = {}
+    for raw in raw_header:
+        kind = PRICE_VOLUME_DELIVERABLE.get(clean_name(raw))
+        if kind == "category" or (kind or "").startswith("float"):
+            dtype[raw] = kind
+
+    try:
+        result = pd.read_csv(
+            csv_path,
+            usecols=(lambda raw: clean_name(raw) in wanted) if wanted else None,
+            dtype=dtype,
+            thousands=",",
+            na_values=NA_VALUES,
+            skipinitialspace=True,
+            chunksize=chunksize,
+        )
+    except (ValueError, TypeError) as e:
+        raise SchemaError(f"NSE CSV does not match schema: {e}")
+
+    if chunksize:
+        return (_finish(chunk, usecols) for chunk in result)
+
+    return _finish(result, usecols)
+
+
+def coerce(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Apply the schema to an in-memory frame (text or already typed).
+    """
+    df = df.rename(columns=clean_name)
+    _validate_columns(set(df.columns), REQUIRED_COLUMNS)
+
+    out = {}
+    for col in df.columns:
+        kind = PRICE_VOLUME_DELIVERABLE.get(col)
+        series = df[col]
+
+        if kind is None:
+            out[col] = series
+        elif kind == "date":
+            out[col] = _to_date(series)
+        elif kind == "category":
+            out[col] = series.astype("string").str.strip().astype("category")
+        else:
+            try:
+                out[col] = _to_number(series).astype(kind)
+            except (ValueError, TypeError) as e:
+                raise SchemaError(f"Column {col!r} does not fit {kind}: {e}")
+
+    return _check_dates(pd.DataFrame(out, index=df.index))
+
+
+def concat(frames: list[pd.DataFrame]) -> pd.DataFrame:
+    """
+    pd.concat that keeps categorical columns categorical when the frames
+    carry different category sets.
+    """
+    df = pd.concat(frames, ignore_index=True)
+    categorical = {
+        col: "category" for col, kind in PRICE_VOLUME_DELIVERABLE.items()
+        if kind == "category" and col in df.columns and df[col].dtype != "category"
+    }
+    return df.astype(categorical) if categorical else df
+
+
+def to_sheet_rows(df: pd.DataFrame) -> list[list]:
+    """
+    Header + rows of JSON-safe values for a Sheets update.
+
+    Dates go back to NSE's DD-Mon-YYYY text, missing values become "",
+    and floats are rounded to NSE's 2 decimals.
+    """
+    columns = []
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            values = series.dt.strftime(DATE_FORMAT).astype(object)
+        elif pd.api.types.is_float_dtype(series):
+            values = series.astype("float64").round(2).astype(object)
+        elif pd.api.types.is_numeric_dtype(series):
+            values = series.astype(object)
+        else:
+            values = series.astype(object)
+        columns.append(values.where(series.notna(), "").tolist())
+
+    return [df.columns.tolist()] + [list(row) for row in zip(*columns)]
+
+
+def _finish(df: pd.DataFrame, usecols: list[str] | None) -> pd.DataFrame:
+    # Fresh frame from read_csv - typed in place
+    df.columns = [clean_name(col) for col in df.columns]
+    _validate_columns(set(df.columns), usecols or REQUIRED_COLUMNS)
+
+    # Column by column: DataFrame.astype(dict) costs more than the casts
+    for col in df.columns:
+        kind = PRICE_VOLUME_DELIVERABLE.get(col, "string")
+        series = df[col]
+        if kind == "date":
+            df[col] = parse_dates(series)
+        elif series.dtype != kind:
+            try:
+                df[col] = series.astype(kind)
+            except (ValueError, TypeError) as e:
+                raise SchemaError(f"Column {col!r} does not fit {kind}: {e}")
+
+    return _check_dates(df)
+
+
+def _validate_columns(present: set, required: list[str]) -> None:
+    missing = [c for c in required if c not in present]
+    if missing:
+        raise SchemaError(f"NSE CSV missing columns: {missing}")
+
+
+def _check_dates(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Fail fast when dates did not parse (format drift) instead of
+    silently producing text or NaT columns.
+    """
+    if "Date" not in df.columns or df.empty:
+        return df
+
+    if not pd.api.types.is_datetime64_any_dtype(df["Date"]):
+        raise SchemaError(f"Date column not in {DATE_FORMAT} format")
+
+    if df["Date"].isna().all():
+        raise SchemaError("No Date values could be parsed")
+
+    return df
+
+
+def _to_date(series: pd.Series) -> pd.Series:
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    return parse_dates(series.astype("string").str.strip())
+
+
+def parse_dates(series: pd.Series) -> pd.Series:
+    """
+    DD-Mon-YYYY text -> datetime64, unparseable values -> NaT (same as
+    pd.to_datetime with DATE_FORMAT and errors="coerce").
+
+    NSE dates are fixed width, so the digits are read straight from the
+    bytes; pd.to_datetime with a %b format goes through strptime one
+    value at a time and was most of the parse time.
+    """
+    try:
+        raw = series.to_numpy(dtype="S12")
+    except UnicodeEncodeError:
+        return pd.to_datetime(series, format=DATE_FORMAT, errors="coerce")
+
+    b = raw.view(np.uint8).reshape(-1, 12).astype(np.int64)
+    digits = b[:, [0, 1, 7, 8, 9, 10]] - ord("0")
+    key = (b[:, 3] << 16) | (b[:, 4] << 8) | b[:, 5]
+    slot = np.searchsorted(_MONTH_KEYS, key).clip(0, 11)
+
+    valid = (
+        (b[:, 11] == 0) & (b[:, 2] == ord("-")) & (b[:, 6] == ord("-"))
+        & ((digits >= 0) & (digits <= 9)).all(axis=1)
+        & (_MONTH_KEYS[slot] == key)
+    )
+    day = digits[:, 0] * 10 + digits[:, 1]
+    year = digits[:, 2] * 1000 + digits[:, 3] * 100 + digits[:, 4] * 10 + digits[:, 5]
+    month = _MONTH_NUMBERS[slot]
+    valid &= (day >= 1) & (day <= _days_in_month(year, month))
+
+    months = np.where(valid, (year - 1970) * 12 + month - 1, 0).astype("datetime64[M]")
+    dates = months.astype("datetime64[D]") + np.where(valid, day - 1, 0)
+    dates = pd.Series(dates.astype("datetime64[us]"), index=series.index, name=series.name)
+
+    # Anything off the fixed layout ("1-jan-2024", blanks) takes the slow path
+    if not valid.all():
+        dates[~valid] = pd.to_datetime(series[~valid], format=DATE_FORMAT, errors="coerce")
+    return dates
+
+
+def _days_in_month(year: np.ndarray, month: np.ndarray) -> np.ndarray:
+    start = ((year - 1970) * 12 + month - 1).astype("datetime64[M]")
+    return ((start + 1).astype("datetime64[D]") - start.astype("datetime64[D]")).astype(np.int64)
+
+
+def _to_number(series: pd.Series) -> pd.Series:
+    if pd.api.types.is_numeric_dtype(series):
+        return series
+
+    text = series.astype("string").str.replace(",", "", regex=False).str.strip()
+    text = text.where(~text.isin(NA_VALUES))
+
+    try:
+        return text.astype("float64")
+    except (ValueError, TypeError):
+        raise SchemaError(f"Non-numeric values in column {series.name!r}")
+
+
+def memory_bytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True).sum())
@@ -0,0 +1,319 @@
+"""
+Universe screener - fetch + delivery metrics across many symbols.
+
+Triggered from CUSTOM_VIEW by putting UNIVERSE (whole equity list) or
+WATCHLIST:<name> (config screener.watchlists) in the symbol cell. Produces
+one ranked table of delivery-% spikes versus a trailing average.
+"""
+
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+
+from modules import analytics, bhavcopy, history_store, nse_client, schema, state
+
+
+UNIVERSE = "UNIVERSE"
+WATCHLIST_PREFIX = "WATCHLIST:"
+
+TABLE_HEADER = [
+    "Rank", "Symbol", "Date", "Close", "Deliverable Qty",
+    "Delivery %", "Trailing Avg %", "Spike (x)",
+]
+
+
+class ScreenerError(Exception):
+    pass
+
+
+def is_screen_request(symbol: str | None) -> bool:
+    return bool(symbol) and (symbol == UNIVERSE or symbol.startswith(WATCHLIST_PREFIX))
+
+
+def resolve_symbols(config: dict, request: str) -> list[str]:
+    """
+    Expand UNIVERSE / WATCHLIST:<name> into a list of NSE symbols.
+    """
+    screener_cfg = config.get("screener", {})
+
+    if request == UNIVERSE:
+        return load_equity_list(config)
+
+    name = request[len(WATCHLIST_PREFIX):].strip()
+    watchlists = {k.upper(): v for k, v in screener_cfg.get("watchlists", {}).items()}
+
+    if name.upper() not in watchlists:
+        raise ScreenerError(f"Unknown watchlist: {name}")
+
+    return [s.strip().upper() for s in watchlists[name.upper()] if s.strip()]
+
+
+def load_equity_list(config: dict) -> list[str]:
+    """
+    Read symbols from the NSE equity list (EQUITY_L format).
+    """
+    screener_cfg = config.get("screener", {})
+    path = _find_case_insensitive(Path(screener_cfg.get("equity_list", "data/nse_equity_list.CSV")))
+
+    if path is None:
+        raise ScreenerError("Equity list not found")
+
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    df.columns = [c.strip().upper() for c in df.columns]
+
+    series = screener_cfg.get("series")
+    if series and "SERIES" in df.columns:
+        df = df[df["SERIES"].str.strip().isin(series)]
+
+    return df["SYMBOL"].str.strip().str.upper().drop_duplicates().tolist()
+
+
+def _find_case_insensitive(path: Path) -> Path | None:
+    if path.exists():
+        return path
+    if path.parent.exists():
+        for candidate in path.parent.iterdir():
+            if candidate.name.lower() == path.name.lower():
+                return candidate
+    return None
+
+
+# ---------------------------------------------------------------------
+# Screen Run
+# ---------------------------------------------------------------------
+def run(state_dict: dict, fetch=None) -> None:
+    """
+    Execute a screen for the symbol set named in the transaction and write
+    the ranked table.
+
+    fetch replaces fetch_all (same signature) - the async I/O core passes
+    its event-loop fetcher here.
+    """
+    write(state_dict, screen(state_dict, fetch))
+
+
+def screen(state_dict: dict, fetch=None) -> list[list]:
+    """
+    Fetch and score the screen's symbols; returns the ranked table.
+
+    1. Fetch each symbol (thread pool, shared NSE rate limiter)
+    2. Score each CSV (process pool)
+
+    The staged pipeline and the async core call this and leave the write
+    to their serial writer.
+    """
+    logger = logging.getLogger("screener")
+
+    config = state_dict["config"]
+    screener_cfg = config.get("screener", {})
+    t = state_dict["transaction"]
+
+    symbols = resolve_symbols(config, t["symbol"])
+    if not symbols:
+        raise ScreenerError(f"No symbols for {t['symbol']}")
+
+    started = time.perf_counter()
+    logger.info(f"Screen started: {t['symbol']} ({len(symbols)} symbols)")
+
+    # -------------------------------------------------------------
+    # Stage 1: Fetch
+    # -------------------------------------------------------------
+    state.update_stage(state_dict, "FETCHING")
+    csv_paths = (fetch or fetch_all)(state_dict, symbols, t["from_date"], t["to_date"])
+    logger.info(f"✓ Fetched {len(csv_paths)}/{len(symbols)} symbols")
+
+    # -------------------------------------------------------------
+    # Stage 2: Score
+    # -------------------------------------------------------------
+    state.update_stage(state_dict, "PROCESSING")
+    scores = score_all(config, csv_paths)
+    t["metrics"] = {"total_rows": len(scores)}
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"✓ Scored {len(scores)} symbols in {elapsed:.1f}s")
+    return rank(scores, screener_cfg.get("top_n", 25))
+
+
+def write(state_dict: dict, ranked: list[list]) -> None:
+    """
+    Write the ranked table (with status and trigger reset) in one Sheets update.
+    """
+    # Imported here: symbol resolution (batch mode) must not need gspread
+    from modules import sheets_io
+
+    state.update_stage(state_dict, "WRITING")
+    sheets_io.write_screen(state_dict, ranked)
+    logging.getLogger("screener").info(f"Screen completed: {state_dict['transaction']['symbol']}")
+
+
+def fetch_all(state_dict: dict, symbols: list[str], from_date: str, to_date: str) -> dict[str, Path]:
+    """
+    Fetch CSVs for many symbols concurrently. Failed symbols are skipped.
+    """
+    logger = logging.getLogger("screener")
+
+    prepare_source(state_dict, from_date, to_date)
+
+    workers = state_dict["config"].get("screener", {}).get("fetch_workers", 4)
+
+    def fetch_one(symbol: str) -> Path:
+        return nse_client.fetch_csv(symbol_state(state_dict, symbol, from_date, to_date))
+
+    paths = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="screen-fetch") as executor:
+        futures = {executor.submit(fetch_one, s): s for s in symbols}
+        for future in as_completed(futures):
+            symbol = futures[future]
+            try:
+                paths[symbol] = future.result()
+            except nse_client.NSEFetchError as e:
+                logger.warning(f"Skipping {symbol}: {e}")
+
+    return paths
+
+
+def prepare_source(state_dict: dict, from_date: str, to_date: str) -> None:
+    """
+    With screener.source = "bhavcopy" the range is first ingested from the
+    full-market daily files (one request per trading day), after which each
+    symbol is served from the history store without further network calls.
+    """
+    config = state_dict["config"]
+
+    if config.get("screener", {}).get("source") == "bhavcopy":
+        if not history_store.is_enabled(config):
+            raise ScreenerError("Bhavcopy source requires data.store.enabled")
+        try:
+            bhavcopy.ingest_range(
+                state_dict,
+                history_store.parse_request_date(from_date),
+                history_store.parse_request_date(to_date),
+            )
+        except bhavcopy.BhavcopyError as e:
+            # Symbols with gaps fall back to per-symbol fetches
+            logging.getLogger("screener").warning(f"Bhavcopy ingestion incomplete: {e}")
+
+
+def symbol_state(state_dict: dict, symbol: str, from_date: str, to_date: str) -> dict:
+    """
+    Minimal state view for fetching one symbol of a screen.
+    """
+    return state.transaction_state(state_dict, state.new_transaction(symbol, from_date, to_date))
+
+
+def score_all(config: dict, csv_paths: dict[str, Path]) -> list[dict]:
+    """
+    Score CSVs across a process pool.
+    """
+    screener_cfg = config.get("screener", {})
+    trailing_days = screener_cfg.get("trailing_days", 20)
+    series = screener_cfg.get("series")
+
+    scores = []
+    with _process_pool(screener_cfg.get("process_workers", 4)) as executor:
+        futures = [
+            executor.submit(score_csv, symbol, str(path), trailing_days, series)
+            for symbol, path in csv_paths.items()
+        ]
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                logging.getLogger("screener").warning(f"Scoring failed: {e}")
+                continue
+            if result is not None:
+                scores.append(result)
+
+    return scores
+
+
+def _process_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Process pool for CPU-side scoring.
+
+    Workers come from a forkserver (spawn where there is none) rather than
+    fork: by the time a screen runs the service has stage, executor and
+    HTTP threads, and forking a threaded process can copy held locks.
+    Children import main.py as a module, which is safe behind its
+    __main__ guard. The forkserver preloads this module, so each worker
+    starts with pandas already imported.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+    if context.get_start_method() == "forkserver":
+        context.set_forkserver_preload([__name__])
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+
+def score_csv(symbol: str, csv_path: str, trailing_days: int, series: list[str] | None) -> dict | None:
+    """
+    Latest delivery % versus the average of the preceding trailing_days sessions.
+
+    Runs in a worker process - takes and returns plain values only.
+    Only the columns needed for scoring are parsed.
+    """
+    df = schema.read_nse_csv(
+        csv_path,
+        usecols=["Series", "Date", "Close Price", "Deliverable Qty", analytics.DELIVERY_PCT],
+    )
+
+    if series:
+        df = df[df["Series"].isin(series)]
+
+    df = df.assign(
+        _pct=df[analytics.DELIVERY_PCT].astype("float64"),
+    ).dropna(subset=["Date", "_pct"]).sort_values("Date", kind="stable")
+
+    if len(df) < 2:
+        return None
+
+    latest = df.iloc[-1]
+    trailing = df["_pct"].iloc[-(trailing_days + 1):-1]
+    trailing_avg = trailing.mean()
+
+    if not trailing_avg:
+        return None
+
+    return {
+        "symbol": symbol,
+        "date": latest["Date"].strftime(schema.DATE_FORMAT),
+        "close": _cell(latest["Close Price"]),
+        "deliverable_qty": _cell(latest["Deliverable Qty"]),
+        "delivery_pct": round(float(latest["_pct"]), 2),
+        "trailing_avg_pct": round(float(trailing_avg), 2),
+        "spike": round(float(latest["_pct"] / trailing_avg), 2),
+    }
+
+
+def _cell(value) -> float | int | str:
+    if pd.isna(value):
+        return ""
+    return round(float(value), 2) if pd.api.types.is_float(value) else int(value)
+
+
+def rank(scores: list[dict], top_n: int) -> list[list]:
+    """
+    Build the Sheets table: header + top_n rows by spike, descending.
+
+    Equal spikes are ordered by symbol (scores arrive in completion order);
+    scores without a spike (NaN) are left out.
+    """
+    scored = [s for s in scores if not pd.isna(s["spike"])]
+    ordered = sorted(scored, key=lambda s: (-s["spike"], s["symbol"]))[:top_n]
+
+    rows = [TABLE_HEADER]
+    for i, s in enumerate(ordered, start=1):
+        rows.append([
+            i, s["symbol"], s["date"], s["close"], s["deliverable_qty"],
+            s["delivery_pct"], s["trailing_avg_pct"], s["spike"],
+        ])
+
+    # Pad to a fixed height so one update overwrites any previous table
+    while len(rows) < top_n + 1:
+        rows.append([""] * len(TABLE_HEADER))
+
+    return rows
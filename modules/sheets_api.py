@@ -0,0 +1,216 @@
+"""
+Quota-aware gateway for Google Sheets API calls.
+
+Polling (monitor) and writes (sheets_io) share one per-minute quota. Every
+Sheets request goes through call(), which:
+- takes a token from a shared token bucket (requests_per_minute, burst)
+- lets user-facing writes go first: polls leave write_reserve tokens
+  untouched and yield while a write is waiting
+- retries 429 / RESOURCE_EXHAUSTED with full-jitter exponential backoff
+- keeps usage counters (quota_stats) for logs and SYSTEM_STATUS
+"""
+
+import logging
+import random
+import threading
+import time
+
+import gspread
+
+from modules import lifecycle
+
+
+WRITE = "write"   # user-facing: RAW_DATA, status, trigger reset, connect
+POLL = "poll"     # background trigger polling
+PRIORITIES = (WRITE, POLL)
+
+RATE_LIMITED = 429
+
+# Guards first-use creation (init_state pre-seeds the slot with None)
+_CREATE_LOCK = threading.Lock()
+
+
+class SheetsQuotaError(Exception):
+    pass
+
+
+def get_client(state: dict) -> dict:
+    """
+    Return the shared limiter/counter dict, creating it on first use.
+    """
+    resources = state["resources"]
+    api = resources.get("sheets_api")
+    if api is None:
+        with _CREATE_LOCK:
+            api = resources.get("sheets_api")
+            if api is None:
+                api = resources["sheets_api"] = _new_client(state["config"])
+    return api
+
+
+def _new_client(config: dict) -> dict:
+    quota_cfg = config["google_sheets"].get("quota", {})
+    per_minute = quota_cfg.get("requests_per_minute", 60)
+    burst = quota_cfg.get("burst", 5)
+
+    return {
+        "config": {
+            "rate": per_minute / 60.0,
+            # Polls need 1 + reserve tokens, so the reserve must fit the bucket
+            "write_reserve": min(quota_cfg.get("write_reserve", 2), max(burst - 1, 0)),
+            "max_retries": quota_cfg.get("max_retries", 5),
+            "backoff_base": quota_cfg.get("backoff_base_seconds", 1),
+            "backoff_max": quota_cfg.get("backoff_max_seconds", 32),
+        },
+        "bucket": {"tokens": float(burst), "capacity": float(burst), "updated": time.monotonic()},
+        "cond": threading.Condition(),
+        "waiting": {p: 0 for p in PRIORITIES},
+        "stats": {
+            "calls": {p: 0 for p in PRIORITIES},
+            "rate_limited": 0,
+            "retries": 0,
+            "failed": 0,
+            "throttled_seconds": 0.0,
+        },
+    }
+
+
+# ---------------------------------------------------------------------
+# Calls
+# ---------------------------------------------------------------------
+def call(state: dict, priority: str, fn, *args, **kwargs):
+    """
+    Run one Sheets API request (fn(*args, **kwargs)) under the shared quota.
+
+    429s are retried up to quota.max_retries times; other errors propagate.
+    A poll stops retrying once shutdown has been requested.
+    """
+    logger = logging.getLogger("sheets_api")
+
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown Sheets call priority: {priority}")
+
+    api = get_client(state)
+    cfg = api["config"]
+    attempt = 0
+
+    while True:
+        waited = _acquire(api, priority)
+
+        with api["cond"]:
+            api["stats"]["calls"][priority] += 1
+            api["stats"]["throttled_seconds"] += waited
+
+        # Legacy running total (poll stats use it)
+        resources = state["resources"]
+        resources["sheets_api_calls"] = resources.get("sheets_api_calls", 0) + 1
+
+        # Per-run count (metrics) when called with a transaction's state
+        transaction = state.get("transaction")
+        if transaction is not None:
+            transaction["sheets_calls"] = transaction.get("sheets_calls", 0) + 1
+
+        try:
+            return fn(*args, **kwargs)
+
+        except gspread.exceptions.APIError as e:
+            if not _is_rate_limited(e):
+                raise
+
+            with api["cond"]:
+                api["stats"]["rate_limited"] += 1
+                # The server says we're over - stop handing out burst tokens
+                api["bucket"]["tokens"] = min(api["bucket"]["tokens"], 0.0)
+
+            if attempt >= cfg["max_retries"]:
+                with api["cond"]:
+                    api["stats"]["failed"] += 1
+                raise SheetsQuotaError(f"Sheets quota exhausted after {attempt + 1} attempts") from e
+
+            delay = random.uniform(0, min(cfg["backoff_max"], cfg["backoff_base"] * 2 ** attempt))
+            attempt += 1
+            logger.warning(f"Sheets 429 ({priority}) - retry {attempt}/{cfg['max_retries']} in {delay:.1f}s")
+
+            with api["cond"]:
+                api["stats"]["retries"] += 1
+
+            if priority == POLL:
+                if lifecycle.wait(state, delay):
+                    raise SheetsQuotaError("Shutdown requested during Sheets backoff") from e
+            else:
+                # Writes finish even while shutting down (pipeline drain)
+                time.sleep(delay)
+
+
+def _acquire(api: dict, priority: str) -> float:
+    """
+    Block until a token is available for this priority; return seconds waited.
+    """
+    cfg = api["config"]
+    bucket = api["bucket"]
+    reserve = 0 if priority == WRITE else cfg["write_reserve"]
+
+    started = time.monotonic()
+
+    with api["cond"]:
+        api["waiting"][priority] += 1
+        try:
+            while True:
+                _refill(bucket, cfg["rate"])
+
+                writes_first = priority == POLL and api["waiting"][WRITE] > 0
+                if not writes_first and bucket["tokens"] >= 1 + reserve:
+                    bucket["tokens"] -= 1
+                    break
+
+                needed = max(1 + reserve - bucket["tokens"], 0.1)
+                api["cond"].wait(timeout=needed / cfg["rate"])
+        finally:
+            api["waiting"][priority] -= 1
+            api["cond"].notify_all()
+
+    return time.monotonic() - started
+
+
+def _refill(bucket: dict, rate: float) -> None:
+    now = time.monotonic()
+    bucket["tokens"] = min(bucket["capacity"], bucket["tokens"] + (now - bucket["updated"]) * rate)
+    bucket["updated"] = now
+
+
+def _is_rate_limited(error: gspread.exceptions.APIError) -> bool:
+    code = getattr(error, "code", None)
+    if code is None and getattr(error, "response", None) is not None:
+        code = error.response.status_code
+    return code == RATE_LIMITED
+
+
+# ---------------------------------------------------------------------
+# Usage
+# ---------------------------------------------------------------------
+def quota_stats(state: dict) -> dict:
+    """
+    Snapshot of quota usage counters.
+    """
+    api = get_client(state)
+    with api["cond"]:
+        _refill(api["bucket"], api["config"]["rate"])
+        stats = api["stats"]
+        return {
+            "calls": sum(stats["calls"].values()),
+            "write_calls": stats["calls"][WRITE],
+            "poll_calls": stats["calls"][POLL],
+            "rate_limited": stats["rate_limited"],
+            "retries": stats["retries"],
+            "failed": stats["failed"],
+            "throttled_seconds": round(stats["throttled_seconds"], 2),
+            "tokens_available": round(api["bucket"]["tokens"], 2),
+        }
+
+
+def log_quota_stats(state: dict) -> None:
+    s = quota_stats(state)
+    logging.getLogger("sheets_api").info(
+        f"Sheets quota: {s['calls']} calls ({s['write_calls']} write / {s['poll_calls']} poll), "
+        f"{s['rate_limited']} x 429, {s['retries']} retries, {s['throttled_seconds']}s throttled"
+    )
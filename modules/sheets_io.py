@@ -1,12 +1,25 @@
 """
-Google Sheets I/O - SAFE full overwrite of RAW_DATA.
+Google Sheets I/O - SAFE writes of RAW_DATA (full overwrite or row diff).
+REQUESTS table rows write to their own tab the same way.
 Never deletes rows (avoids Sheets API errors).
 CLEAN FORMATTING - No unnecessary colors.
 """
 
+import hashlib
+import json
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 import gspread
+from gspread.utils import a1_to_rowcol, absolute_range_name, rowcol_to_a1
+
+from modules import lifecycle, request_table, sheets_api
+from modules import metrics as metrics_mod
+
+
+# Rows written to SYSTEM_STATUS on every update (padded with blanks)
+STATUS_ROWS = 20
 
 
 class SheetsIOError(Exception):
@@ -14,92 +27,509 @@ class SheetsIOError(Exception):
 
 
 def write_results(state: dict) -> None:
+    """
+    Write raw_data to RAW_DATA (or the transaction's output_sheet for a
+    REQUESTS row), sending only what changed since the last write.
+
+    A fingerprint of each sheet's contents (symbol, header, per-row hashes)
+    is kept in state['resources']['sheet_fingerprints']. When the symbol and header match and rows
+    were only appended or edited in place, just those ranges are sent;
+    otherwise the sheet is fully rewritten.
+
+    All of the run's writes (data, SYSTEM_STATUS, trigger reset) go out
+    as at most one spreadsheets.batchUpdate plus one values.batchUpdate.
+    """
     logger = logging.getLogger("sheets_io")
 
     try:
-        spreadsheet = state["resources"]["spreadsheet"]
         cfg = state["config"]["google_sheets"]
         sheets = cfg["sheet_names"]
 
-        raw_data = state["transaction"].get("raw_data", [])
+        # Built from the transaction's frame here, at write time; dropped
+        # with this call
+        raw_data = sheet_rows(state["transaction"])
         if not raw_data:
             logger.warning("No raw data to write")
             return
 
-        raw_sheet = spreadsheet.worksheet(sheets["raw_data"])
+        title = state["transaction"].get("output_sheet") or sheets["raw_data"]
+        raw_sheet = ensure_worksheet(state, title, len(raw_data), len(raw_data[0]))
 
-        # --------------------------------------------------
-        # SAFE ERASE (values only, structure preserved)
-        # --------------------------------------------------
-        raw_sheet.clear()
+        fingerprints = state["resources"].setdefault("sheet_fingerprints", {})
+        fingerprint = _fingerprint(state, raw_data)
+        ranges = _diff_ranges(cfg, fingerprints.get(title), fingerprint, raw_data)
 
-        # --------------------------------------------------
-        # Ensure sheet is large enough (expand only)
-        # --------------------------------------------------
-        rows_needed = len(raw_data)
-        cols_needed = len(raw_data[0])
+        # Forget the old fingerprint until this write lands - a failed write
+        # leaves the sheet in an unknown state
+        fingerprints[title] = None
 
-        current_rows = raw_sheet.row_count
-        current_cols = raw_sheet.col_count
+        batch = new_batch()
 
-        if rows_needed > current_rows or cols_needed > current_cols:
-            raw_sheet.resize(
-                rows=max(rows_needed, current_rows),
-                cols=max(cols_needed, current_cols),
+        if ranges is None:
+            _write_full(batch, raw_sheet, raw_data)
+            summary = f"{title} overwritten: {len(raw_data) - 1} rows"
+        elif ranges:
+            _write_ranges(batch, raw_sheet, raw_data, ranges)
+            rows_sent = sum(end - start for start, end in ranges)
+            summary = (
+                f"{title} updated incrementally: {rows_sent} of {len(raw_data) - 1} rows "
+                f"in {len(ranges)} range(s)"
             )
+        else:
+            summary = f"{title} unchanged - nothing sent"
 
         # --------------------------------------------------
-        # Write CSV dump
+        # Status + trigger reset (same batch)
         # --------------------------------------------------
-        raw_sheet.update(
-            range_name="A1",
-            values=raw_data,
-            value_input_option="USER_ENTERED"
-        )
+        _update_system_status(state, batch, success=True)
+        _reset_trigger(state, batch, success=True, output=title)
 
-        # --------------------------------------------------
-        # CLEAN MINIMAL FORMATTING
-        # --------------------------------------------------
-        # Bold header row only (no colors)
-        raw_sheet.format(
-            "1:1",
-            {"textFormat": {"bold": True}}
+        flush_batch(state, batch)
+
+        fingerprints[title] = fingerprint
+        logger.info(summary)
+        logger.info("All sheets updated successfully")
+
+    except Exception as e:
+        raise SheetsIOError(f"Sheets write failed: {e}")
+
+
+def sheet_rows(transaction: dict) -> list[list]:
+    """
+    The run's Sheets payload: header + rows of JSON-safe values, from the
+    frame (or a ready-made 'raw_data' payload); [] before processing.
+    """
+    if transaction.get("raw_data") is not None:
+        return transaction["raw_data"]
+    if transaction.get("frame") is None:
+        return []
+
+    # pandas is only needed once there is a frame
+    from modules import schema
+    return schema.to_sheet_rows(transaction["frame"])
+
+
+def _write_full(batch: dict, raw_sheet: gspread.Worksheet, raw_data: list[list]) -> None:
+    # --------------------------------------------------
+    # SAFE ERASE (values only, structure preserved)
+    # --------------------------------------------------
+    batch["requests"].append({
+        "updateCells": {
+            "range": {"sheetId": raw_sheet.id},
+            "fields": "userEnteredValue",
+        }
+    })
+
+    _ensure_size(batch, raw_sheet, len(raw_data), len(raw_data[0]))
+
+    # --------------------------------------------------
+    # CLEAN MINIMAL FORMATTING
+    # --------------------------------------------------
+    # Bold header row only (no colors), frozen
+    batch["requests"].append({
+        "repeatCell": {
+            "range": {"sheetId": raw_sheet.id, "startRowIndex": 0, "endRowIndex": 1},
+            "cell": {"userEnteredFormat": {"textFormat": {"bold": True}}},
+            "fields": "userEnteredFormat.textFormat.bold",
+        }
+    })
+    batch["requests"].append({
+        "updateSheetProperties": {
+            "properties": {"sheetId": raw_sheet.id, "gridProperties": {"frozenRowCount": 1}},
+            "fields": "gridProperties.frozenRowCount",
+        }
+    })
+
+    # --------------------------------------------------
+    # Write CSV dump
+    # --------------------------------------------------
+    add_values(batch, raw_sheet.title, "A1", raw_data)
+
+
+def _write_ranges(batch: dict, raw_sheet: gspread.Worksheet, raw_data: list[list], ranges: list[tuple[int, int]]) -> None:
+    """
+    Queue changed/appended row runs [start, end).
+    """
+    _ensure_size(batch, raw_sheet, len(raw_data), len(raw_data[0]))
+
+    last_col = len(raw_data[0])
+    for start, end in ranges:
+        add_values(
+            batch,
+            raw_sheet.title,
+            f"{rowcol_to_a1(start + 1, 1)}:{rowcol_to_a1(end, last_col)}",
+            raw_data[start:end],
         )
-        raw_sheet.freeze(rows=1)
 
-        logger.info(f"RAW_DATA overwritten: {len(raw_data) - 1} rows")
 
-        # --------------------------------------------------
-        # Status + trigger reset
-        # --------------------------------------------------
-        _update_system_status(state, success=True)
-        _reset_trigger(state)
+def _ensure_size(batch: dict, raw_sheet: gspread.Worksheet, rows_needed: int, cols_needed: int) -> None:
+    """
+    Grow the sheet to fit (expand only).
+    """
+    current_rows = raw_sheet.row_count
+    current_cols = raw_sheet.col_count
+
+    if rows_needed > current_rows or cols_needed > current_cols:
+        batch["requests"].append({
+            "updateSheetProperties": {
+                "properties": {
+                    "sheetId": raw_sheet.id,
+                    "gridProperties": {
+                        "rowCount": max(rows_needed, current_rows),
+                        "columnCount": max(cols_needed, current_cols),
+                    },
+                },
+                "fields": "gridProperties.rowCount,gridProperties.columnCount",
+            }
+        })
+        # Cached handle still reports the old size - refetch next time
+        batch["invalidate"].add(raw_sheet.title)
 
-        logger.info("All sheets updated successfully")
+
+# ------------------------------------------------------------------
+# Sheet fingerprint / diff
+# ------------------------------------------------------------------
+def _fingerprint(state: dict, raw_data: list[list]) -> dict:
+    t = state["transaction"]
+    return {
+        "symbol": t.get("symbol"),
+        "header": tuple(raw_data[0]),
+        "rows": [_row_hash(row) for row in raw_data[1:]],
+    }
+
+
+def _row_hash(row: list) -> bytes:
+    return hashlib.blake2b(repr(row).encode("utf-8"), digest_size=8).digest()
+
+
+def _diff_ranges(cfg: dict, previous: dict | None, current: dict, raw_data: list[list]) -> list[tuple[int, int]] | None:
+    """
+    raw_data index runs [start, end) to send, or None for a full rewrite.
+
+    Full rewrite when incremental writes are off, nothing is known about the
+    sheet, the symbol or header changed, rows were removed (stale rows would
+    remain), or too much changed for a diff to be worth it.
+    """
+    writes_cfg = cfg.get("raw_data_writes", {})
+    if not writes_cfg.get("incremental", True) or previous is None:
+        return None
+
+    if previous["symbol"] != current["symbol"] or previous["header"] != current["header"]:
+        return None
+
+    old_rows, new_rows = previous["rows"], current["rows"]
+    if len(new_rows) < len(old_rows):
+        return None
+
+    # Row i of the hash lists lives at raw_data[i + 1]
+    changed = [i + 1 for i, (a, b) in enumerate(zip(old_rows, new_rows)) if a != b]
+    changed.extend(range(len(old_rows) + 1, len(new_rows) + 1))
+
+    if len(changed) > writes_cfg.get("max_changed_fraction", 0.5) * len(new_rows):
+        return None
+
+    ranges = []
+    for idx in changed:
+        if ranges and ranges[-1][1] == idx:
+            ranges[-1] = (ranges[-1][0], idx + 1)
+        else:
+            ranges.append((idx, idx + 1))
+
+    return ranges
+
+
+def write_screen(state: dict, table: list[list]) -> None:
+    """
+    Write a ranked screener table to the SCREENER sheet, batched with the
+    status and trigger updates.
+    """
+    logger = logging.getLogger("sheets_io")
+
+    try:
+        cfg = state["config"]["google_sheets"]
+        title = cfg["sheet_names"].get("screener", "SCREENER")
+
+        ensure_worksheet(state, title, len(table), len(table[0]))
+
+        batch = new_batch()
+        add_values(batch, title, "A1", table)
+        _update_system_status(state, batch, success=True)
+        _reset_trigger(state, batch, success=True, output=title)
+        flush_batch(state, batch)
+
+        logger.info(f"{title} updated: {len(table) - 1} rows")
 
     except Exception as e:
-        raise SheetsIOError(f"Sheets write failed: {e}")
+        raise SheetsIOError(f"Screener write failed: {e}")
 
 
 def write_error(state: dict) -> None:
     logger = logging.getLogger("sheets_io")
     try:
-        _update_system_status(state, success=False)
-        _reset_trigger(state)
+        batch = new_batch()
+        _update_system_status(state, batch, success=False)
+        _reset_trigger(state, batch, success=False)
+        flush_batch(state, batch)
     except Exception as e:
         logger.error(f"Failed to write error state: {e}")
 
 
+def write_request_status(state: dict, queued: list[dict], rejected: list[dict]) -> None:
+    """
+    Mark REQUESTS rows in one batch: queued rows get Status QUEUED,
+    rejected rows (incomplete inputs) get their error and Trigger reset.
+    """
+    title = request_table.sheet_title(state["config"])
+    batch = new_batch()
+
+    for request in queued:
+        add_values(batch, title, *request_table.status_cells(request["row"], request_table.QUEUED))
+
+    for request in rejected:
+        add_values(batch, title, *request_table.result_cells(request["row"], f"INVALID: {request['error']}", None))
+
+    if batch["data"]:
+        flush_batch(state, batch)
+
+
 # ------------------------------------------------------------------
-# Helpers
+# Write batches
 # ------------------------------------------------------------------
-def _update_system_status(state: dict, success: bool) -> None:
+def new_batch() -> dict:
+    """
+    Collects one run's writes:
+    - requests: spreadsheets.batchUpdate requests (clear, resize, format)
+    - data: values.batchUpdate ranges
+    """
+    return {"requests": [], "data": [], "invalidate": set()}
+
+
+def add_values(batch: dict, title: str, a1_range: str, values: list[list]) -> None:
+    batch["data"].append({"range": absolute_range_name(title, a1_range), "values": values})
+
+
+def flush_batch(state: dict, batch: dict) -> int:
+    """
+    Send a batch - structural requests first so clears/resizes land before
+    the values. Small batches are one call each; large value payloads are
+    split by upload_values. Returns the number of calls.
+    """
+    logger = logging.getLogger("sheets_io")
     spreadsheet = state["resources"]["spreadsheet"]
+
+    started = time.perf_counter()
+    calls = 0
+
+    if batch["requests"]:
+        sheets_api.call(state, sheets_api.WRITE, spreadsheet.batch_update, {"requests": batch["requests"]})
+        calls += 1
+
+    if batch["data"]:
+        calls += upload_values(state, batch["data"])
+
+    for title in batch["invalidate"]:
+        invalidate_worksheet(state, title)
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    cells = sum(len(r["values"]) * len(r["values"][0]) for r in batch["data"] if r["values"])
+    logger.info(
+        f"Sheets batch: {calls} API call(s), {len(batch['requests'])} request(s), "
+        f"{len(batch['data'])} range(s) / {cells} cells in {elapsed_ms:.0f} ms"
+    )
+    return calls
+
+
+# ------------------------------------------------------------------
+# Chunked upload
+# ------------------------------------------------------------------
+def upload_values(state: dict, data: list[dict]) -> int:
+    """
+    values.batchUpdate for data, split into requests of at most
+    upload.max_block_bytes.
+
+    Oversized ranges are cut into row blocks. All requests but the last go
+    out concurrently (upload.workers); the last one - which carries the
+    status and trigger ranges queued after RAW_DATA - is sent only once
+    every block has landed. A failed block is retried on its own.
+    Returns the number of requests sent.
+    """
+    logger = logging.getLogger("sheets_io")
+    upload_cfg = state["config"]["google_sheets"].get("upload", {})
+    max_bytes = upload_cfg.get("max_block_bytes", 2_000_000)
+
+    blocks = [block for entry in data for block in _split_range(entry, max_bytes)]
+    requests = _group_blocks(blocks, max_bytes)
+
+    if len(requests) == 1:
+        _send_values(state, requests[0], upload_cfg)
+        return 1
+
+    started = time.perf_counter()
+    head, tail = requests[:-1], requests[-1]
+    workers = min(upload_cfg.get("workers", 4), len(head))
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sheets-upload") as executor:
+        futures = [executor.submit(_send_values, state, request, upload_cfg) for request in head]
+        for future in as_completed(futures):
+            future.result()
+
+    _send_values(state, tail, upload_cfg)
+
+    elapsed = time.perf_counter() - started
+    rows = sum(len(block["values"]) for request in requests for block in request)
+    logger.info(
+        f"Uploaded {rows} rows in {len(requests)} requests ({workers} workers) "
+        f"in {elapsed:.1f}s - {rows / max(elapsed, 1e-6):.0f} rows/s"
+    )
+    return len(requests)
+
+
+def _split_range(entry: dict, max_bytes: int) -> list[dict]:
+    """
+    Cut one range into row blocks of roughly max_bytes (JSON size).
+    """
+    values = entry["values"]
+    sizes = [len(json.dumps(row, default=str)) + 1 for row in values]
+
+    if sum(sizes) <= max_bytes:
+        return [{**entry, "bytes": sum(sizes)}]
+
+    # "'TITLE'!A21:K500" -> prefix "'TITLE'", start cell A21
+    prefix, a1 = entry["range"].rsplit("!", 1)
+    row, col = a1_to_rowcol(a1.split(":")[0])
+
+    blocks = []
+    start = 0
+    size = 0
+    for i, row_size in enumerate(sizes):
+        if size and size + row_size > max_bytes:
+            blocks.append(_block(prefix, row, col, values, start, i, size))
+            start, size = i, 0
+        size += row_size
+    blocks.append(_block(prefix, row, col, values, start, len(values), size))
+
+    return blocks
+
+
+def _block(prefix: str, row: int, col: int, values: list[list], start: int, end: int, size: int) -> dict:
+    # A start cell is enough - values.batchUpdate expands from it
+    return {
+        "range": f"{prefix}!{rowcol_to_a1(row + start, col)}",
+        "values": values[start:end],
+        "bytes": size,
+    }
+
+
+def _group_blocks(blocks: list[dict], max_bytes: int) -> list[list[dict]]:
+    """
+    Pack consecutive blocks into requests of at most max_bytes.
+    """
+    requests = [[]]
+    size = 0
+    for block in blocks:
+        if requests[-1] and size + block["bytes"] > max_bytes:
+            requests.append([])
+            size = 0
+        requests[-1].append(block)
+        size += block["bytes"]
+    return requests
+
+
+def _send_values(state: dict, request: list[dict], upload_cfg: dict) -> None:
+    """
+    One values.batchUpdate, retried on its own if it fails.
+
+    Quota errors have already been retried by sheets_api and propagate.
+    A shutdown during the retry backoff gives up at once (SheetsIOError).
+    """
+    spreadsheet = state["resources"]["spreadsheet"]
+    max_retries = upload_cfg.get("max_retries", 3)
+    body = {
+        "valueInputOption": "USER_ENTERED",
+        "data": [{"range": block["range"], "values": block["values"]} for block in request],
+    }
+
+    for attempt in range(max_retries + 1):
+        try:
+            sheets_api.call(state, sheets_api.WRITE, spreadsheet.values_batch_update, body)
+            return
+        except sheets_api.SheetsQuotaError:
+            raise
+        except Exception as e:
+            if attempt == max_retries:
+                raise
+            delay = upload_cfg.get("retry_backoff_seconds", 1) * 2 ** attempt
+            logging.getLogger("sheets_io").warning(
+                f"Upload block {body['data'][0]['range']} failed ({e}) - "
+                f"retry {attempt + 1}/{max_retries} in {delay:.0f}s"
+            )
+            if lifecycle.wait(state, delay):
+                raise SheetsIOError(f"Shutdown requested during upload retry of {body['data'][0]['range']}") from e
+
+
+# ------------------------------------------------------------------
+# Worksheet handles
+# ------------------------------------------------------------------
+def get_worksheet(state: dict, title: str, priority: str = sheets_api.WRITE) -> gspread.Worksheet:
+    """
+    Return a cached worksheet handle, fetching metadata only on first use.
+
+    Each spreadsheet.worksheet() call is a metadata API request, so handles
+    are kept in state['resources']['worksheets'] for the process lifetime.
+    """
+    resources = state["resources"]
+    cache = resources.setdefault("worksheets", {})
+
+    sheet = cache.get(title)
+    if sheet is None:
+        sheet = sheets_api.call(state, priority, resources["spreadsheet"].worksheet, title)
+        cache[title] = sheet
+
+    return sheet
+
+
+def ensure_worksheet(state: dict, title: str, rows: int, cols: int, header: list | None = None) -> gspread.Worksheet:
+    """
+    Cached worksheet handle, creating the tab (rows x cols, optional
+    header row) if it does not exist yet.
+    """
+    try:
+        return get_worksheet(state, title)
+    except gspread.exceptions.WorksheetNotFound:
+        pass
+
+    sheet = sheets_api.call(
+        state, sheets_api.WRITE,
+        state["resources"]["spreadsheet"].add_worksheet,
+        title=title, rows=max(rows, 1), cols=max(cols, 1),
+    )
+    state["resources"].setdefault("worksheets", {})[title] = sheet
+
+    if header:
+        batch = new_batch()
+        add_values(batch, title, "A1", [header])
+        flush_batch(state, batch)
+
+    logging.getLogger("sheets_io").info(f"Created worksheet: {title}")
+    return sheet
+
+
+def invalidate_worksheet(state: dict, title: str) -> None:
+    """
+    Drop a cached worksheet handle (e.g. after the sheet was renamed).
+    """
+    state["resources"].get("worksheets", {}).pop(title, None)
+
+
+# ------------------------------------------------------------------
+# Helpers
+# ------------------------------------------------------------------
+def _update_system_status(state: dict, batch: dict, success: bool) -> None:
     cfg = state["config"]["google_sheets"]
-    sheet = spreadsheet.worksheet(cfg["sheet_names"]["system_status"])
 
     t = state["transaction"]
     metrics = t.get("metrics", {})
+    quota = sheets_api.quota_stats(state)
 
     status_data = [
         ["Last Update Time", datetime.now().strftime("%Y-%m-%d %H:%M:%S")],
@@ -110,18 +540,45 @@ def _update_system_status(state: dict, success: bool) -> None:
         ["Avg Delivery %", metrics.get("avg_delivery_pct", 0)],
         ["Max Delivery %", metrics.get("max_delivery_pct", 0)],
         ["Min Delivery %", metrics.get("min_delivery_pct", 0)],
+        ["Rolling Delivery %", metrics.get("rolling_delivery_pct", 0)],
+        ["VWAP Delivery %", metrics.get("vwap_delivery_pct", 0)],
+        ["Delivery Qty Z-Score", metrics.get("delivery_qty_zscore", 0)],
+        ["Spike Days", metrics.get("spike_days", 0)],
+        ["Last Spike", metrics.get("last_spike_date") or "None"],
         ["Error", t.get("error") or "None"],
+        ["Sheets Calls (write / poll)", f"{quota['write_calls']} / {quota['poll_calls']}"],
+        ["Sheets 429s (retried)", f"{quota['rate_limited']} ({quota['retries']})"],
+        ["Stage Timings", metrics_mod.timing_summary(t)],
+        ["Sheets Calls (this run so far)", t.get("sheets_calls", 0)],
     ]
 
-    sheet.clear()
-    sheet.update("A1", status_data, value_input_option="USER_ENTERED")
+    # Blank padding overwrites any older, longer block - no separate clear
+    status_data += [["", ""]] * (STATUS_ROWS - len(status_data))
 
+    add_values(batch, cfg["sheet_names"]["system_status"], "A1", status_data)
 
-def _reset_trigger(state: dict) -> None:
-    spreadsheet = state["resources"]["spreadsheet"]
+
+def _reset_trigger(state: dict, batch: dict, success: bool, output: str | None = None) -> None:
     cfg = state["config"]["google_sheets"]
+    t = state["transaction"]
 
-    sheet = spreadsheet.worksheet(cfg["sheet_names"]["custom_view"])
-    cell = cfg["control_cells"]["trigger"]
+    # REQUESTS row: reset its own trigger and report status/output there
+    if t.get("request_row"):
+        if success:
+            rows = t.get("metrics", {}).get("total_rows")
+            status = f"DONE ({rows} rows)" if rows else "DONE"
+        else:
+            status = f"ERROR: {t.get('error') or 'unknown'}"[:200]
+        add_values(
+            batch,
+            request_table.sheet_title(state["config"]),
+            *request_table.result_cells(t["request_row"], status, output if success else None),
+        )
+        return
 
-    sheet.update(cell, [["FALSE"]], value_input_option="USER_ENTERED")
\ No newline at end of file
+    add_values(
+        batch,
+        cfg["sheet_names"]["custom_view"],
+        cfg["control_cells"]["trigger"],
+        [["FALSE"]],
+    )
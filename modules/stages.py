@@ -0,0 +1,390 @@
+"""
+Staged pipeline - overlapped fetch, process and write.
+
+Each transaction gets its own state view (state.transaction_state) and moves
+through bounded queues served by worker threads:
+
+    submit -> [fetch x pipeline.fetch_workers] -> [process] -> [write]
+
+Network, CPU and Sheets work run at the same time on different
+transactions, and several fetches can wait on NSE at once (REQUESTS table
+rows). Full queues push back: submit() refuses new work and upstream
+workers block until downstream has room. Writes (screen tables included)
+stay serial, which keeps each tab and its diff fingerprint consistent.
+"""
+
+import logging
+import queue
+import threading
+import time
+
+from modules import nse_client, pipeline, processor, profiling, screener, sheets_io
+from modules import metrics as metrics_mod
+from modules import state as state_mod
+
+
+STAGES = ("fetch", "process", "write")
+
+# Queue sentinel - one per worker, forwarded stage to stage by the last
+# worker out so queued work drains first
+_STOP = object()
+
+
+def is_enabled(config: dict) -> bool:
+    return config.get("pipeline", {}).get("staged", False)
+
+
+def start(state: dict) -> dict:
+    """
+    Create the stage queues and start the worker threads (fetch gets
+    pipeline.fetch_workers, process and write one each).
+    """
+    logger = logging.getLogger("stages")
+
+    pipeline_cfg = state["config"].get("pipeline", {})
+    queue_size = pipeline_cfg.get("queue_size", 4)
+    fetch_workers = max(int(pipeline_cfg.get("fetch_workers", 1)), 1)
+
+    stages = {
+        "queues": {name: queue.Queue(maxsize=queue_size) for name in STAGES},
+        "threads": {},
+        "workers": {"fetch": fetch_workers, "process": 1, "write": 1},
+        "running": {"fetch": fetch_workers, "process": 1, "write": 1},
+        "in_flight": {},             # (symbol, from, to, row) -> transaction state
+        "finished": {},              # key -> time.monotonic() its last run finished
+        "max_in_flight": pipeline_cfg.get("max_in_flight", 8),
+        "accepting": True,
+        "next_id": 1,
+        "lock": threading.Lock(),
+        "metrics": {
+            name: {"processed": 0, "failed": 0, "busy_seconds": 0.0, "max_depth": 0}
+            for name in STAGES
+        },
+        "completed": 0,
+    }
+
+    state["resources"]["stages"] = stages
+    state["resources"].setdefault("active_csvs", set())
+
+    work = {"fetch": (_fetch, "process"), "process": (_process, "write"), "write": (_write, None)}
+    for name, (fn, next_name) in work.items():
+        for i in range(stages["workers"][name]):
+            thread_name = f"stage-{name}" if stages["workers"][name] == 1 else f"stage-{name}-{i + 1}"
+            thread = threading.Thread(
+                target=_stage_loop,
+                args=(state, name, fn, next_name),
+                name=thread_name,
+                daemon=True,
+            )
+            stages["threads"][thread_name] = thread
+            thread.start()
+
+    logger.info(
+        f"Staged pipeline started (queue size {queue_size}, max in flight {stages['max_in_flight']}, "
+        f"{fetch_workers} fetch worker(s))"
+    )
+    return stages
+
+
+def submit(state: dict, symbol: str, from_date: str, to_date: str,
+           request_row: int | None = None, output_sheet: str | None = None,
+           read_at: float | None = None) -> str:
+    """
+    Queue a transaction for fetching. REQUESTS table rows pass their
+    row number and output tab; read_at is when the trigger was read
+    (time.monotonic()).
+
+    Returns "queued", "duplicate" (same request already in flight, or
+    finished after read_at - see is_in_flight) or "busy" (backpressure -
+    try again on a later poll).
+    """
+    logger = logging.getLogger("stages")
+    stages = state["resources"]["stages"]
+    key = request_key(symbol, from_date, to_date, request_row)
+
+    with stages["lock"]:
+        if _is_in_flight(stages, key, read_at):
+            return "duplicate"
+
+        if read_at is not None:
+            # Polls read later than read_at see the reset triggers
+            stages["finished"] = {k: at for k, at in stages["finished"].items() if at >= read_at}
+
+        if not stages["accepting"] or len(stages["in_flight"]) >= stages["max_in_flight"]:
+            return "busy"
+
+        transaction = state_mod.new_transaction(symbol, from_date, to_date, request_row, output_sheet)
+        transaction.update({
+            "id": stages["next_id"],
+            "key": key,
+            "submitted_at": time.perf_counter(),
+            "stage_ms": {},
+        })
+        txn_state = state_mod.transaction_state(state, transaction)
+        profiling.begin(txn_state)
+
+        try:
+            stages["queues"]["fetch"].put_nowait(txn_state)
+        except queue.Full:
+            profiling.end(txn_state, save=False)
+            return "busy"
+
+        stages["in_flight"][key] = txn_state
+        stages["next_id"] += 1
+        _record_depth(stages, "fetch")
+
+    source = f" [row {request_row}]" if request_row else ""
+    logger.info(f"Queued #{transaction['id']}: {symbol} ({from_date} → {to_date}){source}")
+    return "queued"
+
+
+def request_key(symbol: str, from_date: str, to_date: str, request_row: int | None = None) -> tuple:
+    return (symbol.upper(), from_date, to_date, request_row)
+
+
+def is_in_flight(state: dict, key: tuple, read_at: float | None = None) -> bool:
+    """
+    True while key's run is in flight - and, given the time a trigger was
+    read, if that run finished since: the read may predate the write that
+    reset the trigger, so its TRUE is stale.
+    """
+    stages = state["resources"].get("stages")
+    if not stages:
+        return False
+    with stages["lock"]:
+        return _is_in_flight(stages, key, read_at)
+
+
+def _is_in_flight(stages: dict, key: tuple, read_at: float | None) -> bool:
+    if key in stages["in_flight"]:
+        return True
+    return read_at is not None and stages["finished"].get(key, float("-inf")) >= read_at
+
+
+def stop(state: dict, timeout: float) -> bool:
+    """
+    Stop accepting work and drain queued transactions for up to timeout
+    seconds. Returns True if every stage finished.
+    """
+    logger = logging.getLogger("stages")
+    stages = state["resources"].get("stages")
+    if not stages:
+        return True
+
+    with stages["lock"]:
+        stages["accepting"] = False
+        pending = len(stages["in_flight"])
+
+    if pending:
+        logger.info(f"Draining {pending} in-flight transaction(s) (up to {timeout}s)...")
+
+    deadline = time.monotonic() + timeout
+    try:
+        for _ in range(stages["workers"]["fetch"]):
+            stages["queues"]["fetch"].put(_STOP, timeout=max(deadline - time.monotonic(), 0.01))
+    except queue.Full:
+        logger.warning("Fetch queue still full at shutdown")
+        return False
+
+    for thread in stages["threads"].values():
+        thread.join(max(deadline - time.monotonic(), 0))
+
+    drained = not any(t.is_alive() for t in stages["threads"].values())
+    if not drained:
+        logger.warning(f"{len(stages['in_flight'])} transaction(s) unfinished at shutdown timeout")
+
+    log_metrics(state)
+    return drained
+
+
+# ---------------------------------------------------------------------
+# Stage Workers
+# ---------------------------------------------------------------------
+def _stage_loop(state: dict, name: str, work, next_name: str | None) -> None:
+    """
+    Worker loop: take a transaction, run the stage, hand it on.
+    """
+    logger = logging.getLogger("stages")
+    stages = state["resources"]["stages"]
+    inbox = stages["queues"][name]
+    metrics = stages["metrics"][name]
+
+    while True:
+        txn_state = inbox.get()
+
+        if txn_state is _STOP:
+            with stages["lock"]:
+                stages["running"][name] -= 1
+                last = stages["running"][name] == 0
+            if last and next_name:
+                for _ in range(stages["workers"][next_name]):
+                    stages["queues"][next_name].put(_STOP)
+            return
+
+        started = time.perf_counter()
+        profiling.resume(txn_state)
+        try:
+            route = work(txn_state)
+        except Exception as e:
+            pipeline.record_error(txn_state, e)
+            with stages["lock"]:
+                metrics["failed"] += 1
+            # Errors still go through the writer so status/trigger are reset
+            route = "write" if name != "write" else None
+            if name == "write":
+                try:
+                    sheets_io.write_error(txn_state)
+                except Exception as write_err:
+                    logger.error(f"Could not write error status for {txn_state['transaction']['symbol']}: {write_err}")
+        finally:
+            profiling.pause(txn_state)
+
+        elapsed = time.perf_counter() - started
+        with stages["lock"]:
+            metrics["processed"] += 1
+            metrics["busy_seconds"] += elapsed
+        txn_state["transaction"]["stage_ms"][name] = round(elapsed * 1000)
+
+        # A failure handing the transaction on must not kill the worker
+        try:
+            if route is None:
+                _finish(state, txn_state)
+            else:
+                stages["queues"][route].put(txn_state)
+                _record_depth(stages, route)
+        except Exception as e:
+            logger.exception(f"{name} stage could not hand on #{txn_state['transaction']['id']}")
+            pipeline.record_error(txn_state, e)
+            with stages["lock"]:
+                metrics["failed"] += 1
+            _release(state, txn_state)
+
+
+def _fetch(txn_state: dict) -> str | None:
+    t = txn_state["transaction"]
+
+    # UNIVERSE / WATCHLIST:<name> fetches and scores the whole screen here;
+    # its table goes to the writer like any other payload
+    if screener.is_screen_request(t["symbol"]):
+        t["raw_data"] = screener.screen(txn_state)
+        return "write"
+
+    if pipeline.serve_cached(txn_state):
+        return "write"
+
+    # Claim the CSV before it exists so other runs' cleanup keeps it
+    t["csv_path"] = nse_client.output_path(txn_state["config"]["data"], t["symbol"], t["from_date"], t["to_date"])
+    txn_state["resources"]["active_csvs"].add(t["csv_path"])
+
+    state_mod.update_stage(txn_state, "FETCHING")
+    nse_client.fetch_csv(txn_state)
+    return "process"
+
+
+def _process(txn_state: dict) -> str:
+    state_mod.update_stage(txn_state, "PROCESSING")
+    processor.process_csv(txn_state)
+    pipeline.cache_result(txn_state)
+    return "write"
+
+
+def _write(txn_state: dict) -> None:
+    t = txn_state["transaction"]
+    if t["error"]:
+        sheets_io.write_error(txn_state)
+        return None
+
+    if screener.is_screen_request(t["symbol"]):
+        screener.write(txn_state, t["raw_data"])
+        return None
+
+    state_mod.update_stage(txn_state, "WRITING")
+    sheets_io.write_results(txn_state)
+    return None
+
+
+def _finish(state: dict, txn_state: dict) -> None:
+    logger = logging.getLogger("stages")
+    stages = state["resources"]["stages"]
+    t = txn_state["transaction"]
+
+    state["resources"]["active_csvs"].discard(t.get("csv_path"))
+
+    with stages["lock"]:
+        stages["in_flight"].pop(t["key"], None)
+        stages["finished"][t["key"]] = time.monotonic()
+        stages["completed"] += 1
+
+    pipeline.cleanup_files(txn_state)
+    profiling.end(txn_state)
+    metrics_mod.record_run(txn_state)
+
+    total_ms = (time.perf_counter() - t["submitted_at"]) * 1000
+    busy = " | ".join(f"{name} {ms}ms" for name, ms in t["stage_ms"].items())
+    outcome = "failed" if t["error"] else "done"
+    logger.info(f"#{t['id']} {t['symbol']} {outcome} in {total_ms:.0f}ms ({busy})")
+
+
+def _release(state: dict, txn_state: dict) -> None:
+    """
+    Drop a transaction that could not be finished or routed, so its slot
+    (and max_in_flight capacity) is freed instead of stalling the pipeline.
+    """
+    stages = state["resources"]["stages"]
+    t = txn_state["transaction"]
+
+    state["resources"]["active_csvs"].discard(t.get("csv_path"))
+
+    with stages["lock"]:
+        if stages["in_flight"].pop(t["key"], None) is not None:
+            stages["finished"][t["key"]] = time.monotonic()
+            stages["completed"] += 1
+
+
+# ---------------------------------------------------------------------
+# Metrics
+# ---------------------------------------------------------------------
+def _record_depth(stages: dict, name: str) -> None:
+    metrics = stages["metrics"][name]
+    metrics["max_depth"] = max(metrics["max_depth"], stages["queues"][name].qsize())
+
+
+def metrics(state: dict) -> dict:
+    """
+    Per-stage queue depth and throughput counters.
+    """
+    stages = state["resources"].get("stages")
+    if not stages:
+        return {}
+
+    with stages["lock"]:
+        snapshot = {
+            "in_flight": len(stages["in_flight"]),
+            "completed": stages["completed"],
+        }
+
+    for name in STAGES:
+        m = stages["metrics"][name]
+        snapshot[name] = {
+            "depth": stages["queues"][name].qsize(),
+            "max_depth": m["max_depth"],
+            "processed": m["processed"],
+            "failed": m["failed"],
+            "busy_seconds": round(m["busy_seconds"], 2),
+        }
+
+    return snapshot
+
+
+def log_metrics(state: dict) -> None:
+    m = metrics(state)
+    if not m:
+        return
+
+    per_stage = ", ".join(
+        f"{name} {m[name]['depth']}/{m[name]['max_depth']} ({m[name]['processed']} done, {m[name]['busy_seconds']}s busy)"
+        for name in STAGES
+    )
+    logging.getLogger("stages").info(
+        f"Stages: {m['in_flight']} in flight, {m['completed']} completed | depth/max: {per_stage}"
+    )
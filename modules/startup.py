@@ -0,0 +1,81 @@
+"""
+Startup timing - wall time per import and per init step for main.py.
+
+    report = startup.new_report()
+    with startup.step(report, "init state"):
+        ...
+    monitor = startup.load(report, "modules.monitor")
+    startup.log_report(report)
+
+Imports are timed in the order main.py asks for them, so a module's time
+covers only what was not already imported; heavy third-party packages
+(DEPENDENCIES) are loaded first so they get their own lines. For a full
+tree use `python -X importtime main.py`.
+"""
+
+import importlib
+import logging
+import sys
+import time
+from contextlib import contextmanager
+
+
+# Heavy third-party imports, in the order the service needs them
+DEPENDENCIES = ("requests", "pandas", "gspread", "google.oauth2.service_account")
+ASYNC_DEPENDENCIES = ("aiohttp",)
+
+
+def new_report() -> dict:
+    return {"started": time.perf_counter(), "entries": []}
+
+
+@contextmanager
+def step(report: dict, name: str):
+    """
+    Time an init step.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        report["entries"].append(("step", name, time.perf_counter() - started, 0))
+
+
+def load(report: dict, name: str, optional: bool = False):
+    """
+    Import (and time) a module. Optional dependencies return None when missing.
+    """
+    before = len(sys.modules)
+    started = time.perf_counter()
+    try:
+        module = importlib.import_module(name)
+    except ImportError:
+        if not optional:
+            raise
+        module = None
+
+    report["entries"].append(("import", name, time.perf_counter() - started, len(sys.modules) - before))
+    return module
+
+
+def load_all(report: dict, names: tuple, optional: bool = False) -> list:
+    return [load(report, name, optional) for name in names]
+
+
+def total_seconds(report: dict) -> float:
+    return time.perf_counter() - report["started"]
+
+
+def log_report(report: dict) -> None:
+    """
+    Log one line per import / step, plus the totals.
+    """
+    logger = logging.getLogger("startup")
+    entries = report["entries"]
+    imports = sum(seconds for kind, _, seconds, _ in entries if kind == "import")
+    steps = sum(seconds for kind, _, seconds, _ in entries if kind == "step")
+
+    logger.info(f"⏱️ Startup {total_seconds(report):.2f}s (imports {imports:.2f}s, init steps {steps:.2f}s)")
+    for kind, name, seconds, modules in entries:
+        extra = f" (+{modules} modules)" if kind == "import" else ""
+        logger.info(f"   {kind:<6} {name:<32} {seconds * 1000:8.1f} ms{extra}")
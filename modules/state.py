@@ -1,25 +1,30 @@
 """
-Universal state dictionary initialization and management.
+Universal state dictionary initialization and management, and the
+Transaction record held in state['transaction'].
 """
 
 import logging
+import threading
+import time
+import tracemalloc
 from modules.utils import load_config
 
 
-def init_state() -> dict:
+def init_state(config: dict | None = None) -> dict:
     """
     Initialize the universal state dictionary.
     
     Returns a fresh state dict with:
-    - config: Loaded from settings.json
+    - config: Loaded from settings.json (or the already-loaded config)
     - resources: Empty slots for runtime objects
     - transaction: Clean slate for each pipeline run
     """
     logger = logging.getLogger("state")
     
     # Load configuration
-    config = load_config()
-    logger.info("Configuration loaded successfully")
+    if config is None:
+        config = load_config()
+        logger.info("Configuration loaded successfully")
     
     # Build the universal state structure
     state = {
@@ -28,27 +33,22 @@ def init_state() -> dict:
         "resources": {
             "sheets_client": None,      # gspread client object
             "spreadsheet": None,         # active spreadsheet object
-            "http_session": None,        # reusable requests session (future)
-            "shutdown_flag": False       # set by signal handlers
+            "worksheets": {},            # cached worksheet handles by title
+            "sheets_api": None,          # quota limiter + counters (sheets_api.get_client)
+            "sheets_api_calls": 0,       # running count of Sheets API calls
+            "sheet_fingerprints": {},    # what each data tab currently holds (sheets_io)
+            "poll_stats": {"polls": 0, "api_calls": 0},
+            "stages": None,              # staged pipeline queues/workers (stages.start)
+            "active_csvs": set(),        # CSVs held by in-flight transactions
+            "result_cache": None,        # processed-result cache (result_cache.get_cache)
+            "catalog": None,             # data-folder index + LRU budget (catalog.get_catalog)
+            "http_session": None,        # pooled NSE session (nse_client.get_session)
+            "nse_rate_limiter": None,    # shared NSE request limiter
+            "shutdown_flag": False,      # set by signal handlers
+            "shutdown_event": threading.Event()  # wakes waits on shutdown
         },
         
-        "transaction": {
-            # User inputs
-            "symbol": None,
-            "from_date": None,
-            "to_date": None,
-            
-            # File paths
-            "csv_path": None,
-            
-            # Processed data
-            "raw_data": [],              # List of lists for bulk sheet update
-            "metrics": {},               # Summary stats (avg, max, min delivery %)
-            
-            # Status tracking
-            "error": None,
-            "stage": "IDLE"              # FETCHING -> PROCESSING -> WRITING -> IDLE
-        }
+        "transaction": new_transaction()
     }
     
     logger.info("Universal state initialized")
@@ -64,18 +64,53 @@ def reset_transaction(state: dict) -> None:
     """
     logger = logging.getLogger("state")
     
-    state["transaction"] = {
-        "symbol": None,
-        "from_date": None,
-        "to_date": None,
+    state["transaction"] = new_transaction()
+    
+    logger.debug("Transaction state reset")
+
+
+def new_transaction(symbol: str | None = None, from_date: str | None = None, to_date: str | None = None,
+                    request_row: int | None = None, output_sheet: str | None = None) -> dict:
+    """
+    A fresh transaction (same fields as state['transaction']).
+
+    Processed rows are held columnar in 'frame' (the parsed DataFrame);
+    the Sheets payload is built from it by the writer (sheets_io.sheet_rows)
+    and not kept. A ready-made payload that has no frame (a screen table)
+    goes in 'raw_data'. The staged/async cores and profiling add their own
+    keys (id, key, submitted_at, stage_ms, profile).
+    """
+    return {
+        "symbol": symbol,
+        "from_date": from_date,
+        "to_date": to_date,
+        "request_row": request_row,      # REQUESTS sheet row (None for CUSTOM_VIEW)
+        "output_sheet": output_sheet,    # tab for the rows (None -> RAW_DATA)
         "csv_path": None,
-        "raw_data": [],
-        "metrics": {},
+        "fetch_timing": {},              # NSE call totals: requests, ttfb/transfer ms, bytes
+        "frame": None,                   # processed rows (pandas DataFrame)
+        "metrics": {},                   # summary stats (avg, max, min delivery %)
         "error": None,
-        "stage": "IDLE"
+        "stage": "IDLE",                 # FETCHING -> PROCESSING -> WRITING -> IDLE
+        "stage_timings": {},             # stage -> seconds (update_stage)
+        "stage_peak_bytes": {},          # stage -> tracemalloc peak (only while tracing)
+        "sheets_calls": 0,               # Sheets API calls made by this run
     }
+
+
+def transaction_state(state: dict, transaction: dict) -> dict:
+    """
+    State view for one in-flight transaction.
     
-    logger.debug("Transaction state reset")
+    Shares config and resources with the main state but has its own
+    'transaction', so stage functions written against
+    state['transaction'] work unchanged while several runs overlap.
+    """
+    return {
+        "config": state["config"],
+        "resources": state["resources"],
+        "transaction": transaction
+    }
 
 
 def update_stage(state: dict, stage: str) -> None:
@@ -83,9 +118,32 @@ def update_stage(state: dict, stage: str) -> None:
     Update the current pipeline stage for logging/monitoring.
     
     Valid stages: IDLE, FETCHING, PROCESSING, WRITING, ERROR
+    
+    Time spent in the stage being left is added to
+    transaction['stage_timings'] (see metrics). While tracemalloc is
+    tracing (profiling, benchmarks) its peak is kept in
+    transaction['stage_peak_bytes'] as well.
     """
-    state["transaction"]["stage"] = stage
-    logging.getLogger("state").debug(f"Stage: {stage}")
+    t = state["transaction"]
+    now = time.perf_counter()
+    previous, started = t.get("stage"), t.get("stage_started")
+    tracing = tracemalloc.is_tracing()
+    
+    if started is not None and previous not in (None, "IDLE", "ERROR"):
+        timings = t.setdefault("stage_timings", {})
+        timings[previous] = timings.get(previous, 0.0) + now - started
+        if tracing:
+            peaks = t.setdefault("stage_peak_bytes", {})
+            peaks[previous] = max(peaks.get(previous, 0), tracemalloc.get_traced_memory()[1])
+        logging.getLogger("state").debug(f"Stage: {stage} ({previous} took {now - started:.3f}s)")
+    else:
+        logging.getLogger("state").debug(f"Stage: {stage}")
+    
+    if tracing:
+        tracemalloc.reset_peak()
+    
+    t["stage"] = stage
+    t["stage_started"] = now
 
 
 def set_error(state: dict, error: str) -> None:
@@ -93,5 +151,5 @@ def set_error(state: dict, error: str) -> None:
     Record an error in the transaction state.
     """
     state["transaction"]["error"] = error
-    state["transaction"]["stage"] = "ERROR"
-    logging.getLogger("state").error(f"Transaction error: {error}")
\ No newline at end of file
+    update_stage(state, "ERROR")
+    logging.getLogger("state").error(f"Transaction error: {error}")
@@ -0,0 +1,175 @@
+"""
+Micro-benchmark: row-loop delivery stats vs the vectorized analytics engine.
+Generates a synthetic priceVolumeDeliverable CSV (EQ + BL series, thousands
+separators, "-" placeholders) and times both approaches - the original three
+stats and every metric - checking that they agree, plus untyped vs
+schema-typed parsing (time and in-memory size).
+
+Usage: python test/analytics_benchmark.py [years] [repeats]
+"""
+
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from modules import analytics, schema
+
+
+def make_csv(path: Path, years: int = 10, seed: int = 7) -> int:
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2015-01-01", periods=250 * years)
+    n = len(dates)
+
+    traded = rng.integers(1_000_000, 20_000_000, n)
+    pct = rng.uniform(20, 80, n).round(2)
+    price = rng.uniform(800, 2500, n).round(2)
+
+    eq = pd.DataFrame({
+        "Symbol  ": "SYNTH",
+        "Series  ": "EQ",
+        "Date  ": dates.strftime("%d-%b-%Y"),
+        "Average Price ": [f"{p:,.2f}" for p in price],
+        "Close Price  ": [f"{p:,.2f}" for p in price],
+        "Total Traded Quantity  ": [f"{q:,}" for q in traded],
+        "Deliverable Qty  ": [f"{int(q * d / 100):,}" for q, d in zip(traded, pct)],
+        "% Dly Qt to Traded Qty  ": pct.astype(str),
+    })
+    # Block-deal rows carry "-" for delivery fields
+    bl = eq.iloc[::5].assign(**{"Series  ": "BL", "Deliverable Qty  ": "-", "% Dly Qt to Traded Qty  ": "-"})
+
+    df = pd.concat([eq, bl]).sort_index(kind="stable")
+    df.to_csv(path, index=False)
+    return len(df)
+
+
+def loop_stats(df: pd.DataFrame) -> dict:
+    """The original per-row implementation from processor.process_csv."""
+    header = df.columns.tolist()
+    rows = df.values.tolist()
+
+    delivery_col = None
+    for idx, col in enumerate(header):
+        if "%" in col.lower() and ("dly" in col.lower() or "delivery" in col.lower()):
+            delivery_col = idx
+            break
+
+    values = []
+    for row in rows:
+        try:
+            values.append(float(row[delivery_col]))
+        except (ValueError, TypeError, IndexError):
+            continue
+
+    return {
+        "avg_delivery_pct": round(sum(values) / len(values), 2),
+        "max_delivery_pct": round(max(values), 2),
+        "min_delivery_pct": round(min(values), 2),
+    }
+
+
+def loop_metrics(df: pd.DataFrame, window: int = 20, threshold: float = 2.0) -> dict:
+    """Every compute_metrics value, one row at a time."""
+    def number(value):
+        try:
+            return float(str(value).replace(",", ""))
+        except ValueError:
+            return float("nan")
+
+    metrics = loop_stats(df)
+
+    days = sorted(
+        (datetime.strptime(row["Date"].strip(), "%d-%b-%Y"), number(row[analytics.DELIVERY_PCT]),
+         number(row[analytics.DELIVERABLE_QTY]), number(row[analytics.TRADED_QTY]),
+         number(row[analytics.AVERAGE_PRICE]))
+        for row in df.to_dict("records") if row["Series"].strip() == "EQ"
+    )
+    min_periods = max(2, window // 2)
+
+    def known(values):
+        return [v for v in values if v == v]
+
+    def zscore(values, i):
+        prior = known(values[max(0, i - window):i])
+        if len(prior) < min_periods or statistics.stdev(prior) == 0:
+            return float("nan")
+        return (values[i] - statistics.mean(prior)) / statistics.stdev(prior)
+
+    pct = [d[1] for d in days]
+    qty = [d[2] for d in days]
+    last = len(days) - 1
+
+    spikes = [d[0] for i, d in enumerate(days) if zscore(pct, i) > threshold]
+    delivered = sum(d[2] * d[4] for d in days if d[2] == d[2])
+    traded = sum(d[3] * d[4] for d in days)
+
+    metrics.update({
+        "rolling_delivery_pct": round(statistics.mean(known(pct[-window:])), 2),
+        "delivery_qty_zscore": round(zscore(qty, last), 2),
+        "vwap_delivery_pct": round(delivered / traded * 100, 2),
+        "spike_days": len(spikes),
+        "last_spike_date": spikes[-1].strftime("%d-%b-%Y") if spikes else "",
+    })
+    return metrics
+
+
+def vector_stats(df: pd.DataFrame) -> dict:
+    """Same three stats through the vectorized column path."""
+    pct = analytics.clean_numeric(df[analytics.DELIVERY_PCT])
+    return {
+        "avg_delivery_pct": round(float(pct.mean()), 2),
+        "max_delivery_pct": round(float(pct.max()), 2),
+        "min_delivery_pct": round(float(pct.min()), 2),
+    }
+
+
+def best_of(fn, arg, repeats: int) -> tuple[float, dict]:
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn(arg)
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+if __name__ == "__main__":
+    years = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = Path(tmp) / "synthetic.csv"
+        rows = make_csv(csv_path, years)
+
+        # Parse once - the metric timings compare computation, not CSV I/O
+        df = analytics.normalize_columns(pd.read_csv(csv_path))
+
+        loop_s, loop_result = best_of(loop_stats, df, repeats)
+        vec_s, vec_result = best_of(vector_stats, df, repeats)
+        loop_full_s, loop_full = best_of(loop_metrics, df, repeats)
+        full_s, full_result = best_of(lambda d: analytics.compute_metrics(d), df, repeats)
+
+        untyped_s, untyped = best_of(pd.read_csv, csv_path, repeats)
+        typed_s, typed = best_of(schema.read_nse_csv, csv_path, repeats)
+        typed_full_s, typed_result = best_of(lambda d: analytics.compute_metrics(d), typed, repeats)
+
+    assert loop_result == vec_result, (loop_result, vec_result)
+    expected = {"total_rows": rows, **loop_full}
+    assert full_result == expected, (full_result, expected)
+    assert typed_result == expected, (typed_result, expected)
+
+    print(f"Synthetic CSV: {rows:,} rows ({years} years), best of {repeats}")
+    print(f"  row loop, 3 stats:          {loop_s * 1000:8.2f} ms")
+    print(f"  vectorized, 3 stats:        {vec_s * 1000:8.2f} ms  ({loop_s / vec_s:.1f}x the row loop)")
+    print(f"  row loop, all metrics:      {loop_full_s * 1000:8.2f} ms")
+    print(f"  vectorized, all metrics:    {full_s * 1000:8.2f} ms  ({loop_full_s / full_s:.1f}x the row loop)")
+    print(f"  untyped read_csv:           {untyped_s * 1000:8.2f} ms  {schema.memory_bytes(untyped) / 1024:8.0f} KB")
+    print(f"  schema read_nse_csv:        {typed_s * 1000:8.2f} ms  {schema.memory_bytes(typed) / 1024:8.0f} KB")
+    print(f"  all metrics, typed frame:   {typed_full_s * 1000:8.2f} ms  (dates/numbers already parsed)")
+    print(f"  metrics: {full_result}")
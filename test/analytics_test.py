@@ -0,0 +1,94 @@
+"""
+Offline delivery analytics test.
+A six-day EQ history (plus a BL block-deal row, out of date order) gives
+hand-computed rolling delivery %, quantity z-score, VWAP delivery %, spike
+days and last spike date, from both the untyped and the schema-typed read.
+"""
+
+import pandas as pd
+import pytest
+
+from modules import analytics, schema
+
+
+HEADER = ('"Symbol  ","Series  ","Date  ","Average Price  ","Total Traded Quantity  ",'
+          '"Deliverable Qty  ","% Dly Qt to Traded Qty  "\n')
+
+# date, series, price, traded, deliverable, % delivery
+DAYS = [
+    ("03-Jan-2024", "EQ", "10.00", "1,000", "420", "42.00"),
+    ("01-Jan-2024", "EQ", "10.00", "1,000", "400", "40.00"),
+    ("02-Jan-2024", "EQ", "10.00", "1,000", "440", "44.00"),
+    ("04-Jan-2024", "EQ", "10.00", "1,000", "450", "45.00"),
+    ("05-Jan-2024", "EQ", "20.00", "1,000", "900", "90.00"),
+    ("05-Jan-2024", "BL", "20.00", "5,000", "-", "-"),
+    ("08-Jan-2024", "EQ", "10.00", "1,000", "500", "50.00"),
+]
+
+CONFIG = {"analytics": {"rolling_days": 4, "spike_zscore": 2.0, "series": ["EQ"]}}
+
+# In date order the EQ delivery % runs 40, 44, 42, 45, 90, 50 (window 4,
+# at least 2 prior days for a z-score):
+#   rolling % on 08-Jan: mean(42, 45, 90, 50)                      = 56.75
+#   z on 05-Jan vs (40, 44, 42, 45): (90 - 42.75) / 2.2174        = 21.31 -> spike
+#   z on 08-Jan vs (44, 42, 45, 90): (50 - 55.25) / 23.2002       = -0.23
+#   z on 03-Jan vs (40, 44) is 0, on 04-Jan vs (40, 44, 42) is 1.5
+#   qty z on 08-Jan: deliverable qty is 10x the %, so the same     = -0.23
+#   VWAP: sum(dlv * price) / sum(traded * price) = 40100 / 70000   = 57.29
+#   avg/max/min over every row with a number (BL "-" skipped): 311 / 6 = 51.83, 90, 40
+EXPECTED = {
+    "total_rows": 7,
+    "avg_delivery_pct": 51.83,
+    "max_delivery_pct": 90.0,
+    "min_delivery_pct": 40.0,
+    "rolling_delivery_pct": 56.75,
+    "delivery_qty_zscore": -0.23,
+    "vwap_delivery_pct": 57.29,
+    "spike_days": 1,
+    "last_spike_date": "05-Jan-2024",
+}
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "INFY.csv"
+    path.write_text(HEADER + "".join(
+        f'"INFY","{series}","{day}","{price}","{traded}","{dlv}","{pct}"\n'
+        for day, series, price, traded, dlv, pct in DAYS
+    ), encoding="utf-8")
+    return path
+
+
+def test_metrics_hand_computed(csv_path):
+    assert analytics.compute_metrics(pd.read_csv(csv_path), CONFIG) == EXPECTED
+
+
+def test_metrics_on_typed_frame(csv_path):
+    assert analytics.compute_metrics(schema.read_nse_csv(csv_path), CONFIG) == EXPECTED
+
+
+def test_time_series(csv_path):
+    ts = analytics.time_series(pd.read_csv(csv_path), window=4, series_filter=["EQ"])
+
+    assert ts["date"].dt.strftime("%d-%b-%Y").tolist() == [
+        "01-Jan-2024", "02-Jan-2024", "03-Jan-2024", "04-Jan-2024", "05-Jan-2024", "08-Jan-2024",
+    ]
+    assert ts["pct"].tolist() == [40, 44, 42, 45, 90, 50]
+    assert ts["rolling_pct"].round(4).tolist()[1:] == [42, 42, 42.75, 55.25, 56.75]
+    # No prior window for the first day, a single prior day for the second
+    assert ts["pct_zscore"].isna().tolist()[:2] == [True, True]
+    assert ts["pct_zscore"].round(4).tolist()[2:] == [0.0, 1.5, 21.3092, -0.2263]
+    assert analytics.vwap_delivery_pct(ts) == pytest.approx(40100 / 70000 * 100)
+
+
+def test_spike_threshold_and_missing_columns(csv_path):
+    metrics = analytics.compute_metrics(
+        pd.read_csv(csv_path), {"analytics": {**CONFIG["analytics"], "spike_zscore": 25}},
+    )
+    assert metrics["spike_days"] == 0 and metrics["last_spike_date"] == ""
+
+    # No delivery column: every metric stays at its zero value
+    no_delivery = pd.read_csv(csv_path).iloc[:, :5]
+    assert analytics.compute_metrics(no_delivery, CONFIG) == {
+        **{key: 0 for key in EXPECTED}, "total_rows": 7, "last_spike_date": "",
+    }
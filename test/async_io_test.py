@@ -0,0 +1,142 @@
+"""
+Offline async I/O core test.
+Many requests and a watchlist screen run on one event loop against a local
+NSE stand-in (slow responses) and an in-memory spreadsheet; NSE waits
+overlap instead of queueing behind a few threads. Screens cannot starve
+the blocking executor, and waits end the moment shutdown is requested.
+"""
+
+import asyncio
+import threading
+import time
+
+from modules import async_io, lifecycle, monitor
+from support import FETCH_DELAY
+
+
+SYMBOLS = [f"SYM{i:02d}" for i in range(24)]
+
+
+def table() -> list[list]:
+    return [[s, "01-01-2024", "31-01-2024", "TRUE"] for s in SYMBOLS]
+
+
+async def run_requests(state: dict) -> float:
+    async_io.start(state)
+    try:
+        requests = await async_io.blocking(state, monitor.check_trigger, state)
+        runnable = await async_io.blocking(state, monitor.mark_requests, state, requests)
+
+        started = time.perf_counter()
+        counts = async_io.submit(state, runnable)
+        assert counts == {"queued": len(SYMBOLS), "duplicate": 0, "busy": 0}, counts
+
+        # Next poll sees the same triggers while they run
+        assert async_io.submit(state, runnable)["duplicate"] == len(SYMBOLS)
+
+        assert await async_io.drain(state, timeout=20)
+        return time.perf_counter() - started
+    finally:
+        await async_io.close(state)
+
+
+def test_concurrent_requests(staged_state, spreadsheet):
+    state = staged_state
+    spreadsheet.table = table()
+    state["config"]["pipeline"]["max_in_flight"] = len(SYMBOLS)
+
+    elapsed = asyncio.run(run_requests(state))
+
+    stats = state["resources"]["async_io"]["stats"]
+    assert stats["completed"] == len(SYMBOLS) and stats["failed"] == 0, stats
+    assert stats["peak_fetches"] > 8, stats
+
+    for i, symbol in enumerate(SYMBOLS):
+        data = spreadsheet.values(f"{symbol}_01-01-2024_31-01-2024")["A1"]
+        assert data[1][0] == symbol and len(data) == 24, (symbol, len(data))
+        status = spreadsheet.values("REQUESTS")[f"D{i + 2}:G{i + 2}"][0][1]
+        assert status == "DONE (23 rows)", status
+
+    # 24 slow fetches overlap: far less than running them back to back
+    assert elapsed < len(SYMBOLS) * FETCH_DELAY / 3, elapsed
+
+
+async def run_screen(state: dict) -> dict:
+    async_io.start(state)
+    try:
+        return await async_io.fetch_all(state, SYMBOLS + ["BAD/"], "01-01-2024", "31-01-2024")
+    finally:
+        await async_io.close(state)
+
+
+def test_screen_fetch_and_shutdown(staged_state):
+    state = staged_state
+    state["resources"]["shutdown_flag"] = False
+    state["config"]["nse"]["retry_backoff_seconds"] = 0.01
+
+    paths = asyncio.run(run_screen(state))
+    assert sorted(paths) == SYMBOLS, sorted(paths)
+    assert all(p.exists() for p in paths.values())
+
+    # Idle poll loop exits promptly once shutdown is requested
+    async def stop_soon():
+        await asyncio.sleep(0.3)
+        lifecycle.initiate_shutdown(state, "test")
+
+    async def main():
+        started = time.perf_counter()
+        await asyncio.gather(async_io.poll_loop(state), stop_soon())
+        return time.perf_counter() - started
+
+    assert asyncio.run(main()) < 2
+    assert state["resources"]["poll_stats"]["polls"] >= 1
+
+
+
+async def run_screens(state: dict, requests: list[dict]) -> bool:
+    async_io.start(state)
+    try:
+        assert async_io.submit(state, requests)["queued"] == len(requests)
+        return await async_io.drain(state, timeout=20)
+    finally:
+        await async_io.close(state)
+
+
+def test_screens_leave_blocking_workers_free(staged_state, spreadsheet):
+    state = staged_state
+    config = state["config"]
+    # More screens in flight than blocking threads: each screen waits on
+    # fetches that need one, so screens must not sit on those threads
+    config["async_io"].update({"blocking_workers": 2, "screen_workers": 2})
+    config["screener"].update({"watchlists": {f"W{i}": SYMBOLS[i::3] for i in range(3)}, "process_workers": 1})
+    requests = [
+        {"symbol": f"WATCHLIST:W{i}", "from_date": "01-01-2024", "to_date": "31-01-2024", "row": None,
+         "output_sheet": None}
+        for i in range(3)
+    ]
+
+    assert asyncio.run(run_screens(state, requests))
+    stats = state["resources"]["async_io"]["stats"]
+    assert stats["completed"] == 3 and stats["failed"] == 0, stats
+    assert len(spreadsheet.values("SCREENER")) == 1
+
+
+def test_wait_wakes_on_shutdown(staged_state):
+    state = staged_state
+    state["resources"]["shutdown_flag"] = False
+
+    async def main():
+        async_io.start(state)
+        try:
+            assert not await async_io.wait(state, 0.05)
+
+            # Requested from another thread, as the signal handler's caller would be
+            threading.Timer(0.1, lifecycle.initiate_shutdown, (state, "test")).start()
+            started = time.perf_counter()
+            assert await async_io.wait(state, 30)
+            return time.perf_counter() - started
+        finally:
+            await async_io.close(state)
+
+    assert asyncio.run(main()) < 0.5
+    assert state["resources"]["shutdown_callbacks"] == []
@@ -0,0 +1,151 @@
+"""
+Offline headless batch test.
+A local HTTP server stands in for NSE (one symbol has no data); symbols
+are fetched and processed straight to Parquet/CSV with a summary, a
+second run resumes where the first stopped, processing.chunk_rows writes
+the same files a chunk at a time, and batch.py never imports gspread or
+needs Sheets credentials.
+"""
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from modules import batch, lifecycle, nse_client, state as state_mod
+from support import ROOT, FakeNSE, offline_config
+
+
+class BatchNSE(FakeNSE):
+    def do_GET(self):
+        if "symbol=NODATA" in self.path:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        super().do_GET()
+
+
+def make_config(base: str, tmp: Path) -> dict:
+    config = offline_config(tmp / "data", base)
+    config["batch"].update({"output_folder": str(tmp / "out"), "workers": 4})
+    config["logging"].update({"file": str(tmp / "app.log"), "console": False})
+    # No credentials file - batch mode must not need one
+    config["google_sheets"]["credentials_file"] = str(tmp / "missing.json")
+    return config
+
+
+def test_batch_and_resume(start_nse, tmp_path):
+    base = start_nse(BatchNSE)
+    config = make_config(base, tmp_path)
+
+    symbols_file = tmp_path / "symbols.txt"
+    symbols_file.write_text("# backfill\nSymbol\ninfy\nTCS\nNODATA\nINFY\n", encoding="utf-8")
+    symbols = batch.resolve_symbols(config, str(symbols_file))
+    assert symbols == ["INFY", "TCS", "NODATA"], symbols
+    assert batch.resolve_symbols(config, "WATCHLIST:nifty_bank")[0] == "HDFCBANK"
+
+    state = state_mod.init_state(config)
+    try:
+        # Interrupted before anything ran - all pending, progress kept
+        run = batch.new_run(config, symbols, "01-01-2024", "31-01-2024")
+        lifecycle.initiate_shutdown(state, "test")
+        report = batch.run_batch(state, run)
+        assert report["interrupted"] and report["remaining"] == 3, report
+
+        state["resources"]["shutdown_flag"] = False
+        run = batch.new_run(config, symbols[:2], "01-01-2024", "31-01-2024")
+        report = batch.run_batch(state, run)
+        assert (report["ok"], report["rows"], report["interrupted"]) == (2, 46, False), report
+
+        out = Path(report["out"])
+        frame = pd.read_parquet(out / "INFY.parquet")
+        assert len(frame) == 23 and str(frame["Symbol"].iloc[0]) == "INFY"
+
+        # Same range and folder: INFY/TCS are skipped, only NODATA runs
+        run = batch.new_run(config, symbols, "01-01-2024", "31-01-2024")
+        report = batch.run_batch(state, run)
+        assert (report["resumed"], report["processed"], report["no_data"]) == (2, 1, 1), report
+        assert report["remaining"] == 0
+
+        summary = pd.read_csv(out / "summary.csv")
+        assert summary["symbol"].tolist() == symbols
+        assert summary["status"].tolist() == ["ok", "ok", "no_data"]
+        assert summary.loc[0, "avg_delivery_pct"] == 45.0
+
+        # The folder belongs to one range / format
+        with pytest.raises(batch.BatchError):
+            batch.new_run(config, symbols, "01-01-2024", "31-01-2024", fmt="csv")
+
+    finally:
+        nse_client.close_session(state)
+
+
+def test_chunked_output(start_nse, tmp_path):
+    base = start_nse(BatchNSE)
+    config = make_config(base, tmp_path)
+    state = state_mod.init_state(config)
+    symbols = ["INFY", "TCS"]
+
+    try:
+        for fmt in batch.FORMATS:
+            config["processing"]["chunk_rows"] = 0
+            whole = batch.run_batch(state, batch.new_run(config, symbols, "01-01-2024", "31-03-2024",
+                                                         out=tmp_path / fmt / "whole", fmt=fmt))
+            config["processing"]["chunk_rows"] = 7
+            chunked = batch.run_batch(state, batch.new_run(config, symbols, "01-01-2024", "31-03-2024",
+                                                           out=tmp_path / fmt / "chunked", fmt=fmt))
+            assert (chunked["ok"], chunked["rows"]) == (2, whole["rows"]), chunked
+
+            read = pd.read_parquet if fmt == "parquet" else pd.read_csv
+            for symbol in symbols:
+                pd.testing.assert_frame_equal(
+                    read(Path(chunked["out"]) / f"{symbol}.{fmt}"),
+                    read(Path(whole["out"]) / f"{symbol}.{fmt}"),
+                )
+
+            # Running aggregates match the whole-frame metrics
+            summaries = [pd.read_csv(Path(r["out"]) / "summary.csv") for r in (whole, chunked)]
+            for column in ("rows", "avg_delivery_pct", "max_delivery_pct", "min_delivery_pct"):
+                assert summaries[0][column].tolist() == summaries[1][column].tolist(), column
+            assert not list(Path(chunked["out"]).glob("*.tmp"))
+
+        # Written chunk by chunk, not as one table
+        assert pq.ParquetFile(tmp_path / "parquet" / "chunked" / "INFY.parquet").num_row_groups > 1
+
+    finally:
+        nse_client.close_session(state)
+
+
+def test_cli_headless(start_nse, tmp_path):
+    base = start_nse(BatchNSE)
+    config_path = tmp_path / "settings.json"
+    config_path.write_text(json.dumps(make_config(base, tmp_path)), encoding="utf-8")
+
+    result = subprocess.run(
+        [sys.executable, "-c",
+         "import sys, batch\n"
+         f"code = batch.main(['SBIN,ITC', '--from', '01-01-2024', '--to', '31-01-2024', '--format', 'csv',"
+         f" '--config', {str(config_path)!r}, '--out', {str(tmp_path / 'cli')!r},"
+         f" '--report-json', {str(tmp_path / 'report.json')!r}])\n"
+         "print(code, 'gspread' in sys.modules)"],
+        cwd=ROOT, capture_output=True, text=True, timeout=120,
+    )
+
+    assert result.stdout.strip() == "0 False", result.stdout + result.stderr
+    report = json.loads((tmp_path / "report.json").read_text(encoding="utf-8"))
+    assert report["ok"] == 2 and report["symbols_per_second"] > 0, report
+
+    frame = pd.read_csv(tmp_path / "cli" / "SBIN.csv")
+    assert frame.loc[0, "Date"] == "01-Jan-2024" and len(frame) == 23
+
+    bad = subprocess.run(
+        [sys.executable, "batch.py", "INFY", "--from", "31-01-2024", "--to", "01-01-2024",
+         "--config", str(config_path)],
+        cwd=ROOT, capture_output=True, text=True, timeout=60,
+    )
+    assert bad.returncode == 2 and "after --to" in bad.stderr, bad.stderr
@@ -0,0 +1,91 @@
+"""
+Offline bhavcopy ingestion test.
+Serves test/fixtures over a local HTTP server (no NSE access needed),
+ingests 01-03 Jan 2025 into a temporary history store and checks the rows.
+A day ingested as "today" is covered once its file is published.
+"""
+
+import functools
+import http.server
+from datetime import date
+
+import pytest
+
+from modules import bhavcopy, history_store
+from support import ROOT, load_settings
+
+
+FIXTURES = ROOT / "test" / "fixtures"
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class Today(date):
+    """date whose today() is a fixed trading day."""
+
+    fixed = None
+
+    @classmethod
+    def today(cls):
+        return cls.fixed
+
+
+@pytest.fixture
+def fixture_state(start_nse, tmp_path) -> dict:
+    base = start_nse(functools.partial(QuietHandler, directory=str(FIXTURES)))
+
+    config = load_settings()
+    config["nse"]["bhavcopy_url"] = f"{base}/sec_bhavdata_full_{{date}}.csv"
+    config["data"]["store"] = {"enabled": True, "folder": str(tmp_path)}
+    return {"config": config, "resources": {}}
+
+
+def test_ingest_offline(fixture_state):
+    state = fixture_state
+    config = state["config"]
+
+    # 01-Jan has no fixture -> served as 404 -> recorded as holiday
+    summary = bhavcopy.ingest_range(state, date(2025, 1, 1), date(2025, 1, 3))
+    assert summary["days"] == 2, summary
+    assert summary["holidays"] == 1, summary
+
+    rows = history_store.load_range(config, "RELIANCE", date(2025, 1, 1), date(2025, 1, 3))
+    assert len(rows) == 3, rows
+    eq = rows[rows["Series"] == "EQ"]
+    assert eq["% Dly Qt to Traded Qty"].tolist() == [49.23, 46.25]
+    assert eq["Turnover ₹"].iloc[0] == 14900012000.0
+    assert eq["Deliverable Qty"].dtype == "Int64"
+
+    # Block deal "-" placeholders are missing values, not text
+    bl = rows[rows["Series"] == "BL"]
+    assert bl["Deliverable Qty"].isna().all()
+
+    # Whole range is covered now - fetch_csv would not hit the network
+    assert history_store.missing_ranges(config, "INFY", date(2025, 1, 1), date(2025, 1, 3)) == []
+
+    # Re-running skips every day already in the manifest
+    again = bhavcopy.ingest_range(state, date(2025, 1, 1), date(2025, 1, 3))
+    assert again["days"] == 0 and again["skipped"] == 3, again
+
+
+def test_today_covered(fixture_state, monkeypatch):
+    state = fixture_state
+    config = state["config"]
+    for module in (bhavcopy, history_store):
+        monkeypatch.setattr(module, "date", Today)
+
+    # Today's file is out (03-Jan fixture) - no per-symbol request needed
+    Today.fixed = Today(2025, 1, 3)
+    bhavcopy.ingest_range(state, date(2025, 1, 2), date(2025, 1, 3))
+    assert history_store.missing_ranges(config, "INFY", date(2025, 1, 2), date(2025, 1, 3)) == []
+
+    # Not published yet (no 06-Jan fixture) - today stays open
+    Today.fixed = Today(2025, 1, 6)
+    summary = bhavcopy.ingest_range(state, date(2025, 1, 3), date(2025, 1, 6))
+    assert summary["holidays"] == 1, summary
+    gaps = history_store.missing_ranges(config, "INFY", date(2025, 1, 2), date(2025, 1, 6))
+    assert gaps == [(date(2025, 1, 4), date(2025, 1, 6))], gaps
+    assert "2025-01-06" not in bhavcopy._load_manifest(config)
@@ -0,0 +1,122 @@
+"""
+Offline data catalog test.
+Historical downloads are served again without a second NSE call, live
+ranges expire, files are evicted least recently used first under a tiny
+disk budget (never while a transaction holds them), and the manifest is
+reconciled with the folder on reload.
+"""
+
+import json
+import os
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from modules import catalog, nse_client, screener
+from support import FakeNSE, offline_config
+
+
+class CountingNSE(FakeNSE):
+    calls = 0
+
+    def do_GET(self):
+        if "symbol=" in self.path:
+            CountingNSE.calls += 1
+        super().do_GET()
+
+
+def make_config(folder: Path, base: str | None = None, **catalog_cfg) -> dict:
+    config = offline_config(folder, base)
+    config["data"]["catalog"].update({"enabled": True, **catalog_cfg})
+    return config
+
+
+def make_state(config: dict) -> dict:
+    return {"config": config, "resources": {"active_csvs": set()}}
+
+
+def write_file(folder: Path, name: str, size: int) -> Path:
+    path = folder / name
+    path.write_bytes(b"x" * size)
+    return path
+
+
+def test_reuses_historical_download(start_nse, tmp_path):
+    base = start_nse(CountingNSE)
+    state = make_state(make_config(tmp_path, base, ttl_live_seconds=0))
+    recent, today = (f"{d:%d-%m-%Y}" for d in (date.today() - timedelta(days=10), date.today()))
+
+    try:
+        CountingNSE.calls = 0
+        for _ in range(3):
+            path = nse_client.fetch_csv(screener.symbol_state(state, "INFY", "01-01-2024", "31-01-2024"))
+            assert path.exists()
+        assert CountingNSE.calls == 1, CountingNSE.calls
+
+        # A range including today is live - expired at once with a zero TTL
+        CountingNSE.calls = 0
+        for _ in range(2):
+            nse_client.fetch_csv(screener.symbol_state(state, "TCS", recent, today))
+        assert CountingNSE.calls == 2, CountingNSE.calls
+
+        s = catalog.stats(state)
+        assert (s["hits"], s["expired"], s["added"]) == (2, 1, 3), s
+
+    finally:
+        nse_client.close_session(state)
+
+
+def test_lru_eviction(tmp_path):
+    state = make_state(make_config(tmp_path, disk_max_mb=3000 / 1024 / 1024))
+
+    a, b, c, d = (write_file(tmp_path, f"{name}.csv", 1000) for name in "ABCD")
+    for path in (a, b, c):
+        catalog.add(state, catalog.CSV, path)
+
+    # A is used again and C is held by a transaction: B is the one to go
+    catalog.touch(state, catalog.CSV, a)
+    state["resources"]["active_csvs"].add(c)
+    catalog.add(state, catalog.CSV, d)
+
+    assert [p.exists() for p in (a, b, c, d)] == [True, False, True, True]
+    assert catalog.stats(state)["bytes"] == {"csv": 3000}
+
+    # Held files survive even when nothing else can go
+    e = write_file(tmp_path, "E.csv", 1000)
+    state["resources"]["active_csvs"].update({a, d, e})
+    catalog.add(state, catalog.CSV, e)
+    assert all(p.exists() for p in (a, c, d, e))
+
+    state["resources"]["active_csvs"].clear()
+    assert catalog.evict(state) == 1
+    assert not c.exists()
+
+
+def test_manifest_reload(tmp_path):
+    config = make_config(tmp_path, flush_seconds=3600)
+    state = make_state(config)
+
+    kept = write_file(tmp_path, "INFY_01012024_31012024.csv", 500)
+    gone = write_file(tmp_path, "TCS_01012024_31012024.csv", 500)
+    catalog.add(state, catalog.CSV, kept)
+    catalog.add(state, catalog.CSV, gone)
+    catalog.flush(state)
+
+    manifest = json.loads((tmp_path / "catalog.json").read_text(encoding="utf-8"))
+    assert set(manifest["entries"]) == {"csv/INFY_01012024_31012024.csv", "csv/TCS_01012024_31012024.csv"}
+
+    # Changes made behind the catalog's back are reconciled on the next start
+    gone.unlink()
+    stray = write_file(tmp_path, "SBIN_01012024_31012024.CSV", 700)
+    os.utime(stray, (time.time() - 60, time.time() - 60))
+    write_file(tmp_path, "nse_equity_list.CSV", 900)
+
+    state = make_state(config)
+    s = catalog.stats(state)
+    assert s["files"] == 2 and s["bytes"] == {"csv": 1200}, s
+
+    assert catalog.reuse_csv(state, kept)
+    # Adopted files have an unknown range - never served, dropped on lookup
+    assert not catalog.reuse_csv(state, stray)
+    assert not stray.exists()
+    assert (tmp_path / "nse_equity_list.CSV").exists()
@@ -0,0 +1,53 @@
+"""
+pytest fixtures for the offline tests. Plain helpers and the NSE / Sheets
+stand-ins live in support.py.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from support import FakeNSE, FakeSpreadsheet, pipeline_state, start_server
+
+
+@pytest.fixture
+def start_nse():
+    """
+    Factory: start_nse(handler=FakeNSE) -> base URL. Servers are shut down
+    after the test.
+    """
+    servers = []
+
+    def start(handler=FakeNSE) -> str:
+        server, base = start_server(handler)
+        servers.append(server)
+        return base
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def nse_base(start_nse) -> str:
+    return start_nse()
+
+
+@pytest.fixture
+def spreadsheet() -> FakeSpreadsheet:
+    return FakeSpreadsheet()
+
+
+@pytest.fixture
+def staged_state(tmp_path, nse_base, spreadsheet) -> dict:
+    """
+    Staged pipeline state against a fresh NSE stand-in, writing to the
+    spreadsheet fixture.
+    """
+    state = pipeline_state(tmp_path, nse_base)
+    state["resources"]["spreadsheet"] = spreadsheet
+    return state
@@ -0,0 +1,89 @@
+"""
+Offline metrics test.
+Runs good and failing transactions through the staged pipeline (local NSE
+stand-in, in-memory spreadsheet) and checks the Prometheus text output,
+the metrics file, the /metrics endpoint and the SYSTEM_STATUS timings.
+"""
+
+import socket
+import time
+import urllib.request
+
+from modules import metrics, stages
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def sample(text: str, line_start: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(line_start + " "):
+            return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"{line_start} not in output")
+
+
+def test_pipeline_metrics(staged_state, tmp_path):
+    state = staged_state
+    metrics_file = tmp_path / "metrics.prom"
+    state["config"]["metrics"].update({"enabled": True, "file": str(metrics_file), "port": free_port()})
+
+    try:
+        port = metrics.start_server(state)
+        stages.start(state)
+
+        assert stages.submit(state, "INFY", "01-01-2024", "31-03-2024") == "queued"
+        assert stages.submit(state, "TCS", "01-01-2024", "31-01-2024") == "queued"
+        assert stages.submit(state, "BAD", "99-99-2024", "31-03-2024") == "queued"
+        assert stages.stop(state, timeout=10)
+
+        text = urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5).read().decode()
+
+        p = metrics.PREFIX
+        assert sample(text, f'{p}runs_total{{outcome="success"}}') == 2
+        assert sample(text, f'{p}runs_total{{outcome="error"}}') == 1
+        assert sample(text, f'{p}errors_total{{class="NSEFetchError"}}') == 1
+        assert sample(text, f"{p}rows_processed_total") == 65 + 23
+        assert sample(text, f"{p}nse_bytes_downloaded_total") > 0
+
+        # Histograms: cumulative buckets ending in +Inf == count
+        # The failed run spent its time fetching too
+        assert sample(text, f'{p}stage_duration_seconds_count{{stage="fetching"}}') == 3
+        assert sample(text, f'{p}stage_duration_seconds_bucket{{stage="fetching",le="+Inf"}}') == 3
+        assert sample(text, f'{p}stage_duration_seconds_bucket{{stage="fetching",le="0.05"}}') == 1  # only the bad date
+        assert sample(text, f'{p}stage_duration_seconds_count{{stage="writing"}}') == 2
+        assert sample(text, f"{p}run_sheets_calls_count") == 3
+        assert sample(text, f'{p}sheets_calls_total{{priority="write"}}') >= 3
+        assert f"# TYPE {p}stage_duration_seconds histogram" in text
+
+        # File is refreshed after every run
+        assert f'{p}runs_total{{outcome="error"}} 1' in metrics_file.read_text(encoding="utf-8")
+
+        # SYSTEM_STATUS carries the per-stage breakdown
+        calls = state["resources"]["spreadsheet"].calls
+        status = [
+            block["values"] for kind, body in calls if kind == "values_batch_update"
+            for block in body if block["range"].startswith("'SYSTEM_STATUS'!")
+        ]
+        timings = [dict(map(tuple, rows[:18]))["Stage Timings"] for rows in status]
+        assert any(t.startswith("FETCHING ") and "PROCESSING " in t for t in timings), timings
+
+    finally:
+        metrics.stop_server(state)
+
+
+def test_stage_timings():
+    t = {"stage": "IDLE", "stage_started": None, "stage_timings": {}}
+    state = {"transaction": t}
+
+    from modules import state as state_mod
+    state_mod.update_stage(state, "FETCHING")
+    time.sleep(0.02)
+    state_mod.update_stage(state, "PROCESSING")
+    state_mod.set_error(state, "boom")
+
+    timings = metrics.stage_timings(t)
+    assert list(timings) == ["FETCHING", "PROCESSING"] and timings["FETCHING"] >= 0.02, timings
+    assert metrics.timing_summary(t).startswith("FETCHING 0.0")
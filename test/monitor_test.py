@@ -0,0 +1,52 @@
+"""
+Offline trigger poll test.
+An idle poll reads the CUSTOM_VIEW control cells (and the REQUESTS table
+when it is enabled) in one values.batchGet - exactly one Sheets API call
+per poll - and a set trigger is read from that same response.
+"""
+
+import pytest
+
+from modules import monitor
+from support import FakeSpreadsheet, offline_config
+
+
+def poll_state(tmp_path, table: bool, cells: dict | None = None) -> dict:
+    config = offline_config(tmp_path)
+    config["google_sheets"]["request_table"]["enabled"] = table
+    return {"config": config, "resources": {"spreadsheet": FakeSpreadsheet(cells=cells), "shutdown_flag": False}}
+
+
+@pytest.mark.parametrize("table", [False, True])
+def test_idle_poll_is_one_call(tmp_path, table):
+    state = poll_state(tmp_path, table, cells={"'CUSTOM_VIEW'!B7": [["FALSE"]]})
+    spreadsheet = state["resources"]["spreadsheet"]
+
+    for _ in range(3):
+        assert monitor.check_trigger(state) == []
+
+    assert [kind for kind, _ in spreadsheet.calls] == ["values_batch_get"] * 3
+    ranges = spreadsheet.calls[0][1]
+    assert ranges[:4] == ["'CUSTOM_VIEW'!B4", "'CUSTOM_VIEW'!B5", "'CUSTOM_VIEW'!B6", "'CUSTOM_VIEW'!B7"]
+    assert len(ranges) == (5 if table else 4), ranges
+    assert state["resources"]["poll_stats"] == {"polls": 3, "api_calls": 3}
+
+
+def test_trigger_read_from_same_call(tmp_path):
+    state = poll_state(tmp_path, table=False, cells={
+        "'CUSTOM_VIEW'!B4": [[" infy "]],
+        "'CUSTOM_VIEW'!B5": [["01-01-2024"]],
+        "'CUSTOM_VIEW'!B6": [["31-01-2024"]],
+        "'CUSTOM_VIEW'!B7": [["TRUE"]],
+    })
+
+    requests = monitor.check_trigger(state)
+    assert [(r["row"], r["symbol"], r["from_date"], r["to_date"]) for r in requests] == [
+        (None, "INFY", "01-01-2024", "31-01-2024"),
+    ]
+    assert state["resources"]["poll_stats"] == {"polls": 1, "api_calls": 1}
+
+    # Incomplete inputs: still one call, nothing to run
+    del state["resources"]["spreadsheet"].cells["'CUSTOM_VIEW'!B5"]
+    assert monitor.check_trigger(state) == []
+    assert state["resources"]["poll_stats"] == {"polls": 2, "api_calls": 2}
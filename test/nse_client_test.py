@@ -0,0 +1,188 @@
+"""
+Offline NSE client test.
+A local HTTP server stands in for NSE. Ranges are split into windows and
+merged without overlaps, only failed windows are retried, rate-limit
+waits end on shutdown, and a store gap NSE answers with 404 (a holiday,
+or today before the data is published) still serves the rest of the
+range from the store.
+"""
+
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from modules import history_store, lifecycle, nse_client, screener
+from support import HEADER, FakeNSE, offline_config, rows
+
+
+class GapNSE(FakeNSE):
+    """FakeNSE that has nothing for ranges starting on a no_data day."""
+
+    calls = []
+    no_data = set()
+
+    def do_GET(self):
+        if "symbol=" in self.path:
+            GapNSE.calls.append(self.path)
+            if any(f"from={day}" in self.path for day in GapNSE.no_data):
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+        super().do_GET()
+
+
+class FlakyNSE(FakeNSE):
+    """FakeNSE that answers 500 for windows starting on a failures day,
+    as many times as its count."""
+
+    calls = []
+    failures = {}
+
+    def do_GET(self):
+        if "symbol=" in self.path:
+            FlakyNSE.calls.append(self.path)
+            day = next((d for d, n in FlakyNSE.failures.items() if n and f"from={d}" in self.path), None)
+            if day:
+                FlakyNSE.failures[day] -= 1
+                self.send_response(500)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+        super().do_GET()
+
+
+def store_state(tmp: Path, base: str) -> dict:
+    config = offline_config(tmp, base)
+    config["data"]["store"] = {"enabled": True, "folder": str(tmp / "store")}
+    return {"config": config, "resources": {}}
+
+
+def fetch(state: dict, symbol: str, from_date: str, to_date: str) -> Path:
+    return nse_client.fetch_csv(screener.symbol_state(state, symbol, from_date, to_date))
+
+
+def test_split_range():
+    split = nse_client.split_range
+
+    assert split(date(2024, 1, 1), date(2024, 1, 1), 365) == [(date(2024, 1, 1), date(2024, 1, 1))]
+    assert split(date(2024, 1, 1), date(2024, 1, 20), 10) == [
+        (date(2024, 1, 1), date(2024, 1, 10)),
+        (date(2024, 1, 11), date(2024, 1, 20)),
+    ]
+    assert split(date(2024, 1, 1), date(2024, 1, 21), 10)[-1] == (date(2024, 1, 21), date(2024, 1, 21))
+    assert split(date(2024, 1, 2), date(2024, 1, 1), 10) == []
+    # chunk_days below 1 still makes progress
+    assert len(split(date(2024, 1, 1), date(2024, 1, 3), 0)) == 3
+
+    # Leap year, across the year end: contiguous, no overlap, no gap
+    windows = split(date(2023, 12, 15), date(2025, 3, 1), 30)
+    assert windows[0][0] == date(2023, 12, 15) and windows[-1][1] == date(2025, 3, 1)
+    assert all(b - a == timedelta(days=29) for a, b in windows[:-1])
+    assert all(nxt[0] - cur[1] == timedelta(days=1) for cur, nxt in zip(windows, windows[1:]))
+
+
+def test_merge_chunks(tmp_path):
+    first = tmp_path / "a.chunk"
+    second = tmp_path / "b.chunk"
+    # BOM on the header, last day of one chunk repeated (revised) in the next
+    first.write_text("\ufeff" + HEADER + "".join(rows("INFY", "01-01-2024", "10-01-2024")), encoding="utf-8")
+    revised = rows("INFY", "10-01-2024", "20-01-2024")
+    revised[0] = revised[0].replace('"45.00"', '"99.00"')
+    second.write_text(HEADER + "".join(revised) + revised[-1], encoding="utf-8")
+
+    # Windows come in date order; the later chunk's copy of a day wins
+    dest = tmp_path / "merged.csv"
+    assert nse_client.merge_chunks([first, second], dest) == 15
+
+    merged = pd.read_csv(dest)
+    dates = pd.to_datetime(merged["Date"], format="%d-%b-%Y")
+    assert dates.is_monotonic_increasing and dates.is_unique
+    assert merged.columns[0] == "Symbol"
+    assert merged.loc[dates == "2024-01-10", "% Dly Qt to Traded Qty"].tolist() == [99.0]
+
+
+def test_failed_chunk_retried(start_nse, tmp_path):
+    base = start_nse(FlakyNSE)
+    config = offline_config(tmp_path, base)
+    config["nse"].update({"chunk_days": 10, "max_workers": 4, "max_retries": 2, "retry_backoff_seconds": 0.01})
+    state = {"config": config, "resources": {"shutdown_flag": False}}
+
+    try:
+        # 4 windows, one fails once: only that one is asked again
+        FlakyNSE.calls, FlakyNSE.failures = [], {"11-01-2024": 1}
+        path = fetch(state, "INFY", "01-01-2024", "31-01-2024")
+        assert len(FlakyNSE.calls) == 5, FlakyNSE.calls
+        assert sum("from=11-01-2024" in c for c in FlakyNSE.calls) == 2
+        assert len(pd.read_csv(path)) == 23
+
+        # A window that fails every attempt fails the range
+        FlakyNSE.calls, FlakyNSE.failures = [], {"11-02-2024": 2}
+        with pytest.raises(nse_client.NSEFetchError, match="1 of 3 chunks failed after 2 attempts"):
+            fetch(state, "TCS", "01-02-2024", "29-02-2024")
+        assert len(FlakyNSE.calls) == 4, FlakyNSE.calls
+
+        # No chunk files left behind either way
+        assert not list(tmp_path.glob("*.chunk"))
+
+    finally:
+        nse_client.close_session(state)
+
+
+def test_rate_limit_wait_ends_on_shutdown():
+    state = {"config": {"nse": {"requests_per_minute": 1}}, "resources": {"shutdown_flag": False}}
+    limiter = nse_client.get_rate_limiter(state)
+    limiter.acquire()
+
+    outcome = []
+
+    def second_call():
+        try:
+            limiter.acquire()
+            outcome.append("acquired")
+        except InterruptedError:
+            outcome.append("interrupted")
+
+    waiter = threading.Thread(target=second_call, daemon=True)
+    started = time.perf_counter()
+    waiter.start()
+    time.sleep(0.1)
+    lifecycle.initiate_shutdown(state, "test")
+    waiter.join(5)
+
+    # Would otherwise sleep out the rest of the 60 s window
+    assert outcome == ["interrupted"] and time.perf_counter() - started < 2
+
+
+def test_store_gap_404(start_nse, tmp_path):
+    base = start_nse(GapNSE)
+    state = store_state(tmp_path, base)
+    GapNSE.calls, GapNSE.no_data = [], {"11-01-2024"}
+
+    try:
+        fetch(state, "INFY", "01-01-2024", "10-01-2024")
+        fetch(state, "INFY", "15-01-2024", "31-01-2024")
+
+        # Only 11-14 Jan is missing and NSE has nothing for it
+        path = fetch(state, "INFY", "01-01-2024", "31-01-2024")
+        assert "from=11-01-2024&to=14-01-2024" in GapNSE.calls[-1], GapNSE.calls
+        assert len(pd.read_csv(path)) == 23 - 2  # 11 and 12 Jan are weekdays
+
+        # The empty gap is now covered - no further NSE call
+        calls = len(GapNSE.calls)
+        fetch(state, "INFY", "01-01-2024", "31-01-2024")
+        assert len(GapNSE.calls) == calls
+        assert history_store.load_coverage(state["config"], "INFY") == [(date(2024, 1, 1), date(2024, 1, 31))]
+
+        # Nothing stored and nothing at NSE is still "no data"
+        GapNSE.no_data.add("01-01-2024")
+        with pytest.raises(nse_client.NSENoDataError):
+            fetch(state, "NEWCO", "01-01-2024", "10-01-2024")
+        assert history_store.load_coverage(state["config"], "NEWCO") == []
+
+    finally:
+        nse_client.close_session(state)
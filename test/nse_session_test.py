@@ -0,0 +1,174 @@
+"""
+NSE session pool test with a stubbed requests session (no sockets).
+One pooled session serves every download, homepage cookies are reused
+within cookie_ttl_seconds and refreshed after it or on 401/403, chunked
+ranges ask NSE for each window once, at most max_workers at a time, with
+fetch timing totalled over the windows, and every API call (retries
+included) takes a rate limiter slot.
+"""
+
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from modules import nse_client, screener
+from modules.utils import RateLimiter
+from support import HEADER, offline_config, rows
+
+
+class StubResponse:
+    def __init__(self, status: int, body: bytes = b""):
+        self.status_code = status
+        self.body = body
+        self.closed = False
+
+    def iter_content(self, chunk_size: int):
+        for i in range(0, len(self.body), chunk_size):
+            yield self.body[i:i + chunk_size]
+
+    def close(self):
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class StubSession:
+    """
+    requests.Session stand-in. Homepage hits (no params) and API calls are
+    recorded; API calls answer with the next queued status (200 when the
+    queue is empty) and a CSV body for the requested window.
+    """
+
+    def __init__(self, statuses=(), delay: float = 0.0):
+        self.homepage = 0
+        self.api = []
+        self.statuses = list(statuses)
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def get(self, url, params=None, timeout=None, stream=False):
+        if params is None:
+            self.homepage += 1
+            return StubResponse(200, b"<html>home</html>")
+
+        with self._lock:
+            self.api.append(dict(params))
+            status = self.statuses.pop(0) if self.statuses else 200
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            time.sleep(self.delay)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+        if status != 200:
+            return StubResponse(status)
+        body = HEADER + "".join(rows(params["symbol"], params["from"], params["to"]))
+        return StubResponse(200, body.encode())
+
+    def close(self):
+        pass
+
+
+def stub_state(tmp: Path, session: StubSession, **nse_cfg) -> dict:
+    config = offline_config(tmp, "http://nse.invalid")
+    config["nse"].update(nse_cfg)
+    return {
+        "config": config,
+        "resources": {
+            "shutdown_flag": False,
+            "http_session": nse_client.new_pool(session, threading.Lock()),
+        },
+    }
+
+
+def fetch(state: dict, symbol: str, from_date: str, to_date: str) -> Path:
+    return nse_client.fetch_csv(screener.symbol_state(state, symbol, from_date, to_date))
+
+
+def test_session_reused_and_cookie_ttl(tmp_path):
+    session = StubSession()
+    state = stub_state(tmp_path, session, cookie_ttl_seconds=300)
+    pool = nse_client.get_session(state)
+
+    # Pooled session is reused; cookies are fetched once within the TTL
+    for symbol in ("INFY", "TCS", "SBIN"):
+        fetch(state, symbol, "01-01-2024", "31-01-2024")
+    assert nse_client.get_session(state) is pool and pool["session"] is session
+    assert session.homepage == 1 and len(session.api) == 3
+    assert pool["stats"] == {"requests": 3, "cookie_refreshes": 1}
+
+    # Past the TTL the next download refreshes them first
+    pool["cookies_at"] -= 301
+    fetch(state, "ITC", "01-01-2024", "31-01-2024")
+    assert session.homepage == 2 and pool["stats"]["cookie_refreshes"] == 2
+
+
+def test_rejected_cookies_refreshed(tmp_path):
+    # 401 -> refresh cookies and retry once within the same download
+    session = StubSession(statuses=[401])
+    state = stub_state(tmp_path, session)
+    path = fetch(state, "INFY", "01-01-2024", "31-01-2024")
+    assert len(pd.read_csv(path)) == 23
+    assert session.homepage == 2 and len(session.api) == 2
+
+    # Rejected again after the refresh: the download fails, no HTML/partial file
+    session.statuses = [403, 403]
+    session.api = []
+    state["config"]["nse"]["max_retries"] = 1
+    with pytest.raises(nse_client.NSEFetchError, match="403"):
+        fetch(state, "TCS", "01-01-2024", "31-01-2024")
+    assert len(session.api) == 2 and session.homepage == 3
+    assert not list(tmp_path.glob("TCS*"))
+
+
+def test_chunk_windows_and_workers(tmp_path):
+    session = StubSession(delay=0.05)
+    state = stub_state(tmp_path, session, chunk_days=7, max_workers=2)
+
+    txn_state = screener.symbol_state(state, "INFY", "01-01-2024", "31-01-2024")
+    path = nse_client.fetch_csv(txn_state)
+
+    # Five 7-day windows, each asked for once, never more than 2 in flight
+    windows = sorted((p["from"], p["to"]) for p in session.api)
+    assert windows == [
+        ("01-01-2024", "07-01-2024"), ("08-01-2024", "14-01-2024"), ("15-01-2024", "21-01-2024"),
+        ("22-01-2024", "28-01-2024"), ("29-01-2024", "31-01-2024"),
+    ], windows
+    assert session.peak == 2, session.peak
+    assert all(p["symbol"] == "INFY" and p["series"] == "ALL" for p in session.api)
+    assert len(pd.read_csv(path)) == 23
+
+    # Timing totals every window's call, not just the last one to finish
+    timing = txn_state["transaction"]["fetch_timing"]
+    bodies = [HEADER + "".join(rows("INFY", p["from"], p["to"])) for p in session.api]
+    assert timing["requests"] == 5 and timing["bytes"] == sum(len(b.encode()) for b in bodies), timing
+    assert timing["ttfb_ms"] >= 5 * 50 and timing["transfer_ms"] >= 0, timing
+
+
+def test_rate_limiter(tmp_path):
+    limiter = RateLimiter(2, period=0.2)
+    assert limiter.reserve() == 0 and limiter.reserve() == 0
+    delay = limiter.reserve()
+    assert 0 < delay <= 0.2
+
+    # acquire() waits until the oldest slot leaves the window
+    started = time.perf_counter()
+    waited = limiter.acquire()
+    assert waited > 0 and time.perf_counter() - started >= 0.15
+
+    # Every API call takes a slot - the 401 retry included
+    session = StubSession(statuses=[401])
+    state = stub_state(tmp_path, session, requests_per_minute=100)
+    fetch(state, "INFY", "01-01-2024", "31-01-2024")
+    assert len(nse_client.get_rate_limiter(state)._calls) == len(session.api) == 2
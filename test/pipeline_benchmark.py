@@ -0,0 +1,443 @@
+"""
+End-to-end pipeline benchmark - no network, no Google account.
+
+A local HTTP server stands in for NSE (synthetic priceVolumeDeliverable
+CSVs of a chosen size, response latency, cookie 403s) and an in-memory
+spreadsheet stands in for gspread (per-call latency). pipeline.run is
+driven for every run exactly as monitor.poll_loop would, then:
+
+- latency percentiles per stage (FETCHING / PROCESSING / WRITING / total)
+- throughput (runs/s, rows/s) and NSE / Sheets call counts
+- peak traced memory per stage (separate tracemalloc pass, since tracing
+  slows the timed runs)
+- comparison with a saved baseline (exit code 1 on regression)
+
+Usage:
+    python test/pipeline_benchmark.py                       # defaults below
+    python test/pipeline_benchmark.py --rows 2500 --runs 20 --latency 0.2
+    python test/pipeline_benchmark.py --save-baseline       # record baseline
+    python test/pipeline_benchmark.py --tolerance 0.1       # compare, 10% slack
+"""
+
+import argparse
+import http.server
+import json
+import logging
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.parse
+from pathlib import Path
+
+import gspread
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+
+from modules import metrics, pipeline, nse_client
+from modules import state as state_mod
+
+
+STAGES = ("FETCHING", "PROCESSING", "WRITING")
+FROM_DATE = "01-01-2015"
+DEFAULT_BASELINE = ROOT / "logs" / "pipeline_benchmark_baseline.json"
+
+# Full priceVolumeDeliverable header, with NSE's padding
+COLUMNS = [
+    "Symbol  ", "Series  ", "Date  ", "Prev Close  ", "Open Price  ", "High Price  ", "Low Price  ",
+    "Last Price  ", "Close Price  ", "Average Price ", "Total Traded Quantity  ", "Turnover ₹  ",
+    "No. of Trades  ", "Deliverable Qty  ", "% Dly Qt to Traded Qty  ",
+]
+
+
+# ---------------------------------------------------------------------
+# NSE stand-in
+# ---------------------------------------------------------------------
+def make_csv(symbol: str, from_date: str, to_date: str, seed: int = 7) -> str:
+    """
+    Synthetic CSV for every weekday in [from_date, to_date]: EQ rows with
+    thousands separators plus a BL row every 5th day ("-" delivery fields).
+    """
+    dates = pd.bdate_range(pd.to_datetime(from_date, dayfirst=True), pd.to_datetime(to_date, dayfirst=True))
+    n = len(dates)
+    rng = np.random.default_rng(seed + n)
+
+    close = rng.uniform(800, 2500, n).round(2)
+    traded = rng.integers(1_000_000, 20_000_000, n)
+    pct = rng.uniform(20, 80, n).round(2)
+
+    price = [f"{p:,.2f}" for p in close]
+    eq = pd.DataFrame({
+        COLUMNS[0]: symbol,
+        COLUMNS[1]: "EQ",
+        COLUMNS[2]: dates.strftime("%d-%b-%Y"),
+        **{col: price for col in COLUMNS[3:10]},
+        COLUMNS[10]: [f"{q:,}" for q in traded],
+        COLUMNS[11]: [f"{q * p:,.2f}" for q, p in zip(traded, close)],
+        COLUMNS[12]: [f"{q // 500:,}" for q in traded],
+        COLUMNS[13]: [f"{int(q * d / 100):,}" for q, d in zip(traded, pct)],
+        COLUMNS[14]: pct.astype(str),
+    })
+    bl = eq.iloc[::5].assign(**{COLUMNS[1]: "BL", COLUMNS[13]: "-", COLUMNS[14]: "-"})
+
+    return pd.concat([eq, bl]).sort_index(kind="stable").to_csv(index=False, quoting=1)
+
+
+def nse_server(latency: float, forbid_every: int) -> tuple[http.server.ThreadingHTTPServer, dict]:
+    """
+    Start the NSE stand-in. The homepage sets a cookie; API calls without
+    it, and every forbid_every-th API call, answer 403 (expired cookies).
+    """
+    stats = {"api": 0, "forbidden": 0, "homepage": 0, "bytes": 0, "lock": threading.Lock()}
+    bodies = {}
+
+    class FakeNSE(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            url = urllib.parse.urlparse(self.path)
+            query = dict(urllib.parse.parse_qsl(url.query))
+
+            if "symbol" not in query:
+                with stats["lock"]:
+                    stats["homepage"] += 1
+                self._send(200, b"<html>home</html>", {"Set-Cookie": "nsit=bench; Path=/"})
+                return
+
+            with stats["lock"]:
+                stats["api"] += 1
+                forbidden = "nsit=bench" not in (self.headers.get("Cookie") or "") or (
+                    forbid_every and stats["api"] % forbid_every == 0
+                )
+                stats["forbidden"] += forbidden
+
+            time.sleep(latency)
+            if forbidden:
+                self._send(403, b"Forbidden")
+                return
+
+            # Symbol-independent template, generated once per date window
+            window = (query["from"], query["to"])
+            if window not in bodies:
+                bodies[window] = make_csv("{SYMBOL}", *window).encode("utf-8")
+            body = bodies[window].replace(b"{SYMBOL}", query["symbol"].encode())
+
+            with stats["lock"]:
+                stats["bytes"] += len(body)
+            self._send(200, body, {"Content-Type": "text/csv"})
+
+        def _send(self, status: int, body: bytes, headers: dict | None = None):
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), FakeNSE)
+    threading.Thread(target=server.serve_forever, name="bench-nse", daemon=True).start()
+    return server, stats
+
+
+# ---------------------------------------------------------------------
+# gspread stand-in
+# ---------------------------------------------------------------------
+class FakeWorksheet:
+    def __init__(self, title: str, sheet_id: int, rows: int = 1000, cols: int = 26):
+        self.title = title
+        self.id = sheet_id
+        self.row_count = rows
+        self.col_count = cols
+
+
+class FakeSpreadsheet:
+    """
+    The gspread.Spreadsheet calls the pipeline makes, kept in memory.
+    Every call sleeps `latency` seconds to model the API round trip.
+    """
+
+    title = "Benchmark"
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.sheets = {}
+        self.values = {}             # title -> {range: values}
+        self.calls = {}              # method -> count
+        self.cells = 0
+
+    def _call(self, name: str) -> None:
+        self.calls[name] = self.calls.get(name, 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def worksheet(self, title: str) -> FakeWorksheet:
+        self._call("worksheet")
+        if title not in self.sheets:
+            # Data tabs like CUSTOM_VIEW / RAW_DATA exist in the real template
+            if not title.isupper():
+                raise gspread.exceptions.WorksheetNotFound(title)
+            self.sheets[title] = FakeWorksheet(title, len(self.sheets))
+        return self.sheets[title]
+
+    def add_worksheet(self, title: str, rows: int, cols: int) -> FakeWorksheet:
+        self._call("add_worksheet")
+        return self.sheets.setdefault(title, FakeWorksheet(title, len(self.sheets), rows, cols))
+
+    def batch_update(self, body: dict) -> dict:
+        self._call("batch_update")
+        by_id = {ws.id: ws for ws in self.sheets.values()}
+        for request in body["requests"]:
+            props = request.get("updateSheetProperties", {}).get("properties", {})
+            grid = props.get("gridProperties", {})
+            ws = by_id.get(props.get("sheetId"))
+            if ws is not None and grid:
+                ws.row_count = grid.get("rowCount", ws.row_count)
+                ws.col_count = grid.get("columnCount", ws.col_count)
+        return {}
+
+    def values_batch_update(self, body: dict) -> dict:
+        self._call("values_batch_update")
+        for block in body["data"]:
+            title, cell_range = block["range"].split("!", 1)
+            self.values.setdefault(title.strip("'"), {})[cell_range] = block["values"]
+            self.cells += sum(len(row) for row in block["values"])
+        return {}
+
+    def values_batch_get(self, ranges: list[str]) -> dict:
+        self._call("values_batch_get")
+        return {"valueRanges": [{"range": r} for r in ranges]}
+
+
+# ---------------------------------------------------------------------
+# Benchmark
+# ---------------------------------------------------------------------
+def make_state(args: argparse.Namespace, base_url: str, folder: str) -> dict:
+    state = state_mod.init_state()
+    config = state["config"]
+
+    config["nse"].update({
+        "base_url": base_url,
+        "homepage_url": base_url,
+        "requests_per_minute": 1_000_000,
+        "retry_backoff_seconds": 0.01,
+        "cookie_ttl_seconds": 3600,
+    })
+    config["data"].update({"folder": folder, "store": {"enabled": False}})
+    config["data"]["result_cache"]["enabled"] = False
+    config["data"]["catalog"]["enabled"] = False
+    config["google_sheets"]["quota"]["requests_per_minute"] = 1_000_000
+    config["metrics"]["enabled"] = False
+    config["profiling"]["enabled"] = False
+
+    state["resources"]["spreadsheet"] = FakeSpreadsheet(args.sheets_latency)
+    return state
+
+
+def run_once(state: dict, symbol: str, to_date: str) -> tuple[dict, float]:
+    """
+    One pipeline.run; returns the finished transaction and its wall time.
+    """
+    transaction = state_mod.new_transaction(symbol, FROM_DATE, to_date)
+    state["transaction"] = transaction
+
+    started = time.perf_counter()
+    pipeline.run(state)
+    total_seconds = time.perf_counter() - started
+
+    # pipeline.run resets state['transaction']; our reference keeps the
+    # timings (WRITING still open - it ends with the run)
+    transaction["stage_timings"] = metrics.stage_timings(transaction)
+    transaction["stage_peak_bytes"] = metrics.stage_peaks(transaction)
+    return transaction, total_seconds
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """
+    Nearest-rank percentile.
+    """
+    ordered = sorted(values)
+    return ordered[max(math.ceil(pct / 100 * len(ordered)) - 1, 0)]
+
+
+def summarize(samples: dict, peaks: dict) -> dict:
+    out = {}
+    for stage, values in samples.items():
+        out[stage] = {
+            "p50_ms": round(percentile(values, 50) * 1000, 2),
+            "p90_ms": round(percentile(values, 90) * 1000, 2),
+            "p99_ms": round(percentile(values, 99) * 1000, 2),
+            "max_ms": round(max(values) * 1000, 2),
+            "peak_mb": round(peaks.get(stage, 0) / 1024 / 1024, 2),
+        }
+    return out
+
+
+def benchmark(args: argparse.Namespace) -> dict:
+    to_date = pd.bdate_range(pd.to_datetime(FROM_DATE, dayfirst=True), periods=args.rows)[-1].strftime("%d-%m-%Y")
+
+    server, nse_stats = nse_server(args.latency, args.forbid_every)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    folder = tempfile.mkdtemp(prefix="nse-bench-")
+    state = make_state(args, base_url, folder)
+    spreadsheet = state["resources"]["spreadsheet"]
+
+    try:
+        for i in range(args.warmup):
+            run_once(state, f"WARM{i}", to_date)
+
+        spreadsheet.calls.clear()
+        api_before, forbidden_before = nse_stats["api"], nse_stats["forbidden"]
+
+        # Timed pass - every run is a new symbol, so nothing is cached
+        samples = {stage: [] for stage in (*STAGES, "total")}
+        rows = failures = 0
+        started = time.perf_counter()
+
+        for i in range(args.runs):
+            t, total_seconds = run_once(state, f"BENCH{i:04d}", to_date)
+            if t["error"]:
+                failures += 1
+                continue
+            for stage in STAGES:
+                samples[stage].append(t["stage_timings"].get(stage, 0.0))
+            samples["total"].append(total_seconds)
+            rows += t["metrics"].get("total_rows", 0) or 0
+
+        elapsed = time.perf_counter() - started
+        sheets_calls = sum(spreadsheet.calls.values())
+        nse_api = nse_stats["api"] - api_before
+        nse_forbidden = nse_stats["forbidden"] - forbidden_before
+
+        # Memory pass - tracemalloc slows everything, so it is not timed
+        peaks = {}
+        tracemalloc.start()
+        try:
+            for i in range(args.memory_runs):
+                t, _ = run_once(state, f"MEM{i:04d}", to_date)
+                for stage, peak in t["stage_peak_bytes"].items():
+                    peaks[stage] = max(peaks.get(stage, 0), peak)
+            peaks["total"] = max(peaks.values(), default=0)
+        finally:
+            tracemalloc.stop()
+
+    finally:
+        server.shutdown()
+        nse_client.close_session(state)
+
+    if failures == args.runs:
+        raise SystemExit(f"All {args.runs} runs failed - see log output")
+
+    return {
+        "settings": {
+            "rows": args.rows, "runs": args.runs, "latency": args.latency,
+            "forbid_every": args.forbid_every, "sheets_latency": args.sheets_latency,
+        },
+        "stages": summarize(samples, peaks),
+        "runs_per_second": round((args.runs - failures) / elapsed, 2),
+        "rows_per_second": round(rows / elapsed, 1),
+        "failures": failures,
+        "nse_api_calls": nse_api,
+        "nse_forbidden": nse_forbidden,
+        "sheets_calls_per_run": round(sheets_calls / args.runs, 2),
+    }
+
+
+# ---------------------------------------------------------------------
+# Report / baseline
+# ---------------------------------------------------------------------
+def report(result: dict) -> None:
+    s = result["settings"]
+    print(
+        f"Pipeline benchmark: {s['runs']} runs x {s['rows']:,} trading days | NSE latency {s['latency'] * 1000:.0f}ms"
+        f" | 403 every {s['forbid_every'] or '-'} | Sheets latency {s['sheets_latency'] * 1000:.0f}ms"
+    )
+    print(f"  {'stage':<11}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}{'peak MB':>10}")
+    for stage, row in result["stages"].items():
+        print(f"  {stage:<11}{row['p50_ms']:>10.1f}{row['p90_ms']:>10.1f}{row['p99_ms']:>10.1f}"
+              f"{row['max_ms']:>10.1f}{row['peak_mb']:>10.2f}")
+    print(
+        f"  throughput: {result['runs_per_second']:.2f} runs/s | {result['rows_per_second']:,.0f} rows/s"
+        f" | failures {result['failures']}"
+    )
+    print(
+        f"  NSE: {result['nse_api_calls']} API calls ({result['nse_forbidden']} answered 403)"
+        f" | Sheets: {result['sheets_calls_per_run']} calls/run"
+    )
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Print the change against the baseline; return the regressions.
+    """
+    if baseline["settings"] != result["settings"]:
+        print(f"  ⚠️ Baseline was recorded with different settings: {baseline['settings']}")
+
+    regressions = []
+    print(f"  vs baseline (tolerance {tolerance:.0%}):")
+
+    for stage, row in result["stages"].items():
+        old = baseline["stages"].get(stage)
+        if not old:
+            continue
+        changes = []
+        for key in ("p50_ms", "p90_ms", "peak_mb"):
+            if not old[key]:
+                continue
+            change = row[key] / old[key] - 1
+            changes.append(f"{key} {change:+.0%}")
+            if change > tolerance:
+                regressions.append(f"{stage} {key}: {old[key]} -> {row[key]}")
+        print(f"    {stage:<11}{' | '.join(changes)}")
+
+    change = result["runs_per_second"] / baseline["runs_per_second"] - 1
+    print(f"    {'throughput':<11}{change:+.0%}")
+    if change < -tolerance:
+        regressions.append(f"runs/s: {baseline['runs_per_second']} -> {result['runs_per_second']}")
+
+    return regressions
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline end-to-end pipeline benchmark")
+    parser.add_argument("--runs", type=int, default=30, help="timed pipeline runs (default 30)")
+    parser.add_argument("--rows", type=int, default=250, help="trading days per request (default 250)")
+    parser.add_argument("--latency", type=float, default=0.05, help="NSE response latency, seconds")
+    parser.add_argument("--forbid-every", type=int, default=10, help="every Nth NSE API call answers 403 (0: never)")
+    parser.add_argument("--sheets-latency", type=float, default=0.02, help="latency per Sheets call, seconds")
+    parser.add_argument("--warmup", type=int, default=2, help="untimed runs first (imports, cookies)")
+    parser.add_argument("--memory-runs", type=int, default=3, help="runs in the tracemalloc pass")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="write this result as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before failing (0.25 = 25%%)")
+    parser.add_argument("--verbose", action="store_true", help="show pipeline logs")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    os.chdir(ROOT)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+
+    result = benchmark(args)
+    report(result)
+
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(result, indent=2), encoding="utf-8")
+        print(f"  Baseline saved: {args.baseline}")
+
+    elif args.baseline.exists():
+        regressions = compare(result, json.loads(args.baseline.read_text(encoding="utf-8")), args.tolerance)
+        if regressions:
+            print("❌ REGRESSION: " + "; ".join(regressions))
+            sys.exit(1)
+        print("✅ SUCCESS: within tolerance of the baseline")
@@ -0,0 +1,79 @@
+"""
+Offline profiling test.
+Runs transactions through the staged pipeline (local NSE stand-in,
+in-memory spreadsheet) with profiling on and checks which runs are saved,
+the file names and reports, rotation and the CLI switches.
+"""
+
+import tracemalloc
+
+import pytest
+
+from modules import profiling, stages
+
+
+SYMBOLS = ["INFY", "TCS", "SBIN", "ITC"]
+
+
+def run_symbols(state: dict, symbols: list[str]) -> None:
+    stages.start(state)
+    for symbol in symbols:
+        assert stages.submit(state, symbol, "01-01-2024", "31-03-2024") == "queued"
+    assert stages.stop(state, timeout=10)
+
+
+def test_every_nth_run(staged_state, tmp_path):
+    state = staged_state
+    folder = tmp_path / "profiles"
+    state["config"]["profiling"].update({"enabled": True, "folder": str(folder), "every_n_runs": 2})
+
+    run_symbols(state, SYMBOLS)
+
+    profiles = sorted(folder.glob("*.prof"))
+    assert len(profiles) == 2, profiles
+    assert all(p.stem.endswith("_01-01-2024_31-03-2024_sample") for p in profiles), profiles
+
+    report = profiles[0].with_suffix(".txt").read_text(encoding="utf-8")
+    assert "Range:   01-01-2024 → 31-03-2024" in report
+    assert "fetch_csv" in report and "process_csv" in report
+    assert "WRITING" in report.split("Stages:")[1].splitlines()[0]
+    assert "Memory (tracemalloc)" in report and "peak" in report
+
+    # tracemalloc only runs while a profiled run is in flight
+    assert not tracemalloc.is_tracing()
+    assert state["resources"]["profiling"] == dict(state["resources"]["profiling"], runs=4, saved=2, tracing=0)
+
+
+def test_slow_runs_and_rotation(staged_state, tmp_path):
+    state = staged_state
+    folder = tmp_path / "profiles"
+    state["config"]["profiling"].update({
+        "enabled": True, "folder": str(folder), "slow_seconds": 0.001, "tracemalloc": False, "keep": 2,
+    })
+
+    run_symbols(state, SYMBOLS)
+
+    profiles = list(folder.glob("*.prof"))
+    assert len(profiles) == 2 and len(list(folder.glob("*.txt"))) == 2, profiles
+    assert all(p.stem.endswith("_slow") for p in profiles), profiles
+    assert "Memory (tracemalloc)" not in profiles[0].with_suffix(".txt").read_text(encoding="utf-8")
+
+    # Fast runs under the threshold are not written
+    state["config"]["profiling"]["slow_seconds"] = 60
+    for p in folder.iterdir():
+        p.unlink()
+    run_symbols(state, ["WIPRO"])
+    assert not list(folder.iterdir())
+
+
+def test_cli_switches():
+    config = {"profiling": {"enabled": False, "every_n_runs": 0, "slow_seconds": 0}}
+
+    profiling.apply_cli(config)
+    assert not profiling.is_enabled(config)
+
+    profiling.apply_cli(config, slow_seconds=2.5)
+    assert config["profiling"] == {"enabled": True, "every_n_runs": 0, "slow_seconds": 2.5}
+
+    with pytest.raises(profiling.ProfilingError):
+        profiling.apply_cli(config, every_n_runs=0)
@@ -0,0 +1,85 @@
+"""
+Offline REQUESTS table test.
+Several triggered rows are read in one poll, run side by side through the
+staged pipeline against a local NSE stand-in, and each lands in its own
+tab with its status row updated (no Google access needed).
+"""
+
+import time
+
+from gspread.utils import a1_to_rowcol
+
+from modules import monitor, request_table, stages
+from support import FETCH_DELAY, load_settings
+
+
+TABLE = [
+    ["INFY", "01-01-2024", "31-01-2024", "TRUE", "", "", ""],
+    ["TCS", "01-01-2024", "31-03-2024", "FALSE", "DONE (41 rows)", "TCS_01-01-2024_31-03-2024", ""],
+    ["SBIN", "01-02-2024", "29-02-2024", "TRUE", "DONE (20 rows)", "", ""],
+    ["ITC", "", "31-01-2024", "TRUE"],
+    [],
+    ["WIPRO", "01-01-2024", "31-01-2024", "TRUE"],
+]
+
+
+def test_request_table(staged_state, spreadsheet):
+    state = staged_state
+    spreadsheet.table = TABLE
+    state["config"]["pipeline"]["fetch_workers"] = 3
+
+    stages.start(state)
+
+    # One API call reads the control cells and the whole table
+    requests = monitor.check_trigger(state)
+    assert [c[0] for c in spreadsheet.calls] == ["values_batch_get"]
+    assert spreadsheet.calls[0][1][-1] == "'REQUESTS'!A2:G51"
+    assert [(r["row"], r["symbol"]) for r in requests] == [(2, "INFY"), (4, "SBIN"), (5, "ITC"), (7, "WIPRO")]
+
+    runnable = monitor.mark_requests(state, requests)
+    assert [r["symbol"] for r in runnable] == ["INFY", "SBIN", "WIPRO"]
+
+    marks = spreadsheet.values("REQUESTS")
+    assert marks["E2"] == [["QUEUED"]] and marks["E4"] == [["QUEUED"]] and marks["E7"] == [["QUEUED"]]
+    assert marks["D5:G5"][0][:2] == ["FALSE", "INVALID: Symbol, From Date and To Date are required"]
+
+    started = time.perf_counter()
+    monitor._submit_staged(state, runnable)
+
+    # Re-polling while they run: no duplicate work, no second QUEUED mark
+    calls = len(spreadsheet.calls)
+    monitor._submit_staged(state, monitor.mark_requests(state, runnable))
+    assert len(spreadsheet.calls) == calls
+
+    while stages.metrics(state)["in_flight"]:
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - started
+
+    assert stages.metrics(state)["completed"] == 3
+
+    # Each row got its own tab and a DONE status with its output tab
+    results = spreadsheet.values("REQUESTS")
+    for row, symbol, days in [(2, "INFY", 23), (4, "SBIN", 21), (7, "WIPRO", 23)]:
+        output = request_table.output_title(state["config"], symbol, *TABLE[row - 2][1:3])
+        data = spreadsheet.values(output)["A1"]
+        assert data[1][0] == symbol and len(data) == days + 1, (symbol, len(data))
+
+        trigger, status, tab, _ = results[f"D{row}:G{row}"][0]
+        assert (trigger, status, tab) == ("FALSE", f"DONE ({days} rows)", output), results[f"D{row}:G{row}"]
+
+    # Fetches overlapped (3 workers) instead of running back to back
+    assert elapsed < 3 * FETCH_DELAY + 0.5, elapsed
+    assert stages.stop(state, timeout=10)
+
+
+def test_parse_and_cells():
+    config = load_settings()
+
+    requests = request_table.parse(config, [["watchlist:nifty_bank", "01-01-2024", "31-01-2024", "yes"]])
+    assert requests[0]["symbol"] == "WATCHLIST:NIFTY_BANK"
+    assert ":" not in requests[0]["output_sheet"]
+
+    a1, values = request_table.result_cells(9, "DONE", "INFY")
+    assert a1 == "D9:G9" and values[0][:3] == ["FALSE", "DONE", "INFY"]
+    assert a1_to_rowcol(request_table.status_cells(9, "QUEUED")[0]) == (9, request_table.STATUS_COL)
+
@@ -0,0 +1,88 @@
+"""
+Offline result cache test.
+Stores processed results in a temporary cache folder and checks memory /
+disk hits, key normalization, today-aware TTLs and size-based eviction.
+"""
+
+from datetime import date, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+from modules import result_cache, schema, state as state_mod
+from support import load_settings
+
+
+def make_state(folder: Path, **cache_cfg) -> dict:
+    config = load_settings()
+    config["data"]["folder"] = str(folder)
+    config["data"]["result_cache"].update({"enabled": True, "folder": str(folder), **cache_cfg})
+    return {"config": config, "resources": {}, "transaction": state_mod.new_transaction()}
+
+
+def set_request(state: dict, symbol: str, from_date: str, to_date: str, rows: int = 3) -> None:
+    t = state["transaction"] = state_mod.new_transaction(symbol, from_date, to_date)
+    t["frame"] = pd.DataFrame({
+        "Symbol": [symbol.strip().upper()] * rows,
+        "Date": [f"{i:02d}-Jan-2024" for i in range(rows)],
+    })
+    t["metrics"] = {"total_rows": rows, "avg_delivery_pct": 45.5}
+
+
+def test_hits_and_misses(tmp_path):
+    state = make_state(tmp_path)
+
+    set_request(state, "INFY", "01-01-2024", "31-01-2024")
+    assert result_cache.lookup(state) is None
+    result_cache.store(state)
+
+    # Same request with different spelling -> same key, memory hit
+    set_request(state, " infy ", "1-1-2024", "31-01-2024")
+    hit = result_cache.lookup(state)
+    assert hit["metrics"]["avg_delivery_pct"] == 45.5
+
+    # New process (empty memory tier) -> disk hit
+    fresh = make_state(tmp_path)
+    set_request(fresh, "INFY", "01-01-2024", "31-01-2024")
+    assert schema.to_sheet_rows(result_cache.lookup(fresh)["frame"])[1] == ["INFY", "00-Jan-2024"]
+
+    s = result_cache.stats(state)
+    assert (s["memory_hits"], s["misses"]) == (1, 1), s
+    assert result_cache.stats(fresh)["disk_hits"] == 1
+
+    # Different analytics settings -> different key
+    fresh["config"]["analytics"]["rolling_days"] = 5
+    assert result_cache.lookup(fresh) is None
+
+
+def test_live_range_ttl(tmp_path):
+    state = make_state(tmp_path, ttl_live_seconds=0)
+
+    today = date.today().strftime("%d-%m-%Y")
+    set_request(state, "TCS", "01-01-2024", today)
+    result_cache.store(state)
+    assert result_cache.lookup(state) is None
+    assert result_cache.stats(state)["expired"] == 1
+
+    # Historical range keeps the long TTL
+    yesterday = (date.today() - timedelta(days=1)).strftime("%d-%m-%Y")
+    set_request(state, "TCS", "01-01-2024", yesterday)
+    result_cache.store(state)
+    assert result_cache.lookup(state) is not None
+
+
+def test_size_eviction(tmp_path):
+    # ~7 KB per entry; memory tier holds one, disk about two
+    state = make_state(tmp_path, memory_max_mb=10 / 1024, disk_max_mb=14 / 1024)
+
+    for i in range(6):
+        set_request(state, f"SYM{i}", "01-01-2024", "31-01-2024", rows=200)
+        result_cache.store(state)
+
+    s = result_cache.stats(state)
+    assert s["memory_entries"] <= 3 and s["evictions"] > 0, s
+    assert sum(p.stat().st_size for p in tmp_path.glob("*.pkl")) <= 14 * 1024
+
+    # Most recent entry survives both tiers
+    set_request(state, "SYM5", "01-01-2024", "31-01-2024", rows=200)
+    assert result_cache.lookup(state) is not None
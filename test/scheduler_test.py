@@ -0,0 +1,143 @@
+"""
+Adaptive poll scheduler test.
+Idle polls back off after idle_polls_before_backoff, activity keeps polls
+at min_interval for active_window_seconds, failed polls back off at once,
+quiet windows (wrapping midnight, weekday-limited) override all of it,
+and a poll that fails reaches the scheduler as an "error".
+"""
+
+import time
+from datetime import datetime
+
+from modules import lifecycle, monitor, scheduler
+from support import FakeSpreadsheet, offline_config
+
+
+# Wednesday, outside every quiet window below
+NOON = datetime(2024, 1, 3, 12, 0)
+
+
+def make_sched(**polling) -> dict:
+    config = {
+        "google_sheets": {
+            "poll_interval_seconds": 3,
+            "polling": {
+                "min_interval_seconds": 1,
+                "max_interval_seconds": 30,
+                "backoff_factor": 2,
+                "active_window_seconds": 120,
+                "idle_polls_before_backoff": 2,
+                **polling,
+            },
+        },
+    }
+    return scheduler.init_scheduler(config)
+
+
+def delays(sched: dict, outcomes: list[str], now: datetime = NOON) -> list[float]:
+    return [scheduler.next_delay(sched, outcome, now) for outcome in outcomes]
+
+
+def test_idle_backoff():
+    sched = make_sched()
+    assert delays(sched, ["idle"] * 7) == [3, 3, 6, 12, 24, 30, 30]
+
+    # A very long idle streak stays capped
+    sched["idle_streak"] = 10_000
+    assert scheduler.next_delay(sched, "idle", NOON) == 30
+
+
+def test_busy_polls_fast():
+    sched = make_sched()
+    delays(sched, ["idle"] * 5)
+
+    # Activity: min_interval, also for idle polls inside the active window
+    assert delays(sched, ["triggered", "idle", "idle", "idle"]) == [1, 1, 1, 1]
+
+    # Once the window has passed, the idle streak since activity counts
+    sched["last_activity"] = time.monotonic() - 121
+    assert delays(sched, ["idle", "idle"]) == [12, 24]
+
+
+def test_error_backoff():
+    sched = make_sched()
+
+    # Failures back off from the first one, even right after activity
+    assert delays(sched, ["triggered", "error", "error", "error", "error", "error"]) == [1, 6, 12, 24, 30, 30]
+
+    # A successful poll ends the failure backoff
+    assert delays(sched, ["triggered"]) == [1]
+    assert sched["failure_streak"] == 0
+    assert delays(sched, ["error", "idle"]) == [6, 1]
+
+
+def test_quiet_windows():
+    sched = make_sched(quiet_windows=[{"start": "18:00", "end": "08:30", "interval_seconds": 60}])
+
+    # Quiet window overrides failure backoff and idle backoff
+    assert delays(sched, ["error"], datetime(2024, 1, 3, 23, 0)) == [60]
+    # ...but never sleeps past its end, or below min_interval
+    assert delays(sched, ["idle"], datetime(2024, 1, 4, 8, 29, 30)) == [30]
+    assert delays(sched, ["idle"], datetime(2024, 1, 4, 8, 29, 59, 900000)) == [1]
+    # Outside it the normal rules apply (the idle polls ended the streak)
+    assert delays(sched, ["error", "error"], NOON) == [6, 12]
+
+
+def test_window_end():
+    end = scheduler._window_end
+
+    day = {"start": "09:00", "end": "17:00"}
+    assert end(day, datetime(2024, 1, 3, 10, 0)) == datetime(2024, 1, 3, 17, 0)
+    assert end(day, datetime(2024, 1, 3, 9, 0)) == datetime(2024, 1, 3, 17, 0)
+    assert end(day, datetime(2024, 1, 3, 17, 0)) is None
+    assert end(day, datetime(2024, 1, 3, 8, 59)) is None
+
+    # Wraps past midnight
+    night = {"start": "18:00", "end": "08:30"}
+    assert end(night, datetime(2024, 1, 3, 23, 0)) == datetime(2024, 1, 4, 8, 30)
+    assert end(night, datetime(2024, 1, 4, 7, 0)) == datetime(2024, 1, 4, 8, 30)
+    assert end(night, NOON) is None
+
+    # Weekdays are the day the window started: Friday night runs into Saturday
+    weeknights = {**night, "weekdays": [0, 1, 2, 3, 4]}
+    assert end(weeknights, datetime(2024, 1, 6, 7, 0)) == datetime(2024, 1, 6, 8, 30)
+    assert end(weeknights, datetime(2024, 1, 8, 7, 0)) is None
+
+    # Equal start and end cover the whole day
+    weekend = {"start": "00:00", "end": "00:00", "weekdays": [5, 6]}
+    assert end(weekend, datetime(2024, 1, 6, 10, 0)) == datetime(2024, 1, 7, 0, 0)
+    assert end(weekend, datetime(2024, 1, 5, 10, 0)) is None
+
+    assert end({"start": "25:00", "end": "08:00"}, NOON) is None
+    assert end({"end": "08:00"}, NOON) is None
+
+
+class FailingSpreadsheet(FakeSpreadsheet):
+    def values_batch_get(self, ranges):
+        raise ConnectionError("Sheets unreachable")
+
+
+def test_failed_poll_backs_off(tmp_path, monkeypatch):
+    config = offline_config(tmp_path)
+    config["pipeline"]["staged"] = False
+    config["google_sheets"]["request_table"]["enabled"] = False
+    state = {"config": config, "resources": {"spreadsheet": FailingSpreadsheet(), "shutdown_flag": False}}
+
+    # A failed poll is not "nothing to do"
+    assert monitor.check_trigger(state) is None
+
+    outcomes = []
+    next_delay = scheduler.next_delay
+
+    def recording_delay(sched, outcome, now=None):
+        outcomes.append(outcome)
+        if len(outcomes) == 3:
+            lifecycle.initiate_shutdown(state, "test")
+        # Record the outcome but don't sleep out real backoff/quiet delays
+        next_delay(sched, outcome, now)
+        return 0
+
+    monkeypatch.setattr(scheduler, "next_delay", recording_delay)
+    monitor.poll_loop(state)
+
+    assert outcomes == ["error", "error", "error"], outcomes
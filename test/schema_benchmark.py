@@ -0,0 +1,93 @@
+"""
+Micro-benchmark: plain pandas parsing vs schema.read_nse_csv.
+Generates synthetic priceVolumeDeliverable CSVs with every NSE column
+(padded headers, thousands separators, "-" placeholders) and times
+read_csv, read_csv(thousands=",") and the typed read (time and in-memory
+size), checking the typed frame against the plain one.
+
+Usage: python test/schema_benchmark.py [rows ...] [--repeats N]
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from modules import schema
+
+
+def make_csv(path: Path, rows: int, seed: int = 7) -> None:
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("1995-01-02", periods=rows)
+    price = rng.uniform(800, 2500, rows).round(2)
+    traded = rng.integers(1_000_000, 20_000_000, rows)
+
+    columns = {}
+    for col, kind in schema.PRICE_VOLUME_DELIVERABLE.items():
+        if col in ("Symbol", "Series"):
+            values = ["SYNTH" if col == "Symbol" else "EQ"] * rows
+        elif kind == "date":
+            values = dates.strftime(schema.DATE_FORMAT)
+        elif kind.startswith("Int"):
+            values = [f"{q:,}" for q in traded]
+        else:
+            values = [f"{p:,.2f}" for p in price]
+        columns[f"{col}  "] = values
+
+    df = pd.DataFrame(columns)
+    # Block-deal style rows carry "-" for delivery fields
+    df.iloc[::5, [df.columns.get_loc("Deliverable Qty  "), df.columns.get_loc("% Dly Qt to Traded Qty  ")]] = "-"
+    df.to_csv(path, index=False)
+
+
+def best_of(fn, repeats: int):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def run(csv_path: Path, repeats: int) -> dict:
+    plain_s, plain = best_of(lambda: pd.read_csv(csv_path), repeats)
+    thousands_s, _ = best_of(lambda: pd.read_csv(csv_path, thousands=","), repeats)
+    typed_s, typed = best_of(lambda: schema.read_nse_csv(csv_path), repeats)
+
+    # Same values, typed
+    assert len(typed) == len(plain)
+    assert typed["Date"].dt.strftime(schema.DATE_FORMAT).tolist() == plain["Date  "].tolist()
+    qty = pd.to_numeric(plain["Deliverable Qty  "].str.replace(",", ""), errors="coerce")
+    assert typed["Deliverable Qty"].astype("float64").equals(qty.astype("float64").rename("Deliverable Qty"))
+
+    return {
+        "plain": (plain_s, schema.memory_bytes(plain)),
+        "thousands": (thousands_s, None),
+        "typed": (typed_s, schema.memory_bytes(typed)),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("rows", nargs="*", type=int, default=[2_500, 60_000])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            csv_path = Path(tmp) / f"synthetic_{rows}.csv"
+            make_csv(csv_path, rows)
+            result = run(csv_path, args.repeats)
+
+            plain_s = result["plain"][0]
+            print(f"{rows:,} rows x {len(schema.PRICE_VOLUME_DELIVERABLE)} columns, best of {args.repeats}")
+            for name, label in (("plain", "read_csv"), ("thousands", 'read_csv(thousands=",")'), ("typed", "read_nse_csv")):
+                seconds, size = result[name]
+                memory = f"{size / 1024:8.0f} KB" if size else " " * 11
+                print(f"  {label:<26}{seconds * 1000:8.1f} ms {memory}  ({plain_s / seconds:.2f}x read_csv)")
@@ -0,0 +1,100 @@
+"""
+Offline schema test.
+Prices above float32's exact range (MRF trades near 1.3 lakh) survive the
+typed CSV read, the history store and the Sheets payload unchanged; the
+single-pass typed read gives the declared dtypes and the fast date parser
+agrees with strptime.
+"""
+
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules import history_store, schema
+from support import load_settings
+
+
+HEADER = '"Symbol  ","Series  ","Date  ","Close Price  ","Deliverable Qty  ","% Dly Qt to Traded Qty  "\n'
+
+
+def test_large_prices_round_trip(tmp_path):
+    prices = [f"{p:.2f}" for p in np.arange(134567.01, 134587.01, 0.01)][:2000]
+    days = pd.bdate_range("2024-01-01", periods=len(prices))
+    csv_path = tmp_path / "MRF.csv"
+    csv_path.write_text(HEADER + "".join(
+        f'"MRF","EQ","{d:%d-%b-%Y}","{p}","1,000","45.67"\n' for d, p in zip(days, prices)
+    ), encoding="utf-8")
+
+    df = schema.read_nse_csv(csv_path)
+    assert df["Close Price"].dtype == "float64"
+    assert [f"{v:.2f}" for v in df["Close Price"]] == prices
+
+    rows = schema.to_sheet_rows(df)
+    assert rows[1][3:] == [float(prices[0]), 1000, 45.67], rows[1]
+
+    # Through the Parquet store and back out as an NSE CSV
+    config = load_settings()
+    config["data"]["store"] = {"enabled": True, "folder": str(tmp_path / "store")}
+    start, end = days[0].date(), days[-1].date()
+    history_store.ingest_csv(config, "MRF", csv_path, start, end)
+
+    out = tmp_path / "out.csv"
+    history_store.export_csv(config, "MRF", start, end, out)
+    assert pd.read_csv(out, dtype=str)["Close Price"].tolist() == prices
+
+
+def test_float32_year_files_widened(tmp_path):
+    config = load_settings()
+    config["data"]["store"] = {"enabled": True, "folder": str(tmp_path)}
+
+    folder = history_store.symbol_folder(config, "INFY")
+    folder.mkdir(parents=True)
+    pd.DataFrame({
+        "Symbol": pd.Categorical(["INFY"]),
+        "Series": pd.Categorical(["EQ"]),
+        "Date": pd.to_datetime(["2024-01-02"]),
+        "Close Price": np.array([1510.01], dtype="float32"),
+        "Deliverable Qty": pd.array([450000], dtype="Int64"),
+        "% Dly Qt to Traded Qty": np.array([45.67], dtype="float32"),
+    }).to_parquet(folder / "2024.parquet", index=False)
+
+    df = history_store.load_range(config, "INFY", date(2024, 1, 1), date(2024, 1, 31))
+    assert df["Close Price"].dtype == "float64"
+    assert (df.loc[0, "Close Price"], df.loc[0, "% Dly Qt to Traded Qty"]) == (1510.01, 45.67)
+
+
+def test_parse_dates_matches_strptime():
+    text = pd.Series([
+        "01-Jan-2024", "29-Feb-2024", "30-Feb-2024", "31-Dec-1999", "1-Jan-2024",
+        "01-jan-2024", "01-Foo-2024", "01/Jan/2024", "01-Jan-20245", "", None,
+    ])
+    expected = pd.to_datetime(text, format=schema.DATE_FORMAT, errors="coerce")
+    assert schema.parse_dates(text).equals(expected)
+
+
+def test_typed_read(tmp_path):
+    csv_path = tmp_path / "INFY.csv"
+    csv_path.write_text(
+        '\ufeff"Symbol  ","Series  ","Date  ","Total Traded Quantity  ","Deliverable Qty  ","% Dly Qt to Traded Qty  "\n'
+        '"INFY","EQ","01-Jan-2024","1,000,000","450,000","45.00"\n'
+        '"INFY","BL","01-Jan-2024","20,000","-","-"\n'
+        '"INFY","EQ","02-Jan-2024","900,000","405,000","45.00"\n',
+        encoding="utf-8",
+    )
+
+    df = schema.read_nse_csv(csv_path)
+    assert df.dtypes.astype(str).tolist() == ["category", "category", "datetime64[us]", "Int64", "Int64", "float64"]
+    assert df["Total Traded Quantity"].tolist() == [1_000_000, 20_000, 900_000]
+    assert df["Deliverable Qty"].isna().tolist() == [False, True, False]
+    assert df["Date"].dt.day.tolist() == [1, 1, 2]
+
+    subset = schema.read_nse_csv(csv_path, usecols=["Date", "Deliverable Qty"])
+    assert subset.columns.tolist() == ["Date", "Deliverable Qty"]
+    assert [len(c) for c in schema.read_nse_csv(csv_path, chunksize=2)] == [2, 1]
+
+    csv_path.write_text('"Symbol","Series","Date","Deliverable Qty","% Dly Qt to Traded Qty"\n'
+                        '"INFY","EQ","01-Jan-2024","1.5","45"\n', encoding="utf-8")
+    with pytest.raises(schema.SchemaError, match="Deliverable Qty"):
+        schema.read_nse_csv(csv_path)
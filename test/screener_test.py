@@ -0,0 +1,167 @@
+"""
+Offline screener test.
+UNIVERSE / WATCHLIST requests resolve to symbol lists, score_csv compares
+the latest delivery % with its trailing average on fixture CSVs (in a
+worker process too), rank orders spikes with ties and NaN handled, and a
+watchlist screen fetches from the NSE stand-in and writes one ranked
+table to the fake spreadsheet.
+"""
+
+import logging
+from datetime import date, timedelta
+
+import pytest
+
+from modules import screener, state
+from support import HEADER, offline_config
+
+
+EQUITY_LIST = (
+    "SYMBOL,NAME OF COMPANY, SERIES, DATE OF LISTING\n"
+    "infy ,Infosys Limited,EQ,08-FEB-1995\n"
+    "TCS,Tata Consultancy Services Limited,EQ,25-AUG-2004\n"
+    "GOLDBEES,Nippon India ETF Gold BeES,ETF,19-MAR-2007\n"
+    "INFY,Infosys Limited,EQ,08-FEB-1995\n"
+)
+
+
+def write_history(path, symbol: str, pcts: list, start: date = date(2024, 1, 1)):
+    """
+    One EQ row per pct on consecutive days; a (pct, series) tuple sets the
+    series, a "-" pct is NSE's placeholder.
+    """
+    lines = []
+    for i, pct in enumerate(pcts):
+        pct, series = pct if isinstance(pct, tuple) else (pct, "EQ")
+        lines.append(f'"{symbol}","{series}","{start + timedelta(days=i):%d-%b-%Y}",'
+                     f'"1,510.00","1,000,000","450,000","{pct}"\n')
+    path.write_text(HEADER + "".join(lines), encoding="utf-8")
+    return path
+
+
+def score(symbol: str, spike: float) -> dict:
+    return {"symbol": symbol, "date": "31-Jan-2024", "close": 100.0, "deliverable_qty": 1000,
+            "delivery_pct": 50.0, "trailing_avg_pct": 40.0, "spike": spike}
+
+
+# ---------------------------------------------------------------------------
+# Symbol Resolution
+# ---------------------------------------------------------------------------
+
+def test_resolve_watchlist(tmp_path):
+    config = offline_config(tmp_path)
+    config["screener"]["watchlists"] = {"Banks": [" sbin", "HDFCBANK", " "]}
+
+    assert screener.is_screen_request("WATCHLIST:BANKS") and screener.is_screen_request("UNIVERSE")
+    assert not screener.is_screen_request("INFY") and not screener.is_screen_request(None)
+
+    assert screener.resolve_symbols(config, "WATCHLIST:banks") == ["SBIN", "HDFCBANK"]
+    with pytest.raises(screener.ScreenerError, match="Unknown watchlist: NIFTY_IT"):
+        screener.resolve_symbols(config, "WATCHLIST:NIFTY_IT")
+
+
+def test_resolve_universe(tmp_path):
+    config = offline_config(tmp_path)
+    config["screener"]["equity_list"] = str(tmp_path / "nse_equity_list.CSV")
+
+    with pytest.raises(screener.ScreenerError, match="Equity list not found"):
+        screener.resolve_symbols(config, "UNIVERSE")
+
+    # File name matched case-insensitively, EQ series only, duplicates dropped
+    (tmp_path / "NSE_EQUITY_LIST.csv").write_text(EQUITY_LIST, encoding="utf-8")
+    assert screener.resolve_symbols(config, "UNIVERSE") == ["INFY", "TCS"]
+
+    config["screener"]["series"] = None
+    assert screener.load_equity_list(config) == ["INFY", "TCS", "GOLDBEES"]
+
+
+# ---------------------------------------------------------------------------
+# Scoring
+# ---------------------------------------------------------------------------
+
+def test_score_csv(tmp_path):
+    # Trailing 3 sessions average 40; the latest EQ day delivers 80. The
+    # BL row on the latest date is ignored, and row order does not matter.
+    path = write_history(tmp_path / "INFY.csv", "INFY", [30, 40, 38, 42, 80, ("-", "BL")])
+    lines = path.read_text(encoding="utf-8").splitlines(keepends=True)
+    path.write_text(lines[0] + "".join(reversed(lines[1:])), encoding="utf-8")
+
+    assert screener.score_csv("INFY", str(path), 3, ["EQ"]) == {
+        "symbol": "INFY",
+        "date": "05-Jan-2024",
+        "close": 1510.0,
+        "deliverable_qty": 450000,
+        "delivery_pct": 80.0,
+        "trailing_avg_pct": 40.0,
+        "spike": 2.0,
+    }
+
+    # Needs two usable days and a non-zero baseline
+    one_day = write_history(tmp_path / "TCS.csv", "TCS", [45, "-"])
+    assert screener.score_csv("TCS", str(one_day), 3, ["EQ"]) is None
+    no_baseline = write_history(tmp_path / "SBIN.csv", "SBIN", [0, 0, 45])
+    assert screener.score_csv("SBIN", str(no_baseline), 3, ["EQ"]) is None
+
+
+def test_score_all_in_worker_processes(tmp_path, caplog):
+    config = offline_config(tmp_path)
+    config["screener"].update({"trailing_days": 2, "process_workers": 2})
+    paths = {
+        "INFY": write_history(tmp_path / "INFY.csv", "INFY", [40, 40, 60]),
+        "TCS": write_history(tmp_path / "TCS.csv", "TCS", [50, 30, 80]),
+        "SBIN": write_history(tmp_path / "SBIN.csv", "SBIN", [45]),
+        "ITC": tmp_path / "missing.csv",
+    }
+
+    with caplog.at_level(logging.WARNING, logger="screener"):
+        scores = screener.score_all(config, paths)
+
+    # SBIN has too little history, ITC's file fails to read in its worker
+    assert sorted((s["symbol"], s["spike"]) for s in scores) == [("INFY", 1.5), ("TCS", 2.0)]
+    assert "Scoring failed" in caplog.text
+
+
+# ---------------------------------------------------------------------------
+# Ranking
+# ---------------------------------------------------------------------------
+
+def test_rank_ties_and_nan():
+    scores = [score("TCS", 1.5), score("SBIN", float("nan")), score("INFY", 2.0), score("ITC", 1.5),
+              score("AXISBANK", 1.5)]
+
+    table = screener.rank(scores, top_n=3)
+    assert table[0] == screener.TABLE_HEADER
+    # Highest spike first, equal spikes by symbol, NaN left out, cut at top_n
+    assert [row[:2] for row in table[1:]] == [[1, "INFY"], [2, "AXISBANK"], [3, "ITC"]]
+    assert table[1] == [1, "INFY", "31-Jan-2024", 100.0, 1000, 50.0, 40.0, 2.0]
+
+    # Padded to top_n rows so a shorter table overwrites a longer one
+    table = screener.rank(scores[:2], top_n=4)
+    assert [row[1] for row in table[1:]] == ["TCS", "", "", ""]
+    assert table[-1] == [""] * len(screener.TABLE_HEADER)
+
+
+# ---------------------------------------------------------------------------
+# Screen Run
+# ---------------------------------------------------------------------------
+
+def test_watchlist_screen_end_to_end(staged_state, spreadsheet):
+    config = staged_state["config"]
+    config["screener"].update({"watchlists": {"TRIO": ["TCS", "INFY", "SBIN"]}, "top_n": 5,
+                               "process_workers": 2})
+    txn_state = state.transaction_state(
+        staged_state, state.new_transaction("WATCHLIST:TRIO", "01-01-2024", "31-01-2024"),
+    )
+
+    screener.run(txn_state)
+
+    # The stand-in serves the same history for every symbol: a three-way tie
+    table = spreadsheet.values("SCREENER")["A1"]
+    assert [row[:3] for row in table[1:4]] == [[1, "INFY", "31-Jan-2024"], [2, "SBIN", "31-Jan-2024"],
+                                               [3, "TCS", "31-Jan-2024"]]
+    assert table[1][3:] == [1510.0, 450000, 45.0, 45.0, 1.0]
+    assert len(table) == 6 and table[4] == table[5] == [""] * len(screener.TABLE_HEADER)
+    assert txn_state["transaction"]["metrics"] == {"total_rows": 3}
+
+    # Table, status and trigger reset go out in one values.batchUpdate
+    assert [kind for kind, _ in spreadsheet.calls].count("values_batch_update") == 1
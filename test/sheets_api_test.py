@@ -0,0 +1,87 @@
+"""
+Offline Sheets quota client test.
+Simulates 429 responses and competing poll/write callers against the token
+bucket (no Google access needed).
+"""
+
+import json
+import threading
+import time
+
+import gspread
+import pytest
+import requests
+
+from modules import sheets_api
+from support import load_settings
+
+
+def make_state(**quota) -> dict:
+    config = load_settings()
+    config["google_sheets"]["quota"].update(quota)
+    return {"config": config, "resources": {"shutdown_event": threading.Event()}}
+
+
+def api_error(status: int) -> gspread.exceptions.APIError:
+    response = requests.Response()
+    response.status_code = status
+    response._content = json.dumps({"error": {"code": status, "message": "Quota exceeded"}}).encode()
+    return gspread.exceptions.APIError(response)
+
+
+def test_retries_429():
+    state = make_state(requests_per_minute=6000, backoff_base_seconds=0.01, backoff_max_seconds=0.05)
+    failures = [api_error(429), api_error(429)]
+
+    def flaky():
+        if failures:
+            raise failures.pop()
+        return "ok"
+
+    assert sheets_api.call(state, sheets_api.WRITE, flaky) == "ok"
+
+    stats = sheets_api.quota_stats(state)
+    assert stats["rate_limited"] == 2 and stats["retries"] == 2, stats
+    assert stats["write_calls"] == 3, stats
+
+    # Non-quota errors are not retried
+    def broken():
+        raise api_error(400)
+
+    with pytest.raises(gspread.exceptions.APIError):
+        sheets_api.call(state, sheets_api.POLL, broken)
+    assert sheets_api.quota_stats(state)["poll_calls"] == 1
+
+
+def test_gives_up_after_max_retries():
+    state = make_state(requests_per_minute=6000, max_retries=1, backoff_base_seconds=0.01)
+
+    def always_429():
+        raise api_error(429)
+
+    with pytest.raises(sheets_api.SheetsQuotaError):
+        sheets_api.call(state, sheets_api.WRITE, always_429)
+    assert sheets_api.quota_stats(state)["failed"] == 1
+
+
+def test_writes_before_polls():
+    # 120/min = 2 tokens/s, bucket holds 2 tokens, polls leave 1 for writes
+    state = make_state(requests_per_minute=120, burst=2, write_reserve=1)
+    order = []
+
+    def record(name):
+        order.append(name)
+
+    # Drain the bucket, then queue a poll and a write at the same time
+    sheets_api.call(state, sheets_api.WRITE, record, "first")
+
+    poll = threading.Thread(target=sheets_api.call, args=(state, sheets_api.POLL, record, "poll"), daemon=True)
+    write = threading.Thread(target=sheets_api.call, args=(state, sheets_api.WRITE, record, "write"), daemon=True)
+    poll.start()
+    time.sleep(0.05)
+    write.start()
+    poll.join(5)
+    write.join(5)
+
+    assert order == ["first", "write", "poll"], order
+    assert sheets_api.quota_stats(state)["throttled_seconds"] > 0
@@ -0,0 +1,140 @@
+"""
+Offline RAW_DATA diff-write test.
+Uses an in-memory stand-in for the gspread spreadsheet (no Google access
+needed) and checks which batched requests write_results sends for
+repeated/extended data.
+"""
+
+import json
+
+import pytest
+
+from modules import sheets_io
+from support import FakeSpreadsheet, load_settings
+
+
+HEADER = ["Symbol", "Series", "Date", "% Dly Qt to Traded Qty"]
+
+
+def make_rows(days: int, symbol: str = "INFY") -> list[list]:
+    return [HEADER] + [[symbol, "EQ", f"{d:02d}-Jan-2025", 40 + d / 2] for d in range(1, days + 1)]
+
+
+def make_state() -> dict:
+    config = load_settings()
+
+    # Don't let the quota limiter or upload retries pace an offline test
+    config["google_sheets"]["quota"]["requests_per_minute"] = 60000
+    config["google_sheets"]["upload"]["retry_backoff_seconds"] = 0
+
+    return {
+        "config": config,
+        "resources": {"spreadsheet": FakeSpreadsheet(), "worksheets": {}},
+        "transaction": {"symbol": "INFY", "from_date": "01-01-2025", "to_date": "20-01-2025", "metrics": {}},
+    }
+
+
+def write(state: dict, raw_data: list[list], symbol: str = "INFY") -> tuple[list, list]:
+    """
+    Run write_results; return (structural request kinds, RAW_DATA value ranges).
+    """
+    spreadsheet = state["resources"]["spreadsheet"]
+    spreadsheet.calls.clear()
+    state["transaction"].update({"symbol": symbol, "raw_data": raw_data})
+    sheets_io.write_results(state)
+
+    # Every run is at most one structural + one values call
+    assert len(spreadsheet.calls) <= 2, spreadsheet.calls
+
+    requests = [k for kind, body in spreadsheet.calls if kind == "batch_update" for r in body for k in r]
+    ranges = [
+        r for kind, body in spreadsheet.calls if kind == "values_batch_update"
+        for r in body if r["range"].startswith("'RAW_DATA'!")
+    ]
+    return requests, ranges
+
+
+def test_incremental_writes():
+    state = make_state()
+
+    # First write - nothing known about the sheet yet
+    requests, ranges = write(state, make_rows(20))
+    assert "updateCells" in requests, requests
+    assert ranges[0]["range"] == "'RAW_DATA'!A1", ranges
+
+    # Same data again - only status/trigger go out
+    requests, ranges = write(state, make_rows(20))
+    assert requests == [] and ranges == [], (requests, ranges)
+
+    # One more day - only the appended row goes out
+    requests, ranges = write(state, make_rows(21))
+    assert requests == [], requests
+    assert ranges == [{"range": "'RAW_DATA'!A22:D22", "values": [make_rows(21)[21]]}], ranges
+
+    # Revised last two rows - one contiguous range
+    revised = make_rows(21)
+    revised[20][3] = 99.0
+    revised[21][3] = 98.0
+    requests, ranges = write(state, revised)
+    assert [r["range"] for r in ranges] == ["'RAW_DATA'!A21:D22"], ranges
+
+    # Different symbol or fewer rows - full rewrite
+    requests, _ = write(state, make_rows(21, "TCS"), symbol="TCS")
+    assert "updateCells" in requests, requests
+    requests, _ = write(state, make_rows(10, "TCS"), symbol="TCS")
+    assert "updateCells" in requests, requests
+
+    # Status and trigger ride along in the values call
+    spreadsheet = state["resources"]["spreadsheet"]
+    titles = {r["range"].split("!")[0].strip("'") for r in spreadsheet.calls[-1][1]}
+    assert {"SYSTEM_STATUS", "CUSTOM_VIEW"} <= titles, titles
+
+    # Failed write forgets the fingerprint, so the next write is full
+    spreadsheet.values_batch_update = None
+    with pytest.raises(sheets_io.SheetsIOError):
+        write(state, make_rows(11, "TCS"), symbol="TCS")
+    assert state["resources"]["sheet_fingerprints"]["RAW_DATA"] is None
+
+
+def test_chunked_upload():
+    state = make_state()
+    state["config"]["google_sheets"]["upload"].update({"max_block_bytes": 4000, "workers": 3})
+    spreadsheet = state["resources"]["spreadsheet"]
+
+    # Fail the first attempt of one block - only that block is resent
+    sent = spreadsheet.values_batch_update
+    failed = []
+
+    def flaky(body):
+        if not failed and body["data"][0]["range"] != "'RAW_DATA'!A1":
+            failed.append(body["data"][0]["range"])
+            raise ConnectionError("connection reset")
+        sent(body)
+
+    spreadsheet.values_batch_update = flaky
+
+    raw_data = make_rows(500)
+    spreadsheet.calls.clear()
+    state["transaction"].update({"symbol": "INFY", "raw_data": raw_data})
+    sheets_io.write_results(state)
+
+    values_calls = [body for kind, body in spreadsheet.calls if kind == "values_batch_update"]
+    assert len(values_calls) > 3, len(values_calls)
+    assert all(len(json.dumps(body)) < 4000 + 500 for body in values_calls)
+
+    # Every row landed exactly once, at the right sheet row
+    landed = {}
+    for body in values_calls:
+        for block in body:
+            if not block["range"].startswith("'RAW_DATA'!"):
+                continue
+            start = int(block["range"].split("!A")[1].split(":")[0])
+            for offset, row in enumerate(block["values"]):
+                assert start + offset not in landed
+                landed[start + offset] = row
+    assert [landed[i + 1] for i in range(len(raw_data))] == raw_data
+
+    # The resent block appears once, status + trigger go last
+    assert len(failed) == 1
+    titles = {b["range"].split("!")[0].strip("'") for b in values_calls[-1]}
+    assert {"SYSTEM_STATUS", "CUSTOM_VIEW"} <= titles, titles
@@ -0,0 +1,153 @@
+"""
+Offline chunked upload test.
+upload_values cuts oversized ranges into row blocks and packs them into
+requests of at most max_block_bytes, sends all but the last request
+concurrently, retries a failed request on its own, and stops retrying
+once shutdown is requested.
+"""
+
+import json
+import threading
+import time
+
+import pytest
+
+from modules import lifecycle, sheets_io
+from support import FakeSpreadsheet, offline_config
+
+
+class SlowSpreadsheet(FakeSpreadsheet):
+    """FakeSpreadsheet whose values.batchUpdate takes a while and can fail."""
+
+    def __init__(self, delay: float = 0.0, failures: int = 0):
+        super().__init__()
+        self.delay = delay
+        self.failures = failures
+        self.attempts = []
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def values_batch_update(self, body):
+        with self._lock:
+            self.attempts.append(body["data"][0]["range"])
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            fail = self.failures > 0
+            self.failures -= fail
+        try:
+            time.sleep(self.delay)
+            if fail:
+                raise ConnectionError("connection reset")
+            super().values_batch_update(body)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+def upload_state(tmp_path, spreadsheet: FakeSpreadsheet, **upload) -> dict:
+    config = offline_config(tmp_path)
+    config["google_sheets"]["upload"].update({"retry_backoff_seconds": 0, **upload})
+    return {"config": config, "resources": {"spreadsheet": spreadsheet, "shutdown_flag": False}}
+
+
+def raw_rows(count: int) -> list[list]:
+    # Same JSON size for every row, so block boundaries are predictable
+    return [["INFY", "EQ", f"{i:04d}", "45.00"] for i in range(count)]
+
+
+def sent_rows(spreadsheet: FakeSpreadsheet, title: str) -> dict:
+    """Sheet row -> values, for every row written to title."""
+    landed = {}
+    for kind, body in spreadsheet.calls:
+        for block in body:
+            if kind == "values_batch_update" and block["range"].startswith(f"'{title}'!"):
+                start = int(block["range"].split("!A")[1])
+                for offset, row in enumerate(block["values"]):
+                    assert start + offset not in landed, start + offset
+                    landed[start + offset] = row
+    return landed
+
+
+def test_block_split(tmp_path):
+    rows = raw_rows(200)
+    row_bytes = len(json.dumps(rows[0])) + 1
+
+    # Under the limit: one range, one request
+    spreadsheet = FakeSpreadsheet()
+    state = upload_state(tmp_path, spreadsheet, max_block_bytes=200 * row_bytes)
+    assert sheets_io.upload_values(state, [{"range": "'RAW_DATA'!A1", "values": rows}]) == 1
+    assert spreadsheet.calls == [("values_batch_update", [{"range": "'RAW_DATA'!A1", "values": rows}])]
+
+    # 50 rows per block; blocks start where the previous one ended
+    blocks = sheets_io._split_range({"range": "'RAW_DATA'!A21", "values": rows}, 50 * row_bytes)
+    assert [b["range"] for b in blocks] == ["'RAW_DATA'!A21", "'RAW_DATA'!A71", "'RAW_DATA'!A121", "'RAW_DATA'!A171"]
+    assert [len(b["values"]) for b in blocks] == [50, 50, 50, 50]
+    assert all(b["bytes"] <= 50 * row_bytes for b in blocks)
+
+    # Small ranges share a request with the block before them
+    status = {"range": "'SYSTEM_STATUS'!A1", "values": [["Status", "OK"]]}
+    spreadsheet = FakeSpreadsheet()
+    state = upload_state(tmp_path, spreadsheet, max_block_bytes=60 * row_bytes)
+    calls = sheets_io.upload_values(state, [{"range": "'RAW_DATA'!A2", "values": rows}, status])
+
+    bodies = [body for kind, body in spreadsheet.calls]
+    assert calls == len(bodies) == 4, [len(b) for b in bodies]
+    assert all(sum(len(json.dumps(b["values"][0])) * len(b["values"]) for b in body) <= 60 * row_bytes
+               for body in bodies)
+    assert bodies[-1][-1] == status
+
+    landed = sent_rows(spreadsheet, "RAW_DATA")
+    assert [landed[i + 2] for i in range(len(rows))] == rows
+
+
+def test_concurrent_send(tmp_path):
+    rows = raw_rows(380)
+    row_bytes = len(json.dumps(rows[0])) + 1
+    spreadsheet = SlowSpreadsheet(delay=0.1)
+    state = upload_state(tmp_path, spreadsheet, max_block_bytes=50 * row_bytes, workers=3)
+    status = {"range": "'SYSTEM_STATUS'!A1", "values": [["Status", "OK"]]}
+
+    started = time.perf_counter()
+    calls = sheets_io.upload_values(state, [{"range": "'RAW_DATA'!A1", "values": rows}, status])
+    elapsed = time.perf_counter() - started
+
+    # 8 requests (the last block is 30 rows + status): 7 sent 3 at a time,
+    # then the one carrying the status
+    assert calls == 8 and spreadsheet.peak == 3, (calls, spreadsheet.peak)
+    assert elapsed < 8 * 0.1, elapsed
+    assert spreadsheet.calls[-1][1][-1] == status
+    assert len(sent_rows(spreadsheet, "RAW_DATA")) == len(rows)
+
+
+def test_failed_request_retried(tmp_path):
+    rows = raw_rows(200)
+    row_bytes = len(json.dumps(rows[0])) + 1
+
+    # First attempt fails: only that request is sent again
+    spreadsheet = SlowSpreadsheet(failures=1)
+    state = upload_state(tmp_path, spreadsheet, max_block_bytes=50 * row_bytes, workers=1, max_retries=2)
+    assert sheets_io.upload_values(state, [{"range": "'RAW_DATA'!A1", "values": rows}]) == 4
+    assert len(spreadsheet.attempts) == 5 and spreadsheet.attempts.count(spreadsheet.attempts[0]) == 2
+    assert len(sent_rows(spreadsheet, "RAW_DATA")) == len(rows)
+
+    # Fails every attempt: the error propagates after max_retries
+    spreadsheet = SlowSpreadsheet(failures=3)
+    state = upload_state(tmp_path, spreadsheet, max_retries=2)
+    with pytest.raises(ConnectionError):
+        sheets_io.upload_values(state, [{"range": "'RAW_DATA'!A1", "values": rows}])
+    assert len(spreadsheet.attempts) == 3
+
+
+def test_shutdown_ends_retry_backoff(tmp_path):
+    spreadsheet = SlowSpreadsheet(failures=1)
+    state = upload_state(tmp_path, spreadsheet, retry_backoff_seconds=30)
+    threading.Timer(0.2, lifecycle.initiate_shutdown, (state, "test")).start()
+
+    started = time.perf_counter()
+    with pytest.raises(sheets_io.SheetsIOError, match="Shutdown"):
+        sheets_io.upload_values(state, [{"range": "'RAW_DATA'!A1", "values": raw_rows(10)}])
+
+    # Would otherwise sleep out the 30 s backoff
+    assert time.perf_counter() - started < 5
+    assert len(spreadsheet.attempts) == 1
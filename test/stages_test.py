@@ -0,0 +1,142 @@
+"""
+Offline staged pipeline test.
+A local HTTP server stands in for NSE (slow responses) and an in-memory
+spreadsheet stands in for Google Sheets; several triggers are pushed
+through the fetch -> process -> write stages at once. A transaction the
+writer cannot finish is recorded as failed and the worker keeps going.
+Screens are written by the writer stage, and a trigger read just before
+its run finished is not queued again.
+"""
+
+import threading
+import time
+
+from modules import monitor, sheets_io, stages
+from support import FETCH_DELAY
+
+
+def test_staged_pipeline(staged_state):
+    state = staged_state
+    symbols = ["INFY", "TCS", "SBIN", "ITC", "HDFCBANK", "WIPRO"]
+
+    stages.start(state)
+
+    started = time.perf_counter()
+    outcomes = [stages.submit(state, s, "01-01-2024", "31-03-2024") for s in symbols]
+
+    # Backpressure: only max_in_flight accepted, duplicates ignored
+    assert outcomes.count("queued") == 4, outcomes
+    assert outcomes[4:] == ["busy", "busy"], outcomes
+    assert stages.submit(state, "INFY", "01-01-2024", "31-03-2024") == "duplicate"
+
+    while stages.metrics(state)["in_flight"]:
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - started
+
+    # Fetches overlapped (3 workers) instead of running back to back
+    assert elapsed < 4 * FETCH_DELAY, elapsed
+
+    m = stages.metrics(state)
+    assert m["completed"] == 4, m
+    assert m["write"]["processed"] == 4 and m["write"]["failed"] == 0, m
+    assert m["fetch"]["max_depth"] >= 1, m
+
+    # Each transaction wrote its own RAW_DATA (symbol changes -> full writes)
+    calls = state["resources"]["spreadsheet"].calls
+    written = {
+        block["values"][1][0]
+        for kind, body in calls if kind == "values_batch_update"
+        for block in body if block["range"].startswith("'RAW_DATA'!A1")
+    }
+    assert written == {"INFY", "TCS", "SBIN", "ITC"}, written
+
+    # Failed fetch is reported through the writer, not lost
+    assert stages.submit(state, "BAD", "99-99-2024", "31-03-2024") == "queued"
+    assert stages.stop(state, timeout=10)
+    assert stages.metrics(state)["fetch"]["failed"] == 1
+
+
+def test_finish_failure(staged_state, monkeypatch):
+    state = staged_state
+    finish = stages._finish
+    broken = []
+
+    def failing_finish(state, txn_state):
+        if not broken:
+            broken.append(txn_state)
+            raise RuntimeError("finish blew up")
+        finish(state, txn_state)
+
+    monkeypatch.setattr(stages, "_finish", failing_finish)
+
+    stages.start(state)
+    assert stages.submit(state, "INFY", "01-01-2024", "31-01-2024") == "queued"
+    deadline = time.monotonic() + 10
+    while stages.metrics(state)["in_flight"] and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    # Slot released and the failure recorded against the transaction
+    m = stages.metrics(state)
+    assert m["in_flight"] == 0 and m["write"]["failed"] == 1, m
+    assert "finish blew up" in broken[0]["transaction"]["error"]
+
+    # Same writer thread still serves the next transaction
+    assert stages.submit(state, "TCS", "01-01-2024", "31-01-2024") == "queued"
+    assert stages.stop(state, timeout=10)
+    assert stages.metrics(state)["completed"] == 2
+
+
+def wait_idle(state: dict) -> None:
+    deadline = time.monotonic() + 10
+    while stages.metrics(state)["in_flight"] and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+
+def test_screen_written_by_writer(staged_state, spreadsheet, monkeypatch):
+    state = staged_state
+    state["config"]["screener"].update({"watchlists": {"PAIR": ["INFY", "TCS"]}, "process_workers": 1})
+    writers = []
+    write_screen = sheets_io.write_screen
+
+    def recording_write_screen(txn_state, table):
+        writers.append(threading.current_thread().name)
+        write_screen(txn_state, table)
+
+    monkeypatch.setattr(sheets_io, "write_screen", recording_write_screen)
+
+    stages.start(state)
+    assert stages.submit(state, "WATCHLIST:PAIR", "01-01-2024", "31-01-2024") == "queued"
+    wait_idle(state)
+    assert stages.stop(state, timeout=10)
+
+    assert writers == ["stage-write"]
+    table = spreadsheet.values("SCREENER")["A1"]
+    assert [row[1] for row in table[1:3]] == ["INFY", "TCS"]
+    assert stages.metrics(state)["write"]["processed"] == 1
+
+
+def test_stale_trigger_not_resubmitted(staged_state, spreadsheet):
+    state = staged_state
+    request = {"symbol": "INFY", "from_date": "01-01-2024", "to_date": "31-01-2024", "row": 2,
+               "output_sheet": None, "status": "", "error": None}
+    key = stages.request_key("INFY", "01-01-2024", "31-01-2024", 2)
+
+    stages.start(state)
+    monitor._submit_staged(state, [request], read_at=time.monotonic())
+
+    # A poll reads TRUE while the run is still going; the run then resets
+    # the trigger and finishes before the poll submits what it read
+    read_at = time.monotonic()
+    wait_idle(state)
+    calls = len(spreadsheet.calls)
+
+    assert stages.is_in_flight(state, key, read_at) and not stages.is_in_flight(state, key)
+    assert monitor.mark_requests(state, [request], read_at) == []
+    assert stages.submit(state, "INFY", "01-01-2024", "31-01-2024", 2, read_at=read_at) == "duplicate"
+    # No QUEUED mark over the finished run's DONE status
+    assert len(spreadsheet.calls) == calls
+
+    # A trigger set again and read after the run finished runs again
+    assert stages.submit(state, "INFY", "01-01-2024", "31-01-2024", 2, read_at=time.monotonic()) == "queued"
+    assert stages.stop(state, timeout=10)
+    assert stages.metrics(state)["completed"] == 2
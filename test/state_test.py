@@ -0,0 +1,50 @@
+"""
+Offline transaction state test.
+A transaction is a plain dict; processing leaves the rows columnar in
+'frame' and the Sheets payload is built by the writer for each write,
+never stored beside the frame.
+"""
+
+from modules import processor, schema, sheets_io, state as state_mod
+from support import HEADER, rows
+
+
+def test_new_transaction():
+    t = state_mod.new_transaction("INFY", "01-01-2024", "31-01-2024", request_row=4)
+
+    assert type(t) is dict
+    assert (t["symbol"], t["request_row"], t["frame"], t["error"], t["stage"]) == ("INFY", 4, None, None, "IDLE")
+    assert "raw_data" not in t and "id" not in t
+
+    # Each transaction gets its own mutable fields
+    other = state_mod.new_transaction()
+    t["metrics"]["total_rows"] = 1
+    assert other["metrics"] == {}
+
+
+def test_payload_built_at_write_time(tmp_path):
+    csv_path = tmp_path / "INFY.csv"
+    csv_path.write_text(HEADER + "".join(rows("INFY", "01-01-2024", "31-01-2024")), encoding="utf-8")
+
+    state = {
+        "config": {"analytics": {}},
+        "transaction": state_mod.new_transaction("INFY", "01-01-2024", "31-01-2024"),
+    }
+    state["transaction"]["csv_path"] = csv_path
+    processor.process_csv(state)
+
+    t = state["transaction"]
+    assert len(t["frame"]) == 23 and "raw_data" not in t
+
+    payload = sheets_io.sheet_rows(t)
+    assert payload == schema.to_sheet_rows(schema.read_nse_csv(csv_path))
+    assert payload[1][:3] == ["INFY", "EQ", "01-Jan-2024"], payload[1]
+
+    # Nothing kept on the transaction; a new frame gives a new payload
+    assert "raw_data" not in t
+    t["frame"] = t["frame"].head(3)
+    assert len(sheets_io.sheet_rows(t)) == 4
+
+    # A ready-made payload (screen table) is used as is
+    assert sheets_io.sheet_rows({"raw_data": [["Rank"]], "frame": None}) == [["Rank"]]
+    assert sheets_io.sheet_rows(state_mod.new_transaction()) == []
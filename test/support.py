@@ -0,0 +1,172 @@
+"""
+Shared offline test helpers.
+Local stand-ins for NSE (HTTP handler) and Google Sheets (in-memory
+spreadsheet) plus the settings.json-based test config. Tests subclass
+the fakes from here; servers and states with a lifecycle are pytest
+fixtures in conftest.py.
+"""
+
+import http.server
+import json
+import threading
+import time
+import urllib.parse
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+HEADER = '"Symbol  ","Series  ","Date  ","Close Price  ","Total Traded Quantity  ","Deliverable Qty  ","% Dly Qt to Traded Qty  "\n'
+FETCH_DELAY = 0.3
+
+
+# ---------------------------------------------------------------------------
+# Config
+# ---------------------------------------------------------------------------
+
+def load_settings() -> dict:
+    """
+    Fresh copy of config/settings.json.
+    """
+    with (ROOT / "config" / "settings.json").open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def offline_config(tmp: Path, base: str | None = None) -> dict:
+    """
+    settings.json pointed at tmp (and at a local NSE stand-in when base is
+    given), with the history store, result cache and metrics off.
+    """
+    config = load_settings()
+
+    if base:
+        config["nse"].update({"base_url": base, "homepage_url": base, "requests_per_minute": 10000})
+    config["data"].update({"folder": str(tmp), "store": {"enabled": False}})
+    config["data"]["result_cache"]["enabled"] = False
+    config["metrics"]["enabled"] = False
+    # Don't let the quota limiter pace an offline test
+    config["google_sheets"]["quota"]["requests_per_minute"] = 60000
+    return config
+
+
+# ---------------------------------------------------------------------------
+# NSE Stand-in
+# ---------------------------------------------------------------------------
+
+class FakeNSE(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        query = dict(urllib.parse.parse_qsl(url.query))
+
+        if "symbol" in query:
+            time.sleep(FETCH_DELAY)
+            body = (HEADER + "".join(rows(query["symbol"], query["from"], query["to"]))).encode()
+            self.send_response(200)
+        else:
+            body = b"<html>home</html>"
+            self.send_response(200)
+            self.send_header("Set-Cookie", "nsit=test; Path=/")
+
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def rows(symbol: str, from_date: str, to_date: str) -> list[str]:
+    day = datetime.strptime(from_date, "%d-%m-%Y")
+    end = datetime.strptime(to_date, "%d-%m-%Y")
+    out = []
+    while day <= end:
+        if day.weekday() < 5:
+            out.append(f'"{symbol}","EQ","{day:%d-%b-%Y}","1,510.00","1,000,000","450,000","45.00"\n')
+        day += timedelta(days=1)
+    return out
+
+
+def start_server(handler=FakeNSE) -> tuple[http.server.ThreadingHTTPServer, str]:
+    """
+    Serve handler on a free local port; returns (server, base URL).
+    """
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+# ---------------------------------------------------------------------------
+# Sheets Stand-in
+# ---------------------------------------------------------------------------
+
+class FakeWorksheet:
+    def __init__(self, title: str, sheet_id: int):
+        self.title = title
+        self.id = sheet_id
+        self.row_count = 1000
+        self.col_count = 26
+
+
+class FakeSpreadsheet:
+    """
+    Records batchUpdate / values.batchUpdate bodies. values.batchGet is
+    answered from `cells` (range -> values) and the REQUESTS range from
+    `table`.
+    """
+
+    def __init__(self, table: list[list] | None = None, cells: dict | None = None):
+        self.sheets = {}
+        self.calls = []
+        self.table = table or []
+        self.cells = cells or {}
+
+    def worksheet(self, title: str) -> FakeWorksheet:
+        return self.sheets.setdefault(title, FakeWorksheet(title, len(self.sheets)))
+
+    def add_worksheet(self, title, rows, cols):
+        return self.worksheet(title)
+
+    def batch_update(self, body):
+        self.calls.append(("batch_update", body["requests"]))
+
+    def values_batch_update(self, body):
+        self.calls.append(("values_batch_update", body["data"]))
+
+    def values_batch_get(self, ranges):
+        self.calls.append(("values_batch_get", ranges))
+        return {"valueRanges": [
+            {"range": r, "values": self.table if r.startswith("'REQUESTS'!") else self.cells.get(r, [])}
+            for r in ranges
+        ]}
+
+    def values(self, title: str) -> dict:
+        """A1 start cell -> values, for everything written to a tab."""
+        return {
+            block["range"].split("!")[1]: block["values"]
+            for kind, body in self.calls if kind == "values_batch_update"
+            for block in body if block["range"].startswith(f"'{title}'!")
+        }
+
+
+# ---------------------------------------------------------------------------
+# Pipeline State
+# ---------------------------------------------------------------------------
+
+def pipeline_state(tmp: Path, base: str) -> dict:
+    """
+    Staged pipeline state against the NSE stand-in at base; data lives in tmp.
+    """
+    config = offline_config(tmp, base)
+    config["pipeline"].update({"staged": True, "queue_size": 4, "max_in_flight": 4})
+
+    return {
+        "config": config,
+        "resources": {
+            "spreadsheet": FakeSpreadsheet(),
+            "worksheets": {},
+            "shutdown_event": threading.Event(),
+        },
+    }